@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,6 +44,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'jogging.metrics.MetricsMiddleware',
+    'jogging.profiling.SamplingProfilerMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -80,9 +83,55 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # seconds to wait for a lock before "database is locked":
+        'OPTIONS': {'timeout': 20},
+        'CONN_MAX_AGE': 600,
     }
 }
 
+# Read replica of 'default', kept in sync outside of Django. Safe reads of
+# the runs and weekly reports endpoints are sent to it (see
+# jogging.dbrouters), except for users that wrote in the last
+# READ_YOUR_WRITES_SECONDS (which should exceed the replication lag).
+if os.environ.get("JOGGING_REPLICA_DB"):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ["JOGGING_REPLICA_DB"],
+        'OPTIONS': {'timeout': 20},
+        'CONN_MAX_AGE': 600,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['jogging.dbrouters.ReadReplicaRouter']
+
+READ_YOUR_WRITES_SECONDS = 5
+
+# Applied to each new SQLite connection (see jogging.db.configure_sqlite):
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 20000,
+    "mmap_size": 268435456,
+    "cache_size": -65536,
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+# (the local-memory cache is per process; use e.g. the file based cache
+# if several worker processes must share it)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+RESPONSE_CACHE = {
+    "ALIAS": "default",
+    "TIMEOUT": 300,
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
@@ -124,9 +173,35 @@ STATIC_URL = '/static/'
 
 WEATHER = {
     "PROVIDER": "fake_weather",
+    "MAX_CONCURRENT": 8,
+}
+
+AUTH_TOKEN = {
+    "CACHE_SECONDS": 60,
+}
+
+# Sampling profiler of the API views; merge its output with
+# ``manage.py merge_profiles``.
+PROFILER = {
+    "ENABLED": os.environ.get("JOGGING_PROFILER") == "1",
+    "SAMPLE_RATE": 0.01,
+    "SLOW_SECONDS": 0.5,
+    "INTERVAL": 0.005,
+    "DIRECTORY": BASE_DIR / "profiles",
+    "MAX_FILES": 50,
+    "VIEWS": ("RunViewSet", "WeeklyReportViewSet", "NewAccount"),
 }
 
 REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.SessionAuthentication',
+        'jogging.authentication.TokenAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'jogging.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 10,
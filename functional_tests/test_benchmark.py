@@ -0,0 +1,39 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+from django.contrib.staticfiles.testing import LiveServerTestCase
+
+from jogging.loadtest import run_benchmark, SCENARIOS
+
+
+class BenchmarkSmokeTestCase(LiveServerTestCase):
+    def test_benchmark_drives_all_endpoints(self):
+        # The load test harness seeds some users and runs through the API
+        # and then exercises every scenario without errors:
+        results = run_benchmark(
+            self.live_server_url, users=2, runs_per_user=5, clients=1,
+            requests_count=3
+        )
+        self.assertEqual(set(results), set(SCENARIOS))
+        for name, result in results.items():
+            with self.subTest(scenario=name):
+                self.assertEqual(result["requests"], 3)
+                self.assertEqual(result["errors"], 0)
@@ -0,0 +1,77 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+from datetime import date, timedelta
+
+from django.contrib.staticfiles.testing import LiveServerTestCase
+import requests
+
+
+class TokenAuthTestCase(LiveServerTestCase):
+    username = "bob"
+    password = "1Mpossibl3"
+
+    def setUp(self):
+        # Bob has an account:
+        auth_data = {"username": self.username, "password": self.password}
+        requests.post(self.live_server_url+"/new-account/", data=auth_data)
+
+    def test_can_use_a_token_instead_of_the_password(self):
+        # Bob's watch syncs very often and he does not want it to send
+        # his password every time. He asks for a token:
+        resp = requests.post(
+            self.live_server_url+"/new-token/",
+            data={"username": self.username, "password": self.password}
+        )
+        self.assertEqual(resp.status_code, 201)
+        token = resp.json()["token"]
+        headers = {"Authorization": f"Token {token}"}
+        # with it he can store a run:
+        run = {
+            "date": str(date.today()),
+            "distance": 11.3,
+            "time": str(timedelta(minutes=58, seconds=24)),
+            "location": "Frankfurt",
+        }
+        resp = requests.post(
+            self.live_server_url+"/run/", data=run, headers=headers
+        )
+        self.assertEqual(resp.status_code, 201)
+        # and read his runs back:
+        resp = requests.get(self.live_server_url+"/run/", headers=headers)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["count"], 1)
+        # When he loses his watch he revokes the token:
+        resp = requests.delete(
+            self.live_server_url+"/new-token/", headers=headers
+        )
+        self.assertEqual(resp.status_code, 204)
+        # and it cannot be used anymore:
+        resp = requests.get(self.live_server_url+"/run/", headers=headers)
+        self.assertEqual(resp.status_code, 403)
+
+    def test_wrong_password_gives_no_token(self):
+        resp = requests.post(
+            self.live_server_url+"/new-token/",
+            data={"username": self.username, "password": "guess"}
+        )
+        self.assertEqual(resp.status_code, 400)
+        self.assertNotIn("token", resp.json())
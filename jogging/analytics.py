@@ -0,0 +1,133 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+from collections import namedtuple
+from datetime import date
+
+import numpy as np
+
+from .columnar import run_snapshot
+
+
+ACUTE_DAYS = 7
+CHRONIC_DAYS = 28
+PERCENTILES = (10, 25, 50, 75, 90)
+
+RunColumns = namedtuple("RunColumns", ("days", "distances", "seconds"))
+
+
+def load_run_columns(owner):
+    """The runs of ``owner`` as columns: dates (as day ordinals),
+    distances (km) and times (s), read from their snapshot."""
+    table = run_snapshot(owner)
+    return RunColumns(
+        table["day"].astype(np.int64), table["distance"], table["seconds"]
+    )
+
+
+def rolling_sums(values, window):
+    """Sum of the last ``window`` values at each position."""
+    sums = np.cumsum(values)
+    sums[window:] -= sums[:-window].copy()
+    return sums
+
+
+def _number(value, ndigits=3):
+    value = float(value)
+    if not np.isfinite(value):
+        return None
+    return round(value, ndigits)
+
+
+def _trend(days, values, as_of):
+    """Least squares line of ``values`` over ``days``: its slope (per
+    week) and its value at ``as_of``."""
+    if np.unique(days).size < 2:
+        return {"slope_per_week": None, "current": None}
+    x = days-as_of
+    slope, intercept = np.polyfit(x, values, 1)
+    return {
+        "slope_per_week": _number(7*slope), "current": _number(intercept)
+    }
+
+
+def compute_analytics(columns, as_of=None, series_days=CHRONIC_DAYS):
+    """Rolling distances (7 and 28 days), acute:chronic workload ratio,
+    pace percentiles and trends of the runs in ``columns`` up to the day
+    ``as_of``, and the daily series of the last ``series_days`` days."""
+    as_of = as_of or date.today()
+    end = as_of.toordinal()
+    keep = columns.days <= end
+    days = columns.days[keep]
+    distances = columns.distances[keep]
+    seconds = columns.seconds[keep]
+
+    span = max(series_days, CHRONIC_DAYS)
+    start = end-span+1
+    if days.size:
+        start = min(start, int(days.min()))
+    daily = np.bincount(
+        days-start, weights=distances, minlength=end-start+1
+    )
+    acute = rolling_sums(daily, ACUTE_DAYS)
+    chronic = rolling_sums(daily, CHRONIC_DAYS)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = (acute/ACUTE_DAYS)/(chronic/CHRONIC_DAYS)
+
+    timed = (distances > 0) & (seconds > 0)
+    pace = seconds[timed]/distances[timed]
+    speed = 3600/pace
+    if pace.size:
+        percentiles = np.percentile(pace, PERCENTILES)
+    else:
+        percentiles = [None]*len(PERCENTILES)
+
+    first = date.fromordinal(end-series_days+1)
+    return {
+        "as_of": as_of,
+        "runs": int(days.size),
+        "distance_km": {
+            "last_7_days": _number(acute[-1]),
+            "last_28_days": _number(chronic[-1]),
+        },
+        "acute_chronic_ratio": _number(ratio[-1]),
+        "pace_s_per_km": {
+            f"p{p}": value if value is None else _number(value, 1)
+            for p, value in zip(PERCENTILES, percentiles)
+        },
+        "trend": {
+            "distance_km": _trend(days, distances, end),
+            "speed_kmph": _trend(days[timed], speed, end),
+        },
+        "daily": [
+            {
+                "date": date.fromordinal(first.toordinal()+i),
+                "distance_km": _number(d),
+                "last_7_days": _number(a),
+                "last_28_days": _number(c),
+                "acute_chronic_ratio": _number(r),
+            }
+            for i, (d, a, c, r) in enumerate(zip(
+                daily[-series_days:], acute[-series_days:],
+                chronic[-series_days:], ratio[-series_days:]
+            ))
+        ],
+    }
@@ -20,8 +20,11 @@
 ########################################################################
 
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 from django.db.models.signals import post_save
 
+from .db import configure_sqlite
+from .metrics import install_query_metrics
 from .signals import run_save_handler
 
 
@@ -31,3 +34,5 @@ class JoggingConfig(AppConfig):
     def ready(self):
         RunModel = self.get_model("Run")
         post_save.connect(run_save_handler, sender=RunModel)
+        connection_created.connect(configure_sqlite)
+        connection_created.connect(install_query_metrics)
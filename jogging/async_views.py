@@ -0,0 +1,89 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+"""Async (ASGI) versions of the run endpoints.
+
+Django 3.1 has no async ORM: the database work of a request still runs in
+a thread (``sync_to_async``), inside the very same ``RunViewSet`` code
+used by the sync endpoints. What is async is the slow part: the weather
+of the submitted runs is fetched concurrently on the event loop before
+that, without holding a thread, and handed over to ``Run.save`` through
+``prefetched_weather``.
+"""
+
+import json
+
+from asgiref.sync import sync_to_async
+from django.utils.dateparse import parse_date
+
+from .views import RunViewSet
+from .weather import aget_weather_many, prefetched_weather
+
+
+WEATHER_METHODS = ("POST", "PUT", "PATCH")
+
+
+def _submitted_runs(request):
+    """The (location, date) pairs of the runs in the request body."""
+    if request.method not in WEATHER_METHODS:
+        return []
+    if request.content_type == "application/json":
+        try:
+            items = json.loads(request.body)
+        except ValueError:
+            return []
+    else:
+        items = request.POST
+    if not isinstance(items, list):
+        items = [items]
+    keys = []
+    for item in items:
+        try:
+            location = str(item["location"]).strip()
+            day = parse_date(str(item["date"]))
+        except (KeyError, TypeError, ValueError):
+            continue
+        if location and day:
+            keys.append((location, day))
+    return keys
+
+
+def async_view(view):
+    """Async wrapper of the sync ``view`` that prefetches the weather of
+    the submitted runs."""
+    sync_view = sync_to_async(view, thread_sensitive=True)
+
+    async def wrapper(request, *args, **kwargs):
+        keys = _submitted_runs(request)
+        weather = await aget_weather_many(keys) if keys else None
+        token = prefetched_weather.set(weather)
+        try:
+            return await sync_view(request, *args, **kwargs)
+        finally:
+            prefetched_weather.reset(token)
+
+    wrapper.csrf_exempt = getattr(view, "csrf_exempt", False)
+    return wrapper
+
+
+run_list = async_view(RunViewSet.as_view({"get": "list", "post": "create"}))
+run_detail = async_view(RunViewSet.as_view({"get": "retrieve"}))
+run_bulk = async_view(RunViewSet.as_view({"post": "bulk"}))
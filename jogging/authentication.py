@@ -0,0 +1,135 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.authentication import (
+    BaseAuthentication, get_authorization_header,
+)
+from rest_framework.exceptions import AuthenticationFailed
+
+
+DEFAULT_CACHE_SECONDS = 60
+
+
+def token_digest(key):
+    """Fast keyed digest of a token (instead of a slow password hash:
+    tokens are long random strings, not guessable passwords)."""
+    return hmac.new(
+        settings.SECRET_KEY.encode(), key.encode(), hashlib.sha256
+    ).hexdigest()
+
+
+def issue_token(user):
+    """Creates a new token for ``user`` and returns its (plain) key."""
+    from jogging.models import AuthToken
+    key = secrets.token_hex(20)
+    AuthToken.objects.create(digest=token_digest(key), owner=user)
+    return key
+
+
+def revoke_token(key):
+    from jogging.models import AuthToken
+    digest = token_digest(key)
+    AuthToken.objects.filter(digest=digest).delete()
+    token_cache.discard(digest)
+
+
+class TokenCache:
+    """In-process map from token digests to users with expiry."""
+
+    def __init__(self):
+        self._items = {}
+        self._lock = threading.Lock()
+
+    @property
+    def timeout(self):
+        return getattr(settings, "AUTH_TOKEN", {}).get(
+            "CACHE_SECONDS", DEFAULT_CACHE_SECONDS
+        )
+
+    def get(self, digest):
+        with self._lock:
+            item = self._items.get(digest)
+            if item is None:
+                return None
+            user, expires = item
+            if expires < time.monotonic():
+                del self._items[digest]
+                return None
+            return user
+
+    def set(self, digest, user):
+        with self._lock:
+            self._items[digest] = (user, time.monotonic()+self.timeout)
+
+    def discard(self, digest):
+        with self._lock:
+            self._items.pop(digest, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+token_cache = TokenCache()
+
+
+class TokenAuthentication(BaseAuthentication):
+    """Clients authenticate with the header ``Authorization: Token <key>``.
+    """
+    keyword = "Token"
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise AuthenticationFailed("Invalid token header.")
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise AuthenticationFailed("Invalid token header.")
+        return self.authenticate_credentials(key)
+
+    def authenticate_credentials(self, key):
+        from jogging.models import AuthToken
+        digest = token_digest(key)
+        user = token_cache.get(digest)
+        if user is None:
+            token = AuthToken.objects.select_related("owner").filter(
+                digest=digest
+            ).first()
+            if token is None:
+                raise AuthenticationFailed("Invalid token.")
+            user = token.owner
+            token_cache.set(digest, user)
+        if not user.is_active:
+            raise AuthenticationFailed("User inactive or deleted.")
+        return (user, key)
+
+    def authenticate_header(self, request):
+        return self.keyword
@@ -0,0 +1,260 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+import time
+from collections import Counter, defaultdict
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncWeek
+
+from .models import Location, Run, WeeklyReport
+from .leaderboards import rebuild_leaderboards, update_leaderboards
+from .conditions import get_conditions
+from .locations import get_locations
+from .records import replace_week_records, rebuild_run_records
+from .signals import (
+    update_weekly_reports, data_changed, runs_changed, week_bounds,
+)
+from .totals import rebuild_daily_totals, update_daily_totals
+from .versions import add_runs, locked_versions, recount_runs
+from .weather import get_weather_many
+
+
+def create_runs(runs):
+    """Stores many (unsaved) runs with a few statements.
+
+    The weather is resolved in one deduplicated batch, the runs are
+    inserted with ``bulk_create`` in a single transaction and each affected
+    weekly report is recomputed only once (``bulk_create`` does not emit
+    ``post_save``).
+    """
+    runs = list(runs)
+    weather = get_weather_many((run.location, run.date) for run in runs)
+    for run in runs:
+        value = weather[(run.location, run.date)]
+        if value:
+            run.weather = value
+    Run.objects.resolve(runs)
+    with transaction.atomic():
+        Run.objects.bulk_create(runs)
+        _set_missing_pks(runs)
+        versions = locked_versions({run.owner_id for run in runs})
+        update_reports_for(runs)
+        for owner_id, count in Counter(run.owner_id for run in runs).items():
+            add_runs(owner_id, count)
+        runs_changed(_ids_per_owner(
+            (run.pk, run.owner_id) for run in runs
+        ), versions)
+    return runs
+
+
+def delete_runs(queryset):
+    """Deletes the runs in ``queryset`` with one statement and repairs
+    the weekly reports they belonged to. Returns the number of deleted runs.
+    """
+    with transaction.atomic():
+        rows = list(queryset.values_list("id", "owner_id", "date"))
+        count = queryset.delete()[1].get(Run._meta.label, 0)
+        versions = locked_versions({row[1] for row in rows})
+        repair_weekly_reports({(owner_id, day) for _, owner_id, day in rows})
+        for owner_id, deleted in Counter(row[1] for row in rows).items():
+            add_runs(owner_id, -deleted)
+        runs_changed(_ids_per_owner(row[:2] for row in rows), versions)
+    return count
+
+
+def update_runs(queryset, **fields):
+    """Updates the runs in ``queryset`` with one statement and repairs
+    the affected weekly reports. If the date or the location change, the
+    weather is fetched again (once per distinct pair). Returns the number of
+    updated runs.
+    """
+    if "location" in fields:
+        name = fields.pop("location")
+        fields["place"] = get_locations([name])[name]
+    if "weather" in fields:
+        name = fields.pop("weather")
+        fields["condition"] = get_conditions([name])[name]
+    with transaction.atomic():
+        rows = list(
+            queryset.values_list("id", "owner_id", "place_id", "date")
+        )
+        before = {row[1:] for row in rows}
+        count = queryset.update(**fields)
+        versions = locked_versions({row[1] for row in rows})
+        after = {
+            (owner_id, getattr(fields.get("place"), "pk", place_id),
+             fields.get("date", day))
+            for owner_id, place_id, day in before
+        }
+        if "place" in fields or "date" in fields:
+            _refresh_weather(after)
+        repair_weekly_reports(
+            {(owner_id, day) for owner_id, _, day in before | after}
+        )
+        runs_changed(_ids_per_owner(row[:2] for row in rows), versions)
+    return count
+
+
+def import_runs(owner, rows, batch_size=1000):
+    """Stores the runs in ``rows`` (an iterable of dicts, consumed lazily)
+    for ``owner`` in batches, in one transaction. The weather is fetched
+    afterwards in one deduplicated batch, the weekly reports and records
+    are rebuilt once and only the owner is moved in the leaderboards of
+    the imported weeks. Returns the number of runs and the elapsed
+    seconds."""
+    start = time.perf_counter()
+    rows = iter(rows)
+    keys = set()
+    count = 0
+    batch = [Run(owner=owner, **row) for row in islice(rows, batch_size)]
+    # the first write of the transaction must come before its reads:
+    Run.objects.resolve(batch)
+    with transaction.atomic():
+        while batch:
+            Run.objects.bulk_create(batch)
+            keys.update((run.place_id, run.date) for run in batch)
+            count += len(batch)
+            batch = [
+                Run(owner=owner, **row) for row in islice(rows, batch_size)
+            ]
+    _refresh_weather(
+        (owner.pk, place_id, day) for place_id, day in keys
+    )
+    rebuild_weekly_reports([owner.pk], leaderboards=False)
+    _update_leaderboards(owner.pk, {day for _, day in keys})
+    rebuild_daily_totals([owner.pk])
+    recount_runs([owner.pk])
+    rebuild_run_records(owner.pk)
+    return count, time.perf_counter()-start
+
+
+def repair_weekly_reports(owner_days):
+    """Recomputes the weekly reports (and the daily totals) for the given
+    ``(owner_id, date)`` pairs; reports of weeks without runs are removed.
+    """
+    days_per_owner = defaultdict(set)
+    for owner_id, day in owner_days:
+        days_per_owner[owner_id].add(day)
+    owners = User.objects.in_bulk(days_per_owner.keys())
+    for owner_id, days in days_per_owner.items():
+        update_weekly_reports(Run, owners[owner_id], days)
+        update_daily_totals(owner_id, days)
+
+
+def _update_leaderboards(owner_id, days):
+    weeks = {week_bounds(day)[0] for day in days}
+    distances = dict(WeeklyReport.objects.filter(
+        owner_id=owner_id, week_start__in=weeks
+    ).values_list("week_start", "total_distance_km"))
+    for week_start in sorted(weeks):
+        update_leaderboards(owner_id, week_start, distances.get(week_start))
+
+
+def _refresh_weather(owner_place_days):
+    owners_per_key = defaultdict(set)
+    for owner_id, place_id, day in owner_place_days:
+        owners_per_key[(place_id, day)].add(owner_id)
+    names = dict(Location.objects.filter(
+        pk__in={place_id for place_id, _ in owners_per_key}
+    ).values_list("id", "name"))
+    weather = get_weather_many([
+        (names[place_id], day) for place_id, day in owners_per_key
+    ])
+    conditions = get_conditions(value for value in weather.values() if value)
+    for (place_id, day), owners in owners_per_key.items():
+        value = weather[(names[place_id], day)]
+        if value:
+            Run.objects.filter(
+                place_id=place_id, date=day, owner_id__in=owners
+            ).update(condition=conditions[value])
+
+
+def update_reports_for(runs):
+    days_per_owner = defaultdict(set)
+    owners = {}
+    for run in runs:
+        days_per_owner[run.owner_id].add(run.date)
+        owners[run.owner_id] = run.owner
+    for owner_id, days in days_per_owner.items():
+        update_weekly_reports(Run, owners[owner_id], days)
+        update_daily_totals(owner_id, days)
+
+
+def _ids_per_owner(id_owner_pairs):
+    ids = defaultdict(set)
+    for pk, owner_id in id_owner_pairs:
+        ids[owner_id].add(pk)
+    return ids
+
+
+def _set_missing_pks(runs):
+    """Some backends (e.g. SQLite) do not return the primary keys from a
+    bulk insert. Inside the transaction the new rows of each owner are the
+    ones with the highest pks, so they are fetched from there."""
+    missing = defaultdict(list)
+    for run in runs:
+        if run.pk is None:
+            missing[run.owner_id].append(run)
+    for owner_id, owner_runs in missing.items():
+        pks = Run.objects.filter(owner_id=owner_id).order_by(
+            "-pk").values_list("pk", flat=True)[:len(owner_runs)]
+        for run, pk in zip(owner_runs, reversed(list(pks))):
+            run.pk = pk
+
+
+def rebuild_weekly_reports(owner_ids, chunk_size=500, leaderboards=True):
+    """Rebuilds from scratch all the weekly reports of the given owners
+    with one grouped aggregate per chunk of owners (instead of one
+    aggregate per run and week), and then (unless ``leaderboards`` is
+    false) all the leaderboards."""
+    owner_ids = list(owner_ids)
+    for start in range(0, len(owner_ids), chunk_size):
+        chunk = owner_ids[start:start+chunk_size]
+        with transaction.atomic():
+            rows = Run.objects.filter(owner_id__in=chunk).annotate(
+                week=TruncWeek("date")
+            ).values("owner_id", "week").annotate(
+                distance=Sum("distance"), time=Sum("time")
+            ).order_by()
+            reports = [
+                WeeklyReport(
+                    owner_id=row["owner_id"],
+                    week_start=row["week"],
+                    total_distance_km=row["distance"],
+                    average_speed_kmph=_speed(row["distance"], row["time"]),
+                ) for row in rows
+            ]
+            WeeklyReport.objects.filter(owner_id__in=chunk).delete()
+            WeeklyReport.objects.bulk_create(reports, batch_size=chunk_size)
+            replace_week_records(chunk, reports)
+            for owner_id in chunk:
+                data_changed(owner_id)
+    if leaderboards:
+        rebuild_leaderboards()
+
+
+def _speed(distance, time):
+    seconds = time.total_seconds()
+    return distance*3600/seconds if seconds else 0
@@ -0,0 +1,107 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+import hashlib
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+DEFAULT_TIMEOUT = 300
+# "user" of the entries about the data of all users:
+EVERYBODY = "all"
+
+
+class PerUserCache:
+    """Cache of serialized responses per user and request.
+
+    Each user has a *generation* stored in the cache too; it is part of
+    the keys of the entries of that user, so invalidating all of them is
+    just setting a new generation.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self._config.get("ALIAS", "default")]
+
+    @property
+    def timeout(self):
+        return self._config.get("TIMEOUT", DEFAULT_TIMEOUT)
+
+    @property
+    def _config(self):
+        return getattr(settings, "RESPONSE_CACHE", {})
+
+    def get(self, user_id, key):
+        data = self.cache.get(self._entry_key(user_id, key))
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return data
+
+    def set(self, user_id, key, data):
+        self.cache.set(self._entry_key(user_id, key), data, self.timeout)
+
+    def invalidate(self, user_id):
+        """Drops the entries of the user now and, if inside a transaction,
+        again after the commit (entries cached meanwhile could hold data
+        from before the commit)."""
+        self._new_generation(user_id)
+        transaction.on_commit(lambda: self._new_generation(user_id))
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def _generation_key(self, user_id):
+        return f"{self.prefix}:generation:{user_id}"
+
+    def _new_generation(self, user_id):
+        generation = uuid.uuid4().hex
+        self.cache.set(self._generation_key(user_id), generation, None)
+        return generation
+
+    def _entry_key(self, user_id, key):
+        generation = self.cache.get(self._generation_key(user_id))
+        if generation is None:
+            generation = self._new_generation(user_id)
+        digest = hashlib.md5(key.encode()).hexdigest()
+        return f"{self.prefix}:{user_id}:{generation}:{digest}"
+
+
+weekly_reports_cache = PerUserCache("weekly-reports")
+run_counts_cache = PerUserCache("run-counts")
@@ -0,0 +1,140 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+"""Per-user columnar snapshots of the runs.
+
+All the runs of a user are packed into one binary blob (``RunSnapshot``)
+that is read with a single query and viewed as a NumPy structured array
+without copying. A snapshot is valid while its version is the current
+``DataVersion`` of the owner; the write paths resync the changed runs in
+place (``sync_run_snapshots``), other changes make the snapshot stale and
+it is rebuilt from the runs on the next read.
+"""
+
+from collections import defaultdict
+
+import numpy as np
+
+
+SNAPSHOT_DTYPE = np.dtype([
+    ("id", "<i8"),
+    ("day", "<i4"),
+    ("place", "<i8"),
+    ("distance", "<f8"),
+    ("seconds", "<f8"),
+])
+RUN_FIELDS = (
+    "id", "owner_id", "date", "place_id", "distance", "time"
+)
+
+
+def pack(rows):
+    """Packs ``rows`` (as in ``RUN_FIELDS``) into a structured array. The
+    places are stored as their ``Location`` ids."""
+    return np.array(
+        [
+            (pk, day.toordinal(), place_id, distance, time.total_seconds())
+            for pk, _, day, place_id, distance, time in rows
+        ],
+        dtype=SNAPSHOT_DTYPE,
+    )
+
+
+def unpack(data):
+    return np.frombuffer(data, dtype=SNAPSHOT_DTYPE)
+
+
+def _versions(owner_ids):
+    from jogging.models import DataVersion
+    versions = dict.fromkeys(owner_ids, 0)
+    versions.update(
+        DataVersion.objects.filter(owner_id__in=owner_ids).values_list(
+            "owner_id", "version"
+        )
+    )
+    return versions
+
+
+def build_run_snapshot(owner_id):
+    """Packs all the runs of the owner and stores them as their snapshot.
+    """
+    from jogging.models import Run, RunSnapshot
+    # the version is read first: a concurrent change leaves it stale
+    version = _versions([owner_id])[owner_id]
+    rows = list(Run.objects.filter(owner_id=owner_id).values_list(
+        *RUN_FIELDS
+    ))
+    table = pack(rows)
+    RunSnapshot.objects.update_or_create(
+        owner_id=owner_id,
+        defaults={"version": version, "data": table.tobytes()}
+    )
+    return table
+
+
+def run_snapshot(owner):
+    """The runs of ``owner`` (a user or its id) as a read-only structured
+    array."""
+    from jogging.models import RunSnapshot
+    owner_id = getattr(owner, "pk", owner)
+    snapshot = RunSnapshot.objects.filter(owner_id=owner_id).values_list(
+        "version", "data", "owner__jogging_dataversion__version"
+    ).first()
+    if snapshot is not None:
+        version, data, current = snapshot
+        if version == (current or 0):
+            return unpack(data)
+    return build_run_snapshot(owner_id)
+
+
+def sync_run_snapshots(run_ids, versions_before):
+    """Brings the existing snapshots up to date after the runs
+    ``run_ids`` (a mapping owner id -> run ids) were created, changed or
+    deleted. Only snapshots that were valid before the write (their
+    version is the one in ``versions_before``, owner id -> version) are
+    patched; stale or concurrently changed ones are dropped instead."""
+    from jogging.models import Run, RunSnapshot
+    snapshots = list(RunSnapshot.objects.filter(
+        owner_id__in=run_ids.keys()
+    ).values_list("owner_id", "version", "data"))
+    if not snapshots:
+        return
+    ids = set().union(*run_ids.values())
+    rows = defaultdict(list)
+    for row in Run.objects.filter(id__in=ids).values_list(*RUN_FIELDS):
+        rows[row[1]].append(row)
+    versions = _versions([snapshot[0] for snapshot in snapshots])
+    ids = np.fromiter(ids, dtype=np.int64, count=len(ids))
+    for owner_id, version, data in snapshots:
+        if version != versions_before.get(owner_id):
+            # other changes are missing: rebuilt on the next read
+            RunSnapshot.objects.filter(owner_id=owner_id).delete()
+            continue
+        table = unpack(data)
+        table = np.concatenate((
+            table[~np.isin(table["id"], ids)],
+            pack(rows[owner_id]),
+        ))
+        updated = RunSnapshot.objects.filter(
+            owner_id=owner_id, version=version
+        ).update(version=versions[owner_id], data=table.tobytes())
+        if not updated:
+            RunSnapshot.objects.filter(owner_id=owner_id).delete()
@@ -0,0 +1,58 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+"""The weather of the runs is stored as the id of a ``WeatherCondition``;
+the names are kept exactly as the provider gives them."""
+
+from .dimensions import get_or_create_many
+
+
+# weather of the runs whose weather is not known:
+UNKNOWN_WEATHER = "?"
+# the weather states of MetaWeather (the table is seeded with them):
+META_WEATHER_STATES = (
+    "Snow", "Sleet", "Hail", "Thunderstorm", "Heavy Rain", "Light Rain",
+    "Showers", "Heavy Cloud", "Light Cloud", "Clear",
+)
+
+
+def get_conditions(names):
+    """Maps each name in ``names`` to its ``WeatherCondition``, creating
+    the missing ones."""
+    from jogging.models import WeatherCondition
+    return get_or_create_many(WeatherCondition, "name", {
+        name: WeatherCondition(name=name) for name in names
+    })
+
+
+def resolve_conditions(runs):
+    """Sets the weather condition of the ``runs`` whose weather was given
+    by name (or is still unknown)."""
+    runs = [
+        run for run in runs
+        if run.pending_weather is not None or run.condition_id is None
+    ]
+    if not runs:
+        return
+    conditions = get_conditions(run.weather for run in runs)
+    for run in runs:
+        run.condition = conditions[run.weather]
+        run.pending_weather = None
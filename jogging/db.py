@@ -0,0 +1,43 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+from django.conf import settings
+
+
+def apply_sqlite_pragmas(raw_connection, pragmas):
+    """Executes ``PRAGMA name=value`` on a DB-API sqlite3 connection."""
+    for name, value in pragmas.items():
+        raw_connection.execute(f"PRAGMA {name}={value}")
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Handler of ``connection_created``: tunes new SQLite connections with
+    ``settings.SQLITE_PRAGMAS``."""
+    if connection.vendor != "sqlite":
+        return
+    pragmas = getattr(settings, "SQLITE_PRAGMAS", {})
+    if connection.is_in_memory_db():
+        # WAL and mmap make no sense there:
+        pragmas = {
+            k: v for k, v in pragmas.items()
+            if k not in ("journal_mode", "mmap_size")
+        }
+    apply_sqlite_pragmas(connection.connection, pragmas)
@@ -0,0 +1,86 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+import contextvars
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+REPLICA_DB_ALIAS = "replica"
+DEFAULT_READ_YOUR_WRITES_SECONDS = 5
+
+_replica_allowed = contextvars.ContextVar("replica_allowed", default=False)
+
+
+def replica_available():
+    return REPLICA_DB_ALIAS in connections.databases
+
+
+def allow_replica(allowed=True):
+    """Lets (or not) the reads of the current context go to the replica.
+    Returns a token for :func:`reset_replica`."""
+    return _replica_allowed.set(allowed)
+
+
+def reset_replica(token):
+    _replica_allowed.reset(token)
+
+
+def _last_write_key(user_id):
+    return f"replica:last-write:{user_id}"
+
+
+def mark_write(user_id):
+    """Starts the read-your-writes window of the user: meanwhile all their
+    reads go to the primary database."""
+    window = getattr(
+        settings, "READ_YOUR_WRITES_SECONDS", DEFAULT_READ_YOUR_WRITES_SECONDS
+    )
+    cache.set(_last_write_key(user_id), True, window)
+
+
+def wrote_recently(user_id):
+    return cache.get(_last_write_key(user_id), False)
+
+
+class ReadReplicaRouter:
+    """Sends reads to the ``replica`` database, if configured and allowed
+    in the current context, and everything else to ``default``."""
+
+    def db_for_read(self, model, **hints):
+        if _replica_allowed.get() and replica_available():
+            return REPLICA_DB_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # explicit: objects read from the replica must not be saved there
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == REPLICA_DB_ALIAS:
+            # the replica is a copy of the primary
+            return False
+        return None
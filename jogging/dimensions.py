@@ -0,0 +1,56 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+"""Helpers for the small tables of values shared by many runs (locations,
+weather conditions), referred to by id."""
+
+
+# SQLite limits the number of variables of a statement:
+CHUNK_SIZE = 500
+
+
+def get_or_create_many(model, field, new):
+    """Maps each value of the unique ``field`` of ``model`` to its row.
+    ``new`` maps the values to (unsaved) instances of ``model``; the
+    missing ones are created, with one statement per chunk."""
+    found = _rows_by(model, field, new)
+    missing = [row for value, row in new.items() if value not in found]
+    if missing:
+        # rows created concurrently are ignored:
+        model.objects.bulk_create(
+            missing, batch_size=CHUNK_SIZE, ignore_conflicts=True
+        )
+        found.update(_rows_by(
+            model, field, [getattr(row, field) for row in missing]
+        ))
+    return found
+
+
+def _rows_by(model, field, values):
+    values = list(values)
+    found = {}
+    for start in range(0, len(values), CHUNK_SIZE):
+        found.update(
+            (getattr(row, field), row) for row in model.objects.filter(
+                **{f"{field}__in": values[start:start+CHUNK_SIZE]}
+            )
+        )
+    return found
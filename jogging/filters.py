@@ -0,0 +1,40 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+from django_filters import rest_framework as filters
+
+from .locations import location_key
+from .models import Run
+
+
+class RunFilter(filters.FilterSet):
+    # the name of the place, matched by its key (see jogging.locations):
+    location = filters.CharFilter(method="filter_location")
+    weather = filters.CharFilter(field_name="condition__name")
+
+    class Meta:
+        model = Run
+        fields = [
+            "date", "distance", "time", "owner", "location", "weather", "id"
+        ]
+
+    def filter_location(self, queryset, name, value):
+        return queryset.filter(place__key=location_key(value))
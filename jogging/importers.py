@@ -0,0 +1,147 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+"""Streaming parsers of run histories exported by other apps.
+
+Both parsers are generators yielding one dict (date, distance, time,
+location) per run; a file is never loaded completely into memory.
+"""
+
+import codecs
+import csv
+import math
+import os
+from datetime import datetime, timedelta
+from xml.etree.ElementTree import iterparse, ParseError
+
+import numpy as np
+from django.utils.dateparse import parse_date, parse_duration
+
+
+EARTH_RADIUS_KM = 6371.0088
+FORMATS = ("csv", "gpx")
+
+
+class RunImportError(ValueError):
+    pass
+
+
+def detect_format(filename):
+    extension = os.path.splitext(filename)[1].lower().lstrip(".")
+    if extension not in FORMATS:
+        raise RunImportError(
+            f"Unknown format of {filename!r} (expected one of {FORMATS})"
+        )
+    return extension
+
+
+def haversine_km(lat, lon):
+    """Length (km) of the path through the points with latitudes ``lat``
+    and longitudes ``lon`` (in degrees)."""
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    if lat.size < 2:
+        return 0.0
+    a = (
+        np.sin(np.diff(lat)/2)**2
+        + np.cos(lat[:-1])*np.cos(lat[1:])*np.sin(np.diff(lon)/2)**2
+    )
+    return float(
+        2*EARTH_RADIUS_KM*np.arcsin(np.sqrt(np.clip(a, 0, 1))).sum()
+    )
+
+
+def iter_csv_runs(stream, location=None):
+    """Runs from a (binary) CSV file with a header and the columns ``date``
+    (YYYY-MM-DD), ``distance`` (km), ``time`` (HH:MM:SS or seconds) and
+    ``location`` (optional if ``location`` is given)."""
+    reader = csv.DictReader(codecs.iterdecode(stream, "utf-8-sig"))
+    try:
+        for row in reader:
+            yield _csv_run(row, location, reader.line_num)
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise RunImportError(f"Invalid CSV file: {e}") from e
+
+
+def _csv_run(row, location, line):
+    try:
+        day = parse_date(row["date"].strip())
+        distance = float(row["distance"])
+        time = parse_duration(row["time"].strip())
+        place = (row.get("location") or location or "").strip()
+    except (KeyError, AttributeError, TypeError, ValueError) as e:
+        raise RunImportError(f"Invalid row at line {line}: {e}") from e
+    if day is None or time is None or not place:
+        raise RunImportError(f"Invalid row at line {line}")
+    # float() accepts "nan", "inf" and negative values:
+    if not math.isfinite(distance) or distance < 0 or time < timedelta(0):
+        raise RunImportError(
+            f"Invalid row at line {line}: negative or non-finite value"
+        )
+    return {
+        "date": day, "distance": distance, "time": time, "location": place,
+    }
+
+
+def _local(tag):
+    return tag.rpartition("}")[2]
+
+
+def _parse_time(text):
+    return datetime.fromisoformat(text.strip().replace("Z", "+00:00"))
+
+
+def iter_gpx_runs(stream, location):
+    """Runs from the tracks of a GPX file: the distance is the length of
+    the track and the time the span between its first and last point."""
+    lat, lon, times = [], [], []
+    try:
+        for event, element in iterparse(stream, events=("end",)):
+            tag = _local(element.tag)
+            if tag == "trkpt":
+                lat.append(float(element.get("lat")))
+                lon.append(float(element.get("lon")))
+                for child in element:
+                    if _local(child.tag) == "time":
+                        times.append(_parse_time(child.text))
+                element.clear()
+            elif tag == "trk":
+                if len(times) >= 2:
+                    yield {
+                        "date": times[0].date(),
+                        "distance": round(haversine_km(lat, lon), 3),
+                        "time": times[-1]-times[0],
+                        "location": location,
+                    }
+                lat, lon, times = [], [], []
+                element.clear()
+            elif tag == "trkseg":
+                element.clear()
+    except (ParseError, TypeError, ValueError) as e:
+        raise RunImportError(f"Invalid GPX file: {e}") from e
+
+
+def iter_runs(stream, format, location=None):
+    if format == "gpx":
+        if not location:
+            raise RunImportError("A location is needed to import GPX files")
+        return iter_gpx_runs(stream, location)
+    return iter_csv_runs(stream, location)
@@ -0,0 +1,139 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+"""Materialized leaderboards: the users ranked by distance per week and
+per month (a week counts for the month in which it starts).
+
+Ranks are dense positions (1, 2, ...) ordered by distance (descending)
+and user id. When a weekly report changes only the entries between the
+old and the new position of its owner are shifted.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q, Sum
+
+
+WEEK = "week"
+MONTH = "month"
+PERIODS = (WEEK, MONTH)
+
+
+def period_start(period, day):
+    if period == WEEK:
+        return day-timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def next_period_start(period, start):
+    if period == WEEK:
+        return start+timedelta(days=7)
+    return (start+timedelta(days=31)).replace(day=1)
+
+
+def _board(period, start):
+    from jogging.models import LeaderboardEntry
+    return LeaderboardEntry.objects.filter(period=period, period_start=start)
+
+
+def move_entry(period, start, owner_id, distance):
+    """Places the owner with ``distance`` in the leaderboard (or removes
+    them if ``distance`` is ``None``)."""
+    from jogging.models import LeaderboardEntry
+    board = _board(period, start)
+    entry = board.filter(owner_id=owner_id)
+    with transaction.atomic():
+        if distance is None:
+            old = entry.values_list("rank", flat=True).first()
+            if old is not None:
+                entry.delete()
+                board.filter(rank__gt=old).update(rank=F("rank")-1)
+            return
+        # writing first takes the write lock (SQLite) before the reads:
+        updated = entry.update(distance=distance)
+        new = board.exclude(owner_id=owner_id).filter(
+            Q(distance__gt=distance) | Q(
+                distance=distance, owner_id__lt=owner_id
+            )
+        ).count()+1
+        if not updated:
+            board.filter(rank__gte=new).update(rank=F("rank")+1)
+            LeaderboardEntry.objects.create(
+                period=period, period_start=start, owner_id=owner_id,
+                distance=distance, rank=new
+            )
+            return
+        old = entry.values_list("rank", flat=True).get()
+        if new < old:
+            board.filter(rank__gte=new, rank__lt=old).update(
+                rank=F("rank")+1
+            )
+        elif new > old:
+            board.filter(rank__gt=old, rank__lte=new).update(
+                rank=F("rank")-1
+            )
+        else:
+            return
+        entry.update(rank=new)
+
+
+def update_leaderboards(owner_id, week_start, distance):
+    """Moves the owner in the week and month leaderboards after their
+    report of ``week_start`` changed to ``distance`` (``None`` if it was
+    deleted)."""
+    from jogging.models import WeeklyReport
+    move_entry(WEEK, week_start, owner_id, distance)
+    month = period_start(MONTH, week_start)
+    total = WeeklyReport.objects.filter(
+        owner_id=owner_id, week_start__gte=month,
+        week_start__lt=next_period_start(MONTH, month)
+    ).aggregate(Sum("total_distance_km"))["total_distance_km__sum"]
+    move_entry(MONTH, month, owner_id, total)
+
+
+def rebuild_leaderboards(batch_size=1000):
+    """Ranks again from scratch all the weekly reports."""
+    from jogging.models import LeaderboardEntry, WeeklyReport
+    totals = defaultdict(lambda: defaultdict(float))
+    reports = WeeklyReport.objects.values_list(
+        "owner_id", "week_start", "total_distance_km"
+    )
+    for owner_id, week_start, distance in reports.iterator():
+        totals[(WEEK, week_start)][owner_id] += distance
+        totals[(MONTH, period_start(MONTH, week_start))][owner_id] += (
+            distance
+        )
+    entries = [
+        LeaderboardEntry(
+            period=period, period_start=start, owner_id=owner_id,
+            distance=distance, rank=rank
+        )
+        for (period, start), board in totals.items()
+        for rank, (owner_id, distance) in enumerate(
+            sorted(board.items(), key=lambda item: (-item[1], item[0])),
+            start=1
+        )
+    ]
+    with transaction.atomic():
+        LeaderboardEntry.objects.all().delete()
+        LeaderboardEntry.objects.bulk_create(entries, batch_size=batch_size)
@@ -0,0 +1,233 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+import math
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .synthetic import synthetic_run_data
+
+
+SEARCH = "(distance gt 10) AND (location ne 'Berlin')"
+BULK_SIZE = 500
+SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+WRITE_STATEMENTS = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of ``values`` (``fraction`` in [0, 1])."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(fraction*len(ordered)), 1)
+    return ordered[rank-1]
+
+
+def queries_from_server_timing(header):
+    """Number of queries reported in a ``Server-Timing`` header (or
+    ``None``)."""
+    match = SERVER_TIMING_QUERIES.search(header or "")
+    return int(match.group(1)) if match else None
+
+
+def api_data(run):
+    return {key: str(value) for key, value in run.items()}
+
+
+class QueryCounter:
+    """Counts the queries executed on the connections it is installed on
+    (see :meth:`install`), and the commits that write to the database
+    (each one an fsync on SQLite): write statements in autocommit mode and
+    transactions with writes."""
+
+    def __init__(self):
+        self.count = 0
+        self.commits = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._lock:
+            self.count += 1
+        connection = context.get("connection")
+        if connection is not None and sql.lstrip().upper().startswith(
+                WRITE_STATEMENTS):
+            if not connection.in_atomic_block:
+                self._committed()
+            elif not any(
+                    func == self._committed
+                    for _, func in connection.run_on_commit):
+                connection.on_commit(self._committed)
+        return execute(sql, params, many, context)
+
+    def _committed(self):
+        with self._lock:
+            self.commits += 1
+
+    def install(self, sender, connection, **kwargs):
+        """Handler of ``connection_created``."""
+        connection.execute_wrappers.append(self)
+
+
+class Client:
+    """One ``requests`` session per thread, authenticated with a token."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def request(self, method, path, token=None, **kwargs):
+        headers = kwargs.pop("headers", {})
+        if token:
+            headers["Authorization"] = f"Token {token}"
+        return self.session.request(
+            method, self.base_url+path, headers=headers, **kwargs
+        )
+
+
+def seed(client, users, runs_per_user, rng, prefix="bench"):
+    """Creates ``users`` accounts with ``runs_per_user`` runs each through
+    the API. Returns their tokens."""
+    tokens = []
+    tag = rng.randrange(10**8)
+    for iuser in range(users):
+        credentials = {
+            "username": f"{prefix}{tag}-{iuser}", "password": "b3nchM4rk!"
+        }
+        client.request("post", "/new-account/", data=credentials)
+        resp = client.request("post", "/new-token/", data=credentials)
+        resp.raise_for_status()
+        token = resp.json()["token"]
+        runs = [
+            api_data(run) for run in synthetic_run_data(runs_per_user, rng)
+        ]
+        for start in range(0, len(runs), BULK_SIZE):
+            resp = client.request(
+                "post", "/run/bulk/", token=token,
+                json=runs[start:start+BULK_SIZE]
+            )
+            resp.raise_for_status()
+        tokens.append(token)
+    return tokens
+
+
+def _create(client, token, rng):
+    run = next(synthetic_run_data(1, rng))
+    return client.request("post", "/run/", token=token, data=api_data(run))
+
+
+def _list(client, token, rng):
+    return client.request("get", "/run/", token=token)
+
+
+def _search(client, token, rng):
+    return client.request(
+        "get", "/run/", token=token, params={"search": SEARCH}
+    )
+
+
+def _weekly_reports(client, token, rng):
+    return client.request("get", "/weekly-reports/", token=token)
+
+
+SCENARIOS = {
+    "create": _create,
+    "list": _list,
+    "search": _search,
+    "weekly-reports": _weekly_reports,
+}
+
+
+def run_scenario(client, scenario, tokens, total, clients, rng,
+                 query_counter=None):
+    """Sends ``total`` requests of the ``scenario`` from a pool of
+    ``clients`` threads, each one on behalf of a random user."""
+    make_request = SCENARIOS[scenario]
+    jobs = [(rng.choice(tokens), random.Random(rng.random()))
+            for _ in range(total)]
+
+    def timed(job):
+        token, job_rng = job
+        start = time.perf_counter()
+        try:
+            response = make_request(client, token, job_rng)
+        except requests.RequestException:
+            return time.perf_counter()-start, False, None
+        queries = queries_from_server_timing(
+            response.headers.get("Server-Timing")
+        )
+        return time.perf_counter()-start, response.ok, queries
+
+    queries0 = query_counter.count if query_counter else None
+    commits0 = query_counter.commits if query_counter else None
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(timed, jobs))
+    elapsed = time.perf_counter()-start
+    latencies = [latency*1000 for latency, _, _ in results]
+    reported_queries = [q for _, _, q in results if q is not None]
+    result = {
+        "requests": total,
+        "errors": sum(1 for _, ok, _ in results if not ok),
+        "seconds": round(elapsed, 4),
+        "throughput_rps": round(total/elapsed, 2),
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "queries_per_request": None,
+        "commits_per_request": None,
+    }
+    if query_counter:
+        result["queries_per_request"] = round(
+            (query_counter.count-queries0)/total, 2
+        )
+        result["commits_per_request"] = round(
+            (query_counter.commits-commits0)/total, 2
+        )
+    elif len(reported_queries) == total:
+        result["queries_per_request"] = round(
+            sum(reported_queries)/total, 2
+        )
+    return result
+
+
+def run_benchmark(base_url, users, runs_per_user, clients, requests_count,
+                  scenarios=None, seed_value=0, query_counter=None):
+    rng = random.Random(seed_value)
+    client = Client(base_url)
+    tokens = seed(client, users, runs_per_user, rng)
+    results = {}
+    for scenario in scenarios or SCENARIOS:
+        results[scenario] = run_scenario(
+            client, scenario, tokens, requests_count, clients, rng,
+            query_counter
+        )
+    return results
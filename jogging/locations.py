@@ -0,0 +1,56 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+"""The places of the runs are stored once, in ``Location``; runs refer to
+them by id. Names are matched by their normalized ``key`` (case and
+spacing are ignored), the first spelling seen is kept as the name."""
+
+
+from .dimensions import get_or_create_many
+
+
+def location_key(name):
+    return " ".join(name.split()).casefold()
+
+
+def get_locations(names):
+    """Maps each name in ``names`` to its ``Location``, creating the
+    missing ones."""
+    from jogging.models import Location
+    names = list(dict.fromkeys(names))
+    new = {}
+    for name in names:
+        key = location_key(name)
+        if key not in new:
+            new[key] = Location(name=" ".join(name.split()), key=key)
+    found = get_or_create_many(Location, "key", new)
+    return {name: found[location_key(name)] for name in names}
+
+
+def resolve_locations(runs):
+    """Sets the place of the ``runs`` whose location was given by name."""
+    runs = [run for run in runs if run.pending_location is not None]
+    if not runs:
+        return
+    locations = get_locations(run.pending_location for run in runs)
+    for run in runs:
+        run.place = locations[run.pending_location]
+        run.pending_location = None
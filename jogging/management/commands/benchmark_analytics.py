@@ -0,0 +1,130 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jogging.analytics import (
+    ACUTE_DAYS, CHRONIC_DAYS, PERCENTILES, load_run_columns,
+    compute_analytics,
+)
+from jogging.columnar import build_run_snapshot
+from jogging.models import Run
+from jogging.synthetic import synthetic_run_data
+
+
+def row_by_row(runs, as_of, series_days):
+    """The same metrics as compute_analytics, looping over the runs in
+    Python (baseline of the benchmark)."""
+    runs = [run for run in runs if run[0] <= as_of]
+    series = []
+    for back in range(series_days-1, -1, -1):
+        day = as_of-timedelta(days=back)
+        acute = sum(
+            d for (when, d, t) in runs
+            if 0 <= (day-when).days < ACUTE_DAYS
+        )
+        chronic = sum(
+            d for (when, d, t) in runs
+            if 0 <= (day-when).days < CHRONIC_DAYS
+        )
+        ratio = (
+            (acute/ACUTE_DAYS)/(chronic/CHRONIC_DAYS) if chronic else None
+        )
+        series.append((day, acute, chronic, ratio))
+    paces = [
+        t.total_seconds()/d for (when, d, t) in runs
+        if d > 0 and t.total_seconds() > 0
+    ]
+    quantiles = statistics.quantiles(paces, n=100, method="inclusive")
+    percentiles = [quantiles[p-1] for p in PERCENTILES]
+    x = [(when-as_of).days for (when, d, t) in runs]
+    trend = statistics.linear_regression(x, [d for (w, d, t) in runs])
+    return series, percentiles, trend
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the analytics of one user with a long history (on a "
+        "temporary database): building the run snapshot, loading it, the "
+        "vectorized metrics and a row by row Python baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=10000)
+        parser.add_argument("--repeat", type=int, default=10)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            connections.close_all()
+            connections.databases["default"]["NAME"] = os.path.join(
+                tmpdir, "benchmark.sqlite3"
+            )
+            try:
+                call_command("migrate", verbosity=0)
+                self.benchmark(options)
+            finally:
+                connections.close_all()
+
+    def benchmark(self, options):
+        rng = random.Random(options["seed"])
+        as_of = date.today()
+        owner = User.objects.create(username="analytics-benchmark")
+        Run.objects.bulk_create(
+            (
+                Run(owner=owner, **data) for data in synthetic_run_data(
+                    options["runs"], rng, as_of, days=options["runs"]//3
+                )
+            ),
+            batch_size=1000,
+        )
+        rows = list(
+            Run.objects.filter(owner=owner).values_list(
+                "date", "distance", "time"
+            )
+        )
+        phases = {
+            "snapshot": lambda: build_run_snapshot(owner.pk),
+            "load": lambda: load_run_columns(owner),
+            "numpy": lambda: compute_analytics(columns, as_of),
+            "python": lambda: row_by_row(rows, as_of, CHRONIC_DAYS),
+        }
+        columns = load_run_columns(owner)
+        for name, phase in phases.items():
+            elapsed = []
+            for _ in range(options["repeat"]):
+                start = time.perf_counter()
+                phase()
+                elapsed.append(time.perf_counter()-start)
+            self.stdout.write(
+                f"{name:>8}: {1000*statistics.median(elapsed):9.2f} ms "
+                f"(median of {options['repeat']}, {len(rows)} runs)"
+            )
@@ -0,0 +1,128 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+import json
+import os
+import subprocess
+import tempfile
+from datetime import datetime, timezone
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test.testcases import LiveServerThread
+
+from jogging.loadtest import QueryCounter, SCENARIOS, run_benchmark
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds synthetic users and runs and drives the API endpoints with "
+        "a pool of concurrent clients, reporting throughput, latency "
+        "percentiles and queries per request. Without --url a server on a "
+        "temporary database is started in-process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", help="base url of a running server")
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument("--runs", type=int, default=100,
+                            help="runs per user")
+        parser.add_argument("--clients", type=int, default=4)
+        parser.add_argument("--requests", type=int, default=200,
+                            help="requests per scenario")
+        parser.add_argument("--scenario", action="append",
+                            choices=list(SCENARIOS), dest="scenarios")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="JSON file for the results")
+
+    def handle(self, *args, **options):
+        benchmark_args = dict(
+            users=options["users"],
+            runs_per_user=options["runs"],
+            clients=options["clients"],
+            requests_count=options["requests"],
+            scenarios=options["scenarios"],
+            seed_value=options["seed"],
+        )
+        if options["url"]:
+            results = run_benchmark(options["url"], **benchmark_args)
+        else:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                results = self.run_in_process(tmpdir, benchmark_args)
+        report = {
+            "revision": git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "config": {
+                key: options[key] for key in (
+                    "url", "users", "runs", "clients", "requests", "seed"
+                )
+            },
+            "scenarios": results,
+        }
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:>15}: {result['throughput_rps']:8.1f} req/s  "
+                f"p50 {result['p50_ms']:7.1f} ms  "
+                f"p95 {result['p95_ms']:7.1f} ms  "
+                f"p99 {result['p99_ms']:7.1f} ms  "
+                f"queries/req {result['queries_per_request']}  "
+                f"commits/req {result['commits_per_request']}  "
+                f"errors {result['errors']}"
+            )
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+
+    def run_in_process(self, tmpdir, benchmark_args):
+        connections.close_all()
+        connections.databases["default"]["NAME"] = os.path.join(
+            tmpdir, "benchmark.sqlite3"
+        )
+        call_command("migrate", verbosity=0)
+        counter = QueryCounter()
+        connection_created.connect(counter.install)
+        server = LiveServerThread("localhost", lambda handler: handler)
+        server.daemon = True
+        server.start()
+        server.is_ready.wait()
+        if server.error:
+            raise server.error
+        try:
+            return run_benchmark(
+                f"http://localhost:{server.port}", query_counter=counter,
+                **benchmark_args
+            )
+        finally:
+            server.terminate()
+            connection_created.disconnect(counter.install)
+            connections.close_all()
@@ -0,0 +1,210 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+import json
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.core.servers.basehttp import WSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.test import override_settings
+import uvicorn
+
+from jogging.loadtest import Client, run_scenario, seed
+
+
+SCENARIOS = ("create", "list")
+
+
+class SlowMetaWeatherHandler(BaseHTTPRequestHandler):
+    """MetaWeather compatible API answering after ``server.latency``
+    seconds."""
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        if self.path.startswith("/api/location/search/"):
+            body = [{"woeid": 1}]
+        else:
+            day = "-".join(
+                f"{int(part):02d}" for part in self.path.split("/")[4:7]
+            )
+            body = [{"applicable_date": day, "weather_state_name": "Clear"}]
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class PooledWSGIServer(WSGIServer):
+    """WSGI server handling the requests in a fixed number of threads, like
+    a threaded gunicorn worker."""
+
+    def __init__(self, *args, threads, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False)
+
+
+class QuietWSGIRequestHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def serve_in_thread(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return thread
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the sync (WSGI, bounded thread pool) and async (ASGI) run "
+        "endpoints on a temporary database, with a MetaWeather stand-in "
+        "that answers after --weather-latency seconds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=4)
+        parser.add_argument("--runs", type=int, default=20,
+                            help="runs per user")
+        parser.add_argument("--clients", type=int, default=32)
+        parser.add_argument("--requests", type=int, default=200,
+                            help="requests per scenario")
+        parser.add_argument("--threads", type=int, default=4,
+                            help="threads of the WSGI server")
+        parser.add_argument("--weather-latency", type=float, default=0.1,
+                            help="seconds per weather API call")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="JSON file for the results")
+
+    def handle(self, *args, **options):
+        weather_server = ThreadingHTTPServer(
+            ("localhost", 0), SlowMetaWeatherHandler
+        )
+        weather_server.daemon_threads = True
+        weather_server.latency = 0
+        serve_in_thread(weather_server)
+        weather = {
+            "PROVIDER": "meta_weather",
+            "BASE_URL": f"http://localhost:{weather_server.server_port}/api/",
+        }
+        try:
+            with tempfile.TemporaryDirectory() as tmpdir, \
+                    override_settings(WEATHER=weather):
+                results = self.run_in_process(tmpdir, weather_server, options)
+        finally:
+            weather_server.shutdown()
+            weather_server.server_close()
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:>12}: {result['throughput_rps']:8.1f} req/s  "
+                f"p50 {result['p50_ms']:8.1f} ms  "
+                f"p95 {result['p95_ms']:8.1f} ms  "
+                f"errors {result['errors']}"
+            )
+        if options["output"]:
+            report = {
+                "config": {
+                    key: options[key] for key in (
+                        "users", "runs", "clients", "requests", "threads",
+                        "weather_latency", "seed"
+                    )
+                },
+                "scenarios": results,
+            }
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+
+    def run_in_process(self, tmpdir, weather_server, options):
+        connections.close_all()
+        connections.databases["default"]["NAME"] = os.path.join(
+            tmpdir, "benchmark.sqlite3"
+        )
+        call_command("migrate", verbosity=0)
+        wsgi_server = PooledWSGIServer(
+            ("localhost", 0), QuietWSGIRequestHandler,
+            threads=options["threads"]
+        )
+        wsgi_server.set_app(get_wsgi_application())
+        serve_in_thread(wsgi_server)
+        asgi_socket = socket.socket()
+        asgi_socket.bind(("localhost", 0))
+        from JoggingStats.asgi import application
+        asgi_server = uvicorn.Server(uvicorn.Config(
+            application, lifespan="off", log_level="warning"
+        ))
+        asgi_thread = threading.Thread(
+            target=asgi_server.run, kwargs={"sockets": [asgi_socket]},
+            daemon=True
+        )
+        asgi_thread.start()
+        while not asgi_server.started:
+            time.sleep(0.01)
+        try:
+            rng = random.Random(options["seed"])
+            wsgi = Client(f"http://localhost:{wsgi_server.server_port}")
+            asgi = Client(
+                f"http://localhost:{asgi_socket.getsockname()[1]}/async"
+            )
+            tokens = seed(wsgi, options["users"], options["runs"], rng)
+            weather_server.latency = options["weather_latency"]
+            results = {}
+            for scenario in SCENARIOS:
+                for name, client in (("wsgi", wsgi), ("asgi", asgi)):
+                    results[f"{name}-{scenario}"] = run_scenario(
+                        client, scenario, tokens, options["requests"],
+                        options["clients"], rng
+                    )
+            return results
+        finally:
+            asgi_server.should_exit = True
+            asgi_thread.join()
+            wsgi_server.shutdown()
+            wsgi_server.server_close()
+            connections.close_all()
@@ -0,0 +1,117 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from jogging.db import apply_sqlite_pragmas
+
+
+CREATE_TABLE = (
+    "CREATE TABLE run (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+    "date TEXT, distance REAL, time INTEGER, location TEXT, "
+    "owner_id INTEGER, weather TEXT)"
+)
+INSERT = (
+    "INSERT INTO run (date, distance, time, location, owner_id, weather) "
+    "VALUES ('2020-10-14', ?, 3600000000, 'Berlin', ?, 'Clear')"
+)
+
+
+def run_writers(path, threads, writes, pragmas, timeout):
+    """Each thread opens its own connection and commits ``writes`` single
+    row inserts. Returns (elapsed seconds, committed writes, lock errors).
+    """
+    committed = []
+    errors = []
+    barrier = threading.Barrier(threads)
+
+    def writer(ithread):
+        conn = sqlite3.connect(path, timeout=timeout)
+        apply_sqlite_pragmas(conn, pragmas)
+        barrier.wait()
+        ok = failed = 0
+        for i in range(writes):
+            try:
+                conn.execute(INSERT, (i/10, ithread))
+                conn.commit()
+                ok += 1
+            except sqlite3.OperationalError:
+                conn.rollback()
+                failed += 1
+        conn.close()
+        committed.append(ok)
+        errors.append(failed)
+
+    workers = [
+        threading.Thread(target=writer, args=(i,)) for i in range(threads)
+    ]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter()-start, sum(committed), sum(errors)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures concurrent SQLite write throughput with the default "
+        "connection setup and with settings.SQLITE_PRAGMAS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--writes", type=int, default=200)
+        parser.add_argument(
+            "--timeout", type=float, default=5.0,
+            help="sqlite3 connect timeout of the default setup (seconds)"
+        )
+
+    def handle(self, *args, **options):
+        tuned = dict(getattr(settings, "SQLITE_PRAGMAS", {}))
+        setups = (
+            ("default", {}, options["timeout"]),
+            ("tuned", tuned, tuned.get("busy_timeout", 5000)/1000),
+        )
+        for name, pragmas, timeout in setups:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                path = os.path.join(tmpdir, "bench.sqlite3")
+                conn = sqlite3.connect(path)
+                apply_sqlite_pragmas(conn, pragmas)
+                conn.execute(CREATE_TABLE)
+                conn.commit()
+                conn.close()
+                elapsed, committed, errors = run_writers(
+                    path, options["threads"], options["writes"], pragmas,
+                    timeout
+                )
+            self.stdout.write(
+                f"{name:>8}: {committed/elapsed:9.1f} writes/s "
+                f"({committed} committed, {errors} locked) "
+                f"in {elapsed:.2f}s with {options['threads']} threads"
+            )
@@ -0,0 +1,136 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+import multiprocessing
+import random
+import time
+from datetime import date
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from jogging.bulk import rebuild_weekly_reports
+from jogging.models import Run
+from jogging.records import rebuild_run_records
+from jogging.synthetic import synthetic_runner, synthetic_history
+from jogging.totals import rebuild_daily_totals
+from jogging.versions import recount_runs
+
+
+def insert_runs(task):
+    """Generates and inserts the runs of some users. ``task`` is a tuple
+    ``(users, weeks, end_date, seed, batch_size)`` where ``users`` is a
+    list of ``(index, user_id)``. Returns the number of runs inserted."""
+    users, weeks, end_date, seed, batch_size = task
+    count = 0
+    batch = []
+    for index, user_id in users:
+        # seeded per user: the result does not depend on the processes
+        rng = random.Random(f"{seed}-{index}")
+        runner = synthetic_runner(rng)
+        for run in synthetic_history(runner, rng, weeks, end_date):
+            batch.append(Run(owner_id=user_id, **run))
+            if len(batch) >= batch_size:
+                count += _flush(batch)
+    count += _flush(batch)
+    connections.close_all()
+    return count
+
+
+def _flush(batch):
+    Run.objects.resolve(batch)
+    with transaction.atomic():
+        Run.objects.bulk_create(batch)
+    count = len(batch)
+    batch.clear()
+    return count
+
+
+class Command(BaseCommand):
+    help = (
+        "Populates the database with synthetic users and runs (weather is "
+        "not fetched). Weekly reports are built at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--weeks", type=int, default=52)
+        parser.add_argument("--batch-size", type=int, default=20000)
+        parser.add_argument("--processes", type=int, default=1)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--prefix", default="synthetic",
+            help="prefix of the usernames (must not be in use)"
+        )
+        parser.add_argument(
+            "--end-date", type=date.fromisoformat, default=date.today(),
+            help="date of the last possible run (YYYY-MM-DD)"
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        user_ids = self.create_users(options["prefix"], options["users"])
+        indexed = list(enumerate(user_ids))
+        processes = max(options["processes"], 1)
+        tasks = [
+            (indexed[i::processes], options["weeks"], options["end_date"],
+             options["seed"], options["batch_size"])
+            for i in range(processes)
+        ]
+        if processes > 1:
+            # the workers must open their own connections:
+            connections.close_all()
+            context = multiprocessing.get_context("fork")
+            with context.Pool(processes) as pool:
+                counts = pool.map(insert_runs, tasks)
+        else:
+            counts = [insert_runs(task) for task in tasks]
+        runs_time = time.perf_counter()-start
+        rebuild_weekly_reports(user_ids)
+        rebuild_daily_totals(user_ids)
+        recount_runs(user_ids)
+        for user_id in user_ids:
+            rebuild_run_records(user_id)
+        total_time = time.perf_counter()-start
+        runs = sum(counts)
+        self.stdout.write(
+            f"{len(user_ids)} users and {runs} runs in {runs_time:.1f}s "
+            f"({runs/runs_time:.0f} runs/s); weekly reports built in "
+            f"{total_time-runs_time:.1f}s"
+        )
+
+    def create_users(self, prefix, count):
+        password = make_password(None)
+        users = [
+            User(username=f"{prefix}-{i}", password=password)
+            for i in range(count)
+        ]
+        with transaction.atomic():
+            User.objects.bulk_create(users, batch_size=1000)
+        # (bulk_create does not return the pks with all the backends)
+        ids = dict(
+            User.objects.filter(
+                username__startswith=f"{prefix}-"
+            ).values_list("username", "id")
+        )
+        return [ids[user.username] for user in users]
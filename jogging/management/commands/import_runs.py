@@ -0,0 +1,67 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from jogging.bulk import import_runs
+from jogging.importers import (
+    FORMATS, RunImportError, detect_format, iter_runs,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports the runs of a user from a CSV or GPX file, streaming it "
+        "in batches, and reports the rows per second."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument("path")
+        parser.add_argument(
+            "--format", choices=FORMATS,
+            help="default: from the extension of the file"
+        )
+        parser.add_argument(
+            "--location",
+            help="location of the runs (required for GPX files)"
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            owner = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"Unknown user {options['username']!r}")
+        try:
+            format = options["format"] or detect_format(options["path"])
+            with open(options["path"], "rb") as stream:
+                count, elapsed = import_runs(
+                    owner, iter_runs(stream, format, options["location"]),
+                    batch_size=options["batch_size"]
+                )
+        except (OSError, RunImportError) as e:
+            raise CommandError(str(e))
+        rate = count/elapsed if elapsed else 0
+        self.stdout.write(
+            f"Imported {count} runs in {elapsed:.2f}s ({rate:.0f} rows/s)"
+        )
@@ -0,0 +1,70 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+from collections import Counter
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from jogging.profiling import SUFFIX, profiler_settings, read_profile
+
+
+class Command(BaseCommand):
+    help = (
+        "Merges the collapsed stacks stored by the sampling profiler into "
+        "one file for flamegraph.pl, speedscope or inferno."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "endpoints", nargs="*",
+            help="endpoints to merge (e.g. RunViewSet.list); default all"
+        )
+        parser.add_argument(
+            "--directory", help="default: settings.PROFILER['DIRECTORY']"
+        )
+        parser.add_argument("--output", default="profile.collapsed")
+
+    def handle(self, *args, **options):
+        directory = Path(
+            options["directory"] or profiler_settings()["DIRECTORY"]
+        )
+        if not directory.is_dir():
+            raise CommandError(f"No profiles in {directory}")
+        endpoints = options["endpoints"] or sorted(
+            path.name for path in directory.iterdir() if path.is_dir()
+        )
+        stacks = Counter()
+        nfiles = 0
+        for endpoint in endpoints:
+            for filename in sorted((directory/endpoint).glob(f"*{SUFFIX}")):
+                for stack, count in read_profile(filename).items():
+                    stacks[f"{endpoint};{stack}"] += count
+                nfiles += 1
+        if not nfiles:
+            raise CommandError(f"No profiles in {directory}")
+        with open(options["output"], "w") as f:
+            for stack, count in sorted(stacks.items()):
+                f.write(f"{stack} {count}\n")
+        self.stdout.write(
+            f"Merged {nfiles} profiles ({sum(stacks.values())} samples) "
+            f"into {options['output']}"
+        )
@@ -0,0 +1,229 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+import asyncio
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import ContextDecorator
+
+
+DURATION_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+QUERIES_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    """Timings (seconds) per phase and queries of one request."""
+
+    def __init__(self):
+        self.timings = {}
+        self.queries = 0
+
+    def add(self, phase, seconds):
+        self.timings[phase] = self.timings.get(phase, 0)+seconds
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.add("db", time.perf_counter()-start)
+
+    def server_timing(self, total):
+        """Value of the ``Server-Timing`` header."""
+        items = [f"total;dur={total*1000:.2f}"]
+        for phase, seconds in sorted(self.timings.items()):
+            item = f"{phase};dur={seconds*1000:.2f}"
+            if phase == "db":
+                item += f';desc="{self.queries} queries"'
+            items.append(item)
+        if "db" not in self.timings:
+            items.append('db;dur=0.00;desc="0 queries"')
+        return ", ".join(items)
+
+
+class timed(ContextDecorator):
+    """Adds the time spent in a block (or decorated function) to the
+    ``phase`` of the current request, if any."""
+
+    def __init__(self, phase):
+        self.phase = phase
+        self.start = None
+
+    def _recreate_cm(self):
+        # a fresh instance per call of the decorated function
+        return type(self)(self.phase)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.add(self.phase, time.perf_counter()-self.start)
+        return False
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0]*(len(buckets)+1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets+("+Inf",), self.counts):
+            total += count
+            yield bound, total
+
+
+class Registry:
+    """In-process histograms of the request metrics."""
+
+    DURATION = "jogging_request_duration_seconds"
+    QUERIES = "jogging_request_queries"
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, endpoint, metrics, total):
+        with self._lock:
+            self._histogram(
+                self.DURATION, DURATION_BUCKETS, endpoint=endpoint,
+                phase="total"
+            ).observe(total)
+            for phase, seconds in metrics.timings.items():
+                self._histogram(
+                    self.DURATION, DURATION_BUCKETS, endpoint=endpoint,
+                    phase=phase
+                ).observe(seconds)
+            self._histogram(
+                self.QUERIES, QUERIES_BUCKETS, endpoint=endpoint
+            ).observe(metrics.queries)
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def _histogram(self, name, buckets, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        if key not in self._histograms:
+            self._histograms[key] = Histogram(buckets)
+        return self._histograms[key]
+
+    def prometheus(self, counters=()):
+        """Text exposition format. ``counters`` are extra
+        ``(name, value)`` pairs."""
+        lines = []
+        with self._lock:
+            names = sorted({name for name, _ in self._histograms})
+            for name in names:
+                lines.append(f"# TYPE {name} histogram")
+                for (hname, labels), hist in sorted(self._histograms.items()):
+                    if hname != name:
+                        continue
+                    base = ",".join(f'{k}="{v}"' for k, v in labels)
+                    for bound, count in hist.cumulative():
+                        lines.append(
+                            f'{name}_bucket{{{base},le="{bound}"}} {count}'
+                        )
+                    lines.append(f"{name}_sum{{{base}}} {hist.sum}")
+                    lines.append(f"{name}_count{{{base}}} {hist.count}")
+        for name, value in counters:
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines)+"\n"
+
+
+registry = Registry()
+
+
+def record_queries(execute, sql, params, many, context):
+    """Database execute wrapper adding the queries to the metrics of the
+    current request (also from the threads running its sync code)."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics.db_wrapper(execute, sql, params, many, context)
+
+
+def install_query_metrics(sender, connection, **kwargs):
+    """Handler of ``connection_created``."""
+    connection.execute_wrappers.append(record_queries)
+
+
+class MetricsMiddleware:
+    """Measures every request (total time, time and number of queries and
+    the phases marked with :class:`timed`), sends the measures in the
+    ``Server-Timing`` header and aggregates them in ``registry``. Works
+    with sync (WSGI) and async (ASGI) request handling."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # makes Django treat this instance as a coroutine function
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self._acall(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, metrics, start)
+
+    async def _acall(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, metrics, start)
+
+    def _finish(self, request, response, metrics, start):
+        total = time.perf_counter()-start
+        match = request.resolver_match
+        endpoint = (match and match.url_name) or "unknown"
+        registry.observe(endpoint, metrics, total)
+        response["Server-Timing"] = metrics.server_timing(total)
+        return response
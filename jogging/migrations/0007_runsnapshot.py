@@ -0,0 +1,24 @@
+# Generated by Django 3.1.2 on 2026-10-19 18:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('jogging', '0006_dataversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RunSnapshot',
+            fields=[
+                ('owner', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='jogging_runsnapshot', serialize=False, to='auth.user')),
+                ('version', models.PositiveIntegerField()),
+                ('data', models.BinaryField()),
+                ('locations', models.JSONField(default=list)),
+            ],
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 3.1.2 on 2026-10-19 18:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# as jogging.records, frozen for this migration:
+RACE_DISTANCES = {
+    "5k": 5,
+    "10k": 10,
+    "half_marathon": 21.0975,
+    "marathon": 42.195,
+}
+
+
+def build_records(apps, schema_editor):
+    PersonalRecord = apps.get_model("jogging", "PersonalRecord")
+    Run = apps.get_model("jogging", "Run")
+    WeeklyReport = apps.get_model("jogging", "WeeklyReport")
+    best = {}
+    runs = Run.objects.order_by("id").values_list(
+        "owner_id", "id", "distance", "time"
+    )
+    for owner_id, pk, distance, time in runs.iterator():
+        seconds = time.total_seconds()
+        for kind, target in RACE_DISTANCES.items():
+            if distance < target or seconds <= 0:
+                continue
+            value = seconds*target/distance
+            current = best.get((owner_id, kind))
+            if current is None or value < current.value:
+                best[(owner_id, kind)] = PersonalRecord(
+                    owner_id=owner_id, kind=kind, value=value, run_id=pk
+                )
+        current = best.get((owner_id, "longest_run"))
+        if current is None or distance > current.value:
+            best[(owner_id, "longest_run")] = PersonalRecord(
+                owner_id=owner_id, kind="longest_run", value=distance,
+                run_id=pk
+            )
+    reports = WeeklyReport.objects.order_by("week_start").values_list(
+        "owner_id", "week_start", "total_distance_km"
+    )
+    for owner_id, week_start, distance in reports.iterator():
+        current = best.get((owner_id, "biggest_week"))
+        if current is None or distance > current.value:
+            best[(owner_id, "biggest_week")] = PersonalRecord(
+                owner_id=owner_id, kind="biggest_week", value=distance,
+                week_start=week_start
+            )
+    PersonalRecord.objects.bulk_create(best.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('jogging', '0007_runsnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersonalRecord',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('5k', 'Fastest 5k'), ('10k', 'Fastest 10k'), ('half_marathon', 'Fastest half marathon'), ('marathon', 'Fastest marathon'), ('longest_run', 'Longest run'), ('biggest_week', 'Biggest week')], max_length=16)),
+                ('value', models.FloatField()),
+                ('week_start', models.DateField(null=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jogging_personalrecord', to=settings.AUTH_USER_MODEL)),
+                ('run', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='jogging.run')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='personalrecord',
+            constraint=models.UniqueConstraint(fields=('owner', 'kind'), name='one_record_per_kind_and_owner'),
+        ),
+        migrations.RunPython(build_records, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 3.1.2 on 2026-10-19 18:19
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def period_start(period, day):
+    # as jogging.leaderboards.period_start, frozen for this migration
+    if period == "week":
+        return day-timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def build_boards(apps, schema_editor):
+    LeaderboardEntry = apps.get_model("jogging", "LeaderboardEntry")
+    WeeklyReport = apps.get_model("jogging", "WeeklyReport")
+    totals = defaultdict(lambda: defaultdict(float))
+    reports = WeeklyReport.objects.values_list(
+        "owner_id", "week_start", "total_distance_km"
+    )
+    for owner_id, week_start, distance in reports.iterator():
+        totals[("week", week_start)][owner_id] += distance
+        totals[("month", period_start("month", week_start))][owner_id] += (
+            distance
+        )
+    LeaderboardEntry.objects.bulk_create(
+        [
+            LeaderboardEntry(
+                period=period, period_start=start, owner_id=owner_id,
+                distance=distance, rank=rank
+            )
+            for (period, start), board in totals.items()
+            for rank, (owner_id, distance) in enumerate(
+                sorted(board.items(), key=lambda item: (-item[1], item[0])),
+                start=1
+            )
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('jogging', '0008_personalrecord'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('week', 'Week'), ('month', 'Month')], max_length=5)),
+                ('period_start', models.DateField()),
+                ('distance', models.FloatField()),
+                ('rank', models.PositiveIntegerField()),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jogging_leaderboardentry', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardentry',
+            index=models.Index(fields=['period', 'period_start', 'rank'], name='leaderboard_rank_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='leaderboardentry',
+            constraint=models.UniqueConstraint(fields=('period', 'period_start', 'owner'), name='one_entry_per_period_and_owner'),
+        ),
+        migrations.RunPython(build_boards, migrations.RunPython.noop),
+    ]
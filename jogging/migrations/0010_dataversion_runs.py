@@ -0,0 +1,32 @@
+# Generated by Django 3.1.2 on 2026-10-19 18:48
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_runs(apps, schema_editor):
+    DataVersion = apps.get_model("jogging", "DataVersion")
+    Run = apps.get_model("jogging", "Run")
+    counts = Run.objects.order_by().values("owner_id").annotate(
+        count=Count("id")
+    )
+    for row in counts:
+        DataVersion.objects.update_or_create(
+            owner_id=row["owner_id"], defaults={"runs": row["count"]}
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jogging', '0009_leaderboardentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataversion',
+            name='runs',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_runs, migrations.RunPython.noop),
+    ]
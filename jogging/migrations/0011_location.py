@@ -0,0 +1,100 @@
+# Generated by Django 3.1.2 on 2026-10-19 20:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+BATCH_SIZE = 500
+
+
+def location_key(name):
+    # as jogging.locations.location_key, frozen for this migration
+    return " ".join(name.split()).casefold()
+
+
+def fill_places(apps, schema_editor):
+    Location = apps.get_model("jogging", "Location")
+    Run = apps.get_model("jogging", "Run")
+    # the first spelling seen (lowest run id) of each location is kept:
+    names = list(
+        Run.objects.values("location").annotate(
+            first=models.Min("id")
+        ).order_by("first").values_list("location", flat=True)
+    )
+    keys = {}
+    for name in names:
+        keys.setdefault(location_key(name), " ".join(name.split()))
+    Location.objects.bulk_create(
+        [Location(name=name, key=key) for key, name in keys.items()],
+        batch_size=BATCH_SIZE, ignore_conflicts=True
+    )
+    ids = dict(Location.objects.values_list("key", "id"))
+    # the ids of the names, to set all the places with one statement:
+    qn = schema_editor.quote_name
+    table = qn("jogging_location_name")
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TEMPORARY TABLE {table} ("
+            f"{qn('name')} varchar(256) PRIMARY KEY, "
+            f"{qn('location_id')} integer NOT NULL)"
+        )
+        cursor.executemany(
+            f"INSERT INTO {table} VALUES (%s, %s)",
+            [(name, ids[location_key(name)]) for name in names]
+        )
+        cursor.execute(
+            f"UPDATE {qn(Run._meta.db_table)} SET {qn('place_id')} = ("
+            f"SELECT {qn('location_id')} FROM {table} "
+            f"WHERE {table}.{qn('name')} = "
+            f"{qn(Run._meta.db_table)}.{qn('location')})"
+        )
+        cursor.execute(f"DROP TABLE {table}")
+
+
+def fill_locations(apps, schema_editor):
+    Location = apps.get_model("jogging", "Location")
+    Run = apps.get_model("jogging", "Run")
+    Run.objects.update(location=models.Subquery(
+        Location.objects.filter(id=models.OuterRef("place_id")).values(
+            "name"
+        )[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jogging', '0010_dataversion_runs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=256)),
+                ('key', models.CharField(max_length=256, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='run',
+            name='place',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='runs', to='jogging.location'),
+        ),
+        # (only to be able to add it back before filling it)
+        migrations.AlterField(
+            model_name='run',
+            name='location',
+            field=models.CharField(max_length=256, null=True),
+        ),
+        migrations.RunPython(fill_places, fill_locations),
+        migrations.RemoveField(
+            model_name='run',
+            name='location',
+        ),
+        migrations.AlterField(
+            model_name='run',
+            name='place',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='runs', to='jogging.location'),
+        ),
+    ]
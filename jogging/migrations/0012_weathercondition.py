@@ -0,0 +1,83 @@
+# Generated by Django 3.1.2 on 2026-10-19 21:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+BATCH_SIZE = 500
+# as jogging.conditions, frozen for this migration:
+UNKNOWN_WEATHER = "?"
+META_WEATHER_STATES = (
+    "Snow", "Sleet", "Hail", "Thunderstorm", "Heavy Rain", "Light Rain",
+    "Showers", "Heavy Cloud", "Light Cloud", "Clear",
+)
+
+
+def fill_conditions(apps, schema_editor):
+    WeatherCondition = apps.get_model("jogging", "WeatherCondition")
+    Run = apps.get_model("jogging", "Run")
+    names = set(
+        Run.objects.order_by().values_list("weather", flat=True).distinct()
+    )
+    names.update(META_WEATHER_STATES, [UNKNOWN_WEATHER])
+    names = sorted(names)
+    for start in range(0, len(names), BATCH_SIZE):
+        batch = names[start:start+BATCH_SIZE]
+        WeatherCondition.objects.bulk_create(
+            [WeatherCondition(name=name) for name in batch],
+            ignore_conflicts=True
+        )
+        ids = dict(
+            WeatherCondition.objects.filter(name__in=batch).values_list(
+                "name", "id"
+            )
+        )
+        for name in batch:
+            Run.objects.filter(weather=name).update(condition_id=ids[name])
+
+
+def fill_weather(apps, schema_editor):
+    WeatherCondition = apps.get_model("jogging", "WeatherCondition")
+    Run = apps.get_model("jogging", "Run")
+    for condition in WeatherCondition.objects.iterator():
+        Run.objects.filter(condition_id=condition.id).update(
+            weather=condition.name
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jogging', '0011_location'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeatherCondition',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=128, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='run',
+            name='condition',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='runs', to='jogging.weathercondition'),
+        ),
+        # (only to be able to add it back before filling it)
+        migrations.AlterField(
+            model_name='run',
+            name='weather',
+            field=models.CharField(default='?', max_length=128, null=True),
+        ),
+        migrations.RunPython(fill_conditions, fill_weather),
+        migrations.RemoveField(
+            model_name='run',
+            name='weather',
+        ),
+        migrations.AlterField(
+            model_name='run',
+            name='condition',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='runs', to='jogging.weathercondition'),
+        ),
+    ]
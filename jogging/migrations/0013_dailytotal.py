@@ -0,0 +1,54 @@
+# Generated by Django 3.1.2 on 2026-10-19 21:40
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+import django.db.models.deletion
+
+
+def build_totals(apps, schema_editor):
+    DailyTotal = apps.get_model("jogging", "DailyTotal")
+    Run = apps.get_model("jogging", "Run")
+    rows = Run.objects.values_list("owner_id", "date").annotate(
+        Sum("distance"), Sum("time"), Count("id")
+    ).order_by("owner_id", "date")
+    totals = []
+    last_owner = None
+    for owner_id, day, distance, time, runs in rows.iterator():
+        if owner_id != last_owner:
+            last_owner, total = owner_id, [0.0, 0.0, 0]
+        total[0] += distance
+        total[1] += time.total_seconds()
+        total[2] += runs
+        totals.append(DailyTotal(
+            owner_id=owner_id, date=day, distance=total[0],
+            seconds=total[1], runs=total[2]
+        ))
+    DailyTotal.objects.bulk_create(totals, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('jogging', '0012_weathercondition'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyTotal',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('distance', models.FloatField()),
+                ('seconds', models.FloatField()),
+                ('runs', models.PositiveIntegerField()),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jogging_dailytotal', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='dailytotal',
+            constraint=models.UniqueConstraint(fields=('owner', 'date'), name='one_total_per_day_and_owner'),
+        ),
+        migrations.RunPython(build_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.1.2 on 2026-10-19 19:32
+
+from django.db import migrations
+
+
+def drop_snapshots(apps, schema_editor):
+    # packed with the previous layout: rebuilt on the next read
+    RunSnapshot = apps.get_model("jogging", "RunSnapshot")
+    RunSnapshot.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jogging', '0013_dailytotal'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_snapshots, drop_snapshots),
+        migrations.RemoveField(
+            model_name='runsnapshot',
+            name='locations',
+        ),
+    ]
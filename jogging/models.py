@@ -22,29 +22,115 @@
 
 from datetime import timedelta
 
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 
+from .conditions import UNKNOWN_WEATHER, resolve_conditions
+from .locations import resolve_locations
 from .weather import get_weather
 
 
 ONEDAY = timedelta(days=1)
 
 
+class Location(models.Model):
+    """A place where runs happen (see ``jogging.locations``)."""
+    name = models.CharField(max_length=256)
+    key = models.CharField(max_length=256, unique=True)
+
+
+class WeatherCondition(models.Model):
+    """A weather state, as named by the provider (see
+    ``jogging.conditions``)."""
+    name = models.CharField(max_length=128, unique=True)
+
+
+class RunQuerySet(models.QuerySet):
+    """``bulk_create`` resolves the locations and weather given by name.
+    """
+    def resolve(self, objs):
+        """Sets the place and weather condition of the runs given by name.
+        Called before a transaction that writes them: on SQLite a
+        transaction that reads (the dimension rows) before its first write
+        fails at once if another writer commits in between."""
+        resolve_locations(objs)
+        resolve_conditions(objs)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        self.resolve(objs)
+        return super().bulk_create(objs, *args, **kwargs)
+
+
 class Run(models.Model):
     date = models.DateField()
     distance = models.FloatField()
     time = models.DurationField()
-    location = models.CharField(max_length=256)
+    place = models.ForeignKey(
+        Location, related_name="runs", on_delete=models.PROTECT
+    )
     owner = models.ForeignKey(
         "auth.User", related_name="jogging", on_delete=models.CASCADE
     )
-    weather = models.CharField(default="?", max_length=128)
+    condition = models.ForeignKey(
+        WeatherCondition, related_name="runs", on_delete=models.PROTECT
+    )
+
+    objects = RunQuerySet.as_manager()
+    # names given to ``location`` and ``weather`` until they are resolved:
+    pending_location = None
+    pending_weather = None
+    saved_date = None
+
+    @property
+    def location(self):
+        """The name of the place of the run. It can be set to any name;
+        the place is looked up (or created) when the run is saved."""
+        if self.pending_location is not None:
+            return self.pending_location
+        if self.place_id is None:
+            return None
+        return self.place.name
+
+    @location.setter
+    def location(self, name):
+        self.pending_location = name
+        self.place = None
+
+    @property
+    def weather(self):
+        """The name of the weather condition of the run (like
+        ``location``)."""
+        if self.pending_weather is not None:
+            return self.pending_weather
+        if self.condition_id is None:
+            return UNKNOWN_WEATHER
+        return self.condition.name
+
+    @weather.setter
+    def weather(self, name):
+        self.pending_weather = name
+        self.condition = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        run = super().from_db(db, field_names, values)
+        # the day of the run in the database, until it is saved again:
+        run.saved_date = run.__dict__.get("date")
+        return run
 
     def save(self, *args, **kwargs):
+        # looked up before the transaction, not to hold it (and the SQLite
+        # write lock) while waiting for the weather API:
         weather = get_weather(self.location, self.date)
         if weather:
             self.weather = weather
-        super().save(*args, **kwargs)
+        # only new names take a write (outside of the transaction):
+        Run.objects.resolve([self])
+        # one commit for the run and the data derived from it (post_save):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+        self.saved_date = self.date
 
 
 class WeeklyReport(models.Model):
@@ -73,3 +159,119 @@ class WeeklyReport(models.Model):
     def week(self):
         end_of_week = self.week_start + 6*ONEDAY
         return f"{self.week_start} to {end_of_week}"
+
+
+class AuthToken(models.Model):
+    """Only a keyed digest of the token is stored; the token itself is
+    shown once, when it is issued."""
+    digest = models.CharField(max_length=64, unique=True)
+    owner = models.ForeignKey(
+        "auth.User", related_name="%(app_label)s_%(class)s",
+        on_delete=models.CASCADE
+    )
+    created = models.DateTimeField(auto_now_add=True)
+
+
+class DataVersion(models.Model):
+    """Change counter of the data (runs and reports) of one user."""
+    owner = models.OneToOneField(
+        "auth.User", primary_key=True,
+        related_name="%(app_label)s_%(class)s", on_delete=models.CASCADE
+    )
+    version = models.PositiveIntegerField(default=0)
+    modified = models.DateTimeField(default=timezone.now)
+    # number of runs of the user (see jogging.versions.add_runs):
+    runs = models.IntegerField(default=0)
+
+
+class RunSnapshot(models.Model):
+    """Packed columns of all the runs of one user (see
+    ``jogging.columnar``), valid while ``version`` is the current
+    ``DataVersion`` of the owner."""
+    owner = models.OneToOneField(
+        "auth.User", primary_key=True,
+        related_name="%(app_label)s_%(class)s", on_delete=models.CASCADE
+    )
+    version = models.PositiveIntegerField()
+    data = models.BinaryField()
+
+
+class PersonalRecord(models.Model):
+    """Best result of one user in one category (see ``jogging.records``).
+    ``value`` is a time in seconds for the race distances (the equivalent
+    time at the best pace of runs at least that long) and a distance in
+    km otherwise."""
+    KIND_CHOICES = [
+        ("5k", "Fastest 5k"),
+        ("10k", "Fastest 10k"),
+        ("half_marathon", "Fastest half marathon"),
+        ("marathon", "Fastest marathon"),
+        ("longest_run", "Longest run"),
+        ("biggest_week", "Biggest week"),
+    ]
+    owner = models.ForeignKey(
+        "auth.User", related_name="%(app_label)s_%(class)s",
+        on_delete=models.CASCADE
+    )
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    value = models.FloatField()
+    run = models.ForeignKey(
+        Run, null=True, related_name="+", on_delete=models.SET_NULL
+    )
+    week_start = models.DateField(null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["owner", "kind"],
+                name="one_record_per_kind_and_owner"
+            )
+        ]
+
+
+class LeaderboardEntry(models.Model):
+    """Materialized rank of a user by distance in one week or month (see
+    ``jogging.leaderboards``)."""
+    PERIOD_CHOICES = [("week", "Week"), ("month", "Month")]
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES)
+    period_start = models.DateField()
+    owner = models.ForeignKey(
+        "auth.User", related_name="%(app_label)s_%(class)s",
+        on_delete=models.CASCADE
+    )
+    distance = models.FloatField()
+    rank = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["period", "period_start", "owner"],
+                name="one_entry_per_period_and_owner"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["period", "period_start", "rank"],
+                name="leaderboard_rank_idx"
+            )
+        ]
+
+
+class DailyTotal(models.Model):
+    """Totals of the runs of one user up to and including ``date``, one
+    of the days with runs (see ``jogging.totals``)."""
+    owner = models.ForeignKey(
+        "auth.User", related_name="%(app_label)s_%(class)s",
+        on_delete=models.CASCADE
+    )
+    date = models.DateField()
+    distance = models.FloatField()
+    seconds = models.FloatField()
+    runs = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["owner", "date"], name="one_total_per_day_and_owner"
+            )
+        ]
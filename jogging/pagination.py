@@ -0,0 +1,118 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+from rest_framework.pagination import (
+    CursorPagination, LimitOffsetPagination, replace_query_param,
+)
+from rest_framework.response import Response
+
+from .caching import run_counts_cache
+
+
+class RankCursorPagination(CursorPagination):
+    """Keyset pagination on the (unique) rank of a leaderboard: the
+    cursor holds the last rank seen, so pages cost the same at any depth.
+    """
+    ordering = "rank"
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+
+
+class CachedCountPagination(LimitOffsetPagination):
+    """Limit/offset pagination that avoids counting the whole list on
+    every page:
+
+    - unfiltered lists take their count from ``view.estimated_count()``
+      (flagged with ``count_estimated``),
+    - the counts of filtered lists are cached per user (see
+      ``view.count_cache_owner()``) and filter, until their data change,
+    - ``?count=false`` skips the count (``count`` is ``null``).
+
+    Whether there is a next page is always known from one extra row.
+    """
+    count_query_param = "count"
+    count_cache = run_counts_cache
+    # query parameters that do not filter the list:
+    unfiltered_params = ("limit", "offset", "count", "fields", "format")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.view = view
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+        self.offset = self.get_offset(request)
+        self.count_estimated = False
+        skip_count = request.query_params.get(self.count_query_param, "")
+        if skip_count.lower() in ("0", "false", "no"):
+            self.count = None
+        else:
+            self.count = self.get_count(queryset)
+            if self.count > self.limit and self.template is not None:
+                self.display_page_controls = True
+        rows = list(queryset[self.offset:self.offset+self.limit+1])
+        self.has_next = len(rows) > self.limit
+        return rows[:self.limit]
+
+    def get_count(self, queryset):
+        params = self.request.query_params
+        filters = sorted(set(params)-set(self.unfiltered_params))
+        estimated_count = getattr(self.view, "estimated_count", None)
+        if not filters and estimated_count is not None:
+            self.count_estimated = True
+            return estimated_count()
+        owner = getattr(self.view, "count_cache_owner", None)
+        owner = owner() if owner else self.request.user.pk
+        key = urlencode([
+            (name, value) for name in filters for value in params.getlist(name)
+        ])
+        count = self.count_cache.get(owner, key)
+        if count is None:
+            count = super().get_count(queryset)
+            self.count_cache.set(owner, key, count)
+        return count
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ("count", self.count),
+            ("count_estimated", self.count_estimated),
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data)
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        schema = super().get_paginated_response_schema(schema)
+        schema["properties"]["count"]["nullable"] = True
+        schema["properties"]["count_estimated"] = {"type": "boolean"}
+        return schema
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        offset = self.offset+self.limit
+        return replace_query_param(url, self.offset_query_param, offset)
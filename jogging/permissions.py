@@ -36,3 +36,8 @@ class IsOwnerOrAdmin(BasePermission):
 class IsAdminOrStaff(BasePermission):
     def has_permission(self, request, view):
         return request.user.is_superuser or request.user.is_staff
+
+
+class IsAdmin(BasePermission):
+    def has_permission(self, request, view):
+        return request.user.is_superuser
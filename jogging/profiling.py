@@ -0,0 +1,191 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+import asyncio
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+
+DEFAULTS = {
+    "ENABLED": False,
+    "SAMPLE_RATE": 0.01,
+    "SLOW_SECONDS": None,
+    "INTERVAL": 0.005,
+    "DIRECTORY": "profiles",
+    "MAX_FILES": 50,
+    "VIEWS": ("RunViewSet", "WeeklyReportViewSet", "NewAccount"),
+}
+SUFFIX = ".collapsed"
+
+
+def profiler_settings():
+    return {**DEFAULTS, **getattr(settings, "PROFILER", {})}
+
+
+def collapse(frame):
+    """The stack of ``frame`` in the collapsed format (root first, frames
+    separated by ``;``)."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        module = frame.f_globals.get("__name__", "?")
+        names.append(f"{module}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Sampler:
+    """Samples periodically, in one background thread, the stacks of the
+    registered threads."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._stacks = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread = None
+
+    def start(self, thread_id=None):
+        thread_id = thread_id or threading.get_ident()
+        with self._lock:
+            self._stacks[thread_id] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="profiler-sampler", daemon=True
+                )
+                self._thread.start()
+            self._wakeup.notify()
+
+    def stop(self, thread_id=None):
+        """Returns the collapsed stacks counted for the thread."""
+        thread_id = thread_id or threading.get_ident()
+        with self._lock:
+            return self._stacks.pop(thread_id, Counter())
+
+    def _run(self):
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                while not self._stacks:
+                    self._wakeup.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, stacks in self._stacks.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None and thread_id != me:
+                        stacks[collapse(frame)] += 1
+
+
+def write_profile(directory, endpoint, stacks, max_files):
+    """Stores ``stacks`` in ``directory/endpoint/`` keeping only the
+    newest ``max_files`` files there."""
+    path = Path(directory)/endpoint
+    path.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S.%f")
+    filename = path/f"{stamp}-{threading.get_ident()}{SUFFIX}"
+    with open(filename, "w") as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    files = sorted(path.glob(f"*{SUFFIX}"))
+    for old in files[:-max_files]:
+        old.unlink()
+    return filename
+
+
+def read_profile(filename):
+    stacks = Counter()
+    with open(filename) as f:
+        for line in f:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            if stack:
+                stacks[stack] += int(count)
+    return stacks
+
+
+class SamplingProfilerMiddleware:
+    """Opt-in (``PROFILER["ENABLED"]``) sampling profiler of the views
+    named in ``PROFILER["VIEWS"]``. A fraction (``SAMPLE_RATE``) of their
+    requests is profiled, and also every request slower than
+    ``SLOW_SECONDS`` (if given). The collapsed stacks are stored per
+    endpoint under ``DIRECTORY``. Under ASGI the requests are passed
+    through unprofiled, since the views run on executor threads."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.config = profiler_settings()
+        if not self.config["ENABLED"]:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        self.sampler = Sampler(self.config["INTERVAL"])
+        self._local = threading.local()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.get_response(request)
+        self._local.profile = None
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            profile = self._local.profile
+            if profile is not None:
+                endpoint, sampled = profile
+                stacks = self.sampler.stop()
+                elapsed = time.perf_counter()-start
+                slow = self.config["SLOW_SECONDS"]
+                if stacks and (sampled or elapsed >= slow):
+                    write_profile(
+                        self.config["DIRECTORY"], endpoint, stacks,
+                        self.config["MAX_FILES"]
+                    )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self.is_async:
+            return None
+        view_class = getattr(view_func, "cls", None)
+        if view_class is None:
+            return None
+        if view_class.__name__ not in self.config["VIEWS"]:
+            return None
+        sampled = random.random() < self.config["SAMPLE_RATE"]
+        if not sampled and self.config["SLOW_SECONDS"] is None:
+            return None
+        method = request.method.lower()
+        actions = getattr(view_func, "actions", None) or {}
+        action = actions.get(method, method)
+        self._local.profile = (f"{view_class.__name__}.{action}", sampled)
+        self.sampler.start()
+        return None
@@ -0,0 +1,178 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+"""Incremental maintenance of the personal records.
+
+A changed run can only improve a record, unless it is the current holder:
+then (or if the holder was deleted) that record is recomputed from the
+database. The biggest week is maintained in the same way from the weekly
+reports.
+"""
+
+from collections import defaultdict
+
+
+RACE_DISTANCES = {
+    "5k": 5,
+    "10k": 10,
+    "half_marathon": 21.0975,
+    "marathon": 42.195,
+}
+LONGEST_RUN = "longest_run"
+BIGGEST_WEEK = "biggest_week"
+RUN_KINDS = tuple(RACE_DISTANCES) + (LONGEST_RUN,)
+
+
+def is_better(kind, value, than):
+    if kind in RACE_DISTANCES:
+        return value < than
+    return value > than
+
+
+def best_run(kind, rows):
+    """The best ``(value, run id)`` of ``rows`` (id, distance, time) for
+    ``kind``, if any; ties go to the oldest run."""
+    best = None
+    for pk, distance, time in sorted(rows):
+        seconds = time.total_seconds()
+        if kind in RACE_DISTANCES:
+            target = RACE_DISTANCES[kind]
+            if distance < target or seconds <= 0:
+                continue
+            value = seconds*target/distance
+        else:
+            value = distance
+        if best is None or is_better(kind, value, best[0]):
+            best = (value, pk)
+    return best
+
+
+def _recompute_run_record(owner_id, kind):
+    from jogging.models import Run
+    runs = Run.objects.filter(owner_id=owner_id)
+    if kind in RACE_DISTANCES:
+        runs = runs.filter(distance__gte=RACE_DISTANCES[kind])
+    else:
+        runs = runs.order_by("-distance", "id")[:1]
+    return best_run(kind, runs.values_list("id", "distance", "time"))
+
+
+def _store(record, owner_id, kind, value, run_id=None, week_start=None):
+    from jogging.models import PersonalRecord
+    if record is None:
+        PersonalRecord.objects.create(
+            owner_id=owner_id, kind=kind, value=value, run_id=run_id,
+            week_start=week_start
+        )
+    else:
+        record.value = value
+        record.run_id = run_id
+        record.week_start = week_start
+        record.save()
+
+
+def update_run_records(run_ids):
+    """Updates the run records after the runs ``run_ids`` (a mapping
+    owner id -> run ids) were created, changed or deleted."""
+    from jogging.models import Run, PersonalRecord
+    ids = set().union(*run_ids.values())
+    rows = defaultdict(list)
+    for pk, owner_id, distance, time in Run.objects.filter(
+            id__in=ids).values_list("id", "owner_id", "distance", "time"):
+        rows[owner_id].append((pk, distance, time))
+    records = {
+        (record.owner_id, record.kind): record
+        for record in PersonalRecord.objects.filter(
+            owner_id__in=run_ids.keys(), kind__in=RUN_KINDS
+        )
+    }
+    for owner_id, changed in run_ids.items():
+        for kind in RUN_KINDS:
+            record = records.get((owner_id, kind))
+            if record is not None and (
+                    record.run_id is None or record.run_id in changed):
+                best = _recompute_run_record(owner_id, kind)
+                if best is None:
+                    record.delete()
+                    continue
+            else:
+                best = best_run(kind, rows[owner_id])
+                if best is None or (
+                        record and not is_better(kind, best[0], record.value)):
+                    continue
+            _store(record, owner_id, kind, best[0], run_id=best[1])
+
+
+def rebuild_run_records(owner_id):
+    """Recomputes all the run records of the owner from the database."""
+    from jogging.models import PersonalRecord
+    records = {
+        record.kind: record for record in PersonalRecord.objects.filter(
+            owner_id=owner_id, kind__in=RUN_KINDS
+        )
+    }
+    for kind in RUN_KINDS:
+        best = _recompute_run_record(owner_id, kind)
+        record = records.get(kind)
+        if best is not None:
+            _store(record, owner_id, kind, best[0], run_id=best[1])
+        elif record is not None:
+            record.delete()
+
+
+def update_week_record(owner_id, week_start, distance):
+    """Updates the biggest week after the report of ``week_start``
+    changed to ``distance`` (``None`` if it was deleted)."""
+    from jogging.models import PersonalRecord, WeeklyReport
+    record = PersonalRecord.objects.filter(
+        owner_id=owner_id, kind=BIGGEST_WEEK
+    ).first()
+    if record is not None and record.week_start == week_start and (
+            distance is None or distance < record.value):
+        best = WeeklyReport.objects.filter(owner_id=owner_id).order_by(
+            "-total_distance_km", "week_start"
+        ).values_list("total_distance_km", "week_start").first()
+        if best is None:
+            record.delete()
+            return
+        distance, week_start = best
+    elif distance is None or (
+            record and not distance > record.value):
+        return
+    _store(record, owner_id, BIGGEST_WEEK, distance, week_start=week_start)
+
+
+def replace_week_records(owner_ids, reports):
+    """Sets the biggest week of the owners from all their ``reports``
+    (unsaved ``WeeklyReport`` instances)."""
+    from jogging.models import PersonalRecord
+    best = {}
+    for report in sorted(reports, key=lambda r: r.week_start):
+        current = best.get(report.owner_id)
+        if current is None or report.total_distance_km > current.value:
+            best[report.owner_id] = PersonalRecord(
+                owner_id=report.owner_id, kind=BIGGEST_WEEK,
+                value=report.total_distance_km, week_start=report.week_start
+            )
+    PersonalRecord.objects.filter(
+        owner_id__in=owner_ids, kind=BIGGEST_WEEK
+    ).delete()
+    PersonalRecord.objects.bulk_create(best.values())
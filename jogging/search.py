@@ -24,6 +24,8 @@ from collections import namedtuple
 
 from django.db.models import Q
 
+from .metrics import timed
+
 
 KEY = r"(?P<KEY>[a-zA-Z_]+)"
 COMPARISON = r"(?P<COMPARISON>EQ|eq|NE|ne|GT|gt|LT|lt)"
@@ -43,8 +45,11 @@ pattern = re.compile("|".join(
 Token = namedtuple("Token", ["type", "value"])
 
 
-def make_Qexpr_from_search_string(text):
-    return QexprBuilder().parse(text)
+@timed("search")
+def make_Qexpr_from_search_string(text, lookups=None):
+    """``lookups`` maps keys to the lookup they are searched with and a
+    function converting their values."""
+    return QexprBuilder(lookups).parse(text)
 
 
 def _generate_tokens(text):
@@ -58,6 +63,9 @@ def _generate_tokens(text):
 
 
 class QexprBuilder:
+    def __init__(self, lookups=None):
+        self.lookups = lookups or {}
+
     def parse(self, text):
         self.tokens = _generate_tokens(text)
         self.tok = None
@@ -96,6 +104,9 @@ class QexprBuilder:
             key = self.tok.value
             suffix, ne = self._parse_op()
             value = self._parse_value()
+            if key in self.lookups:
+                key, convert = self.lookups[key]
+                value = convert(value)
             d = {f"{key}{suffix}": value}
             q = Q(**d)
             if ne:
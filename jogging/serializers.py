@@ -20,9 +20,15 @@
 ########################################################################
 
 from rest_framework import serializers
+from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
 
-from jogging.models import Run, WeeklyReport
+from jogging.models import (
+    Run, WeeklyReport, PersonalRecord, LeaderboardEntry,
+)
+from jogging.bulk import create_runs
+from jogging.metrics import timed
+from jogging.leaderboards import PERIODS
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -45,14 +51,61 @@ class UserSerializer(serializers.ModelSerializer):
         return super().update(instance, validated_data)
 
 
-class RunSerializer(serializers.ModelSerializer):
-    user = serializers.CharField(source="owner.username", required=False)
+class AuthTokenSerializer(serializers.Serializer):
+    username = serializers.CharField()
+    password = serializers.CharField(write_only=True)
+
+    def validate(self, attrs):
+        user = authenticate(
+            request=self.context.get("request"),
+            username=attrs["username"],
+            password=attrs["password"]
+        )
+        if user is None:
+            raise serializers.ValidationError(
+                "Unable to log in with provided credentials."
+            )
+        attrs["user"] = user
+        return attrs
+
+
+class SparseFieldsMixin:
+    """Takes an optional ``fields`` argument: the names of the only fields
+    to keep."""
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop("fields", None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields)-set(fields):
+                self.fields.pop(name)
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    @timed("serialize")
+    def to_representation(self, data):
+        return super().to_representation(data)
+
+
+class RunListSerializer(TimedListSerializer):
+    def create(self, validated_data):
+        return create_runs(Run(**attrs) for attrs in validated_data)
+
+
+class RunSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    user = serializers.CharField(source="owner.username", read_only=True)
+    # the name of the place (a Location), see Run.location:
+    location = serializers.CharField(max_length=256)
+    # the name of the WeatherCondition, see Run.weather:
+    weather = serializers.CharField(max_length=128, required=False)
+
     class Meta:
         model = Run
+        list_serializer_class = RunListSerializer
         fields = (
             "id", "user", "date", "distance", "time", "location", "weather"
         )
-        read_only_fields = ("id", "user")
+        read_only_fields = ("id", )
 
 
 class FloatField(serializers.FloatField):
@@ -60,11 +113,64 @@ class FloatField(serializers.FloatField):
         return round(value, 2)
 
 
-class WeeklyReportSerializer(serializers.ModelSerializer):
+class WeeklyReportSerializer(
+        SparseFieldsMixin, serializers.ModelSerializer):
     total_distance_km = FloatField()
     average_speed_kmph = FloatField()
     
     class Meta:
         model = WeeklyReport
         fields = ("week", "total_distance_km", "average_speed_kmph")
+        list_serializer_class = TimedListSerializer
+
+
+
+class PersonalRecordSerializer(serializers.ModelSerializer):
+    value = FloatField()
+    date = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PersonalRecord
+        fields = ("kind", "value", "date", "run")
+
+    def get_date(self, record):
+        if record.run_id is not None:
+            return record.run.date
+        return record.week_start
+
+
+class LeaderboardEntrySerializer(serializers.ModelSerializer):
+    user = serializers.CharField(source="owner.username")
+    distance = FloatField()
+
+    class Meta:
+        model = LeaderboardEntry
+        fields = ("rank", "user", "distance")
+
+
+class LeaderboardQuerySerializer(serializers.Serializer):
+    period = serializers.ChoiceField(PERIODS, default=PERIODS[0])
+    start = serializers.DateField(required=False)
+
+
+class AnalyticsQuerySerializer(serializers.Serializer):
+    date = serializers.DateField(required=False)
+    days = serializers.IntegerField(min_value=1, max_value=366, default=28)
+
+
+class RangeTotalQuerySerializer(serializers.Serializer):
+    to = serializers.DateField(required=False)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # "from" is a keyword:
+        fields["from"] = serializers.DateField(required=False)
+        return fields
 
+    def validate(self, attrs):
+        start, end = attrs.get("from"), attrs.get("to")
+        if start and end and start > end:
+            raise serializers.ValidationError(
+                "'from' must not be after 'to'."
+            )
+        return attrs
@@ -21,27 +21,170 @@
 
 from datetime import timedelta
 
+from django.db import connections, router, transaction
 from django.db.models import Sum
 
+from .caching import EVERYBODY, run_counts_cache, weekly_reports_cache
+from .columnar import sync_run_snapshots
+from .leaderboards import update_leaderboards
+from .records import update_run_records, update_week_record
+from .totals import update_daily_totals
+from .metrics import timed
+from .versions import add_runs, locked_versions, touch
 
-def run_stats_for_report(model, user, start_date, end_date):
-    return model.objects.filter(
-        date__range=(start_date, end_date)
-    ).filter(
-        owner=user
-    ).aggregate(Sum("distance"), Sum("time"))
 
-    
-def run_save_handler(sender, instance, **kwargs):
-    from jogging.models import WeeklyReport
-    start_date = instance.date-timedelta(days=instance.date.weekday())
+# A weekly report is recomputed from the runs and stored with a single
+# statement. SQLite serializes writers, so concurrent writes to the same week
+# cannot interleave between the aggregate and the write. SQLite only (it
+# stores durations as microseconds); on other databases the report row is
+# locked and written with the ORM:
+UPSERT_VENDORS = ("sqlite", )
+UPSERT_WEEKLY_REPORT = """
+INSERT INTO {report} ({owner}, {week_start}, {total}, {speed})
+SELECT {owner}, %s, SUM({distance}),
+       COALESCE(SUM({distance})*3600/NULLIF({seconds}, 0), 0)
+FROM {run}
+WHERE {owner} = %s AND {date} BETWEEN %s AND %s
+GROUP BY {owner}
+ON CONFLICT ({week_start}, {owner}) DO UPDATE SET
+    {total} = excluded.{total}, {speed} = excluded.{speed}
+"""
+DELETE_EMPTY_WEEKLY_REPORT = """
+DELETE FROM {report}
+WHERE {owner} = %s AND {week_start} = %s AND NOT EXISTS (
+    SELECT 1 FROM {run} WHERE {owner} = %s AND {date} BETWEEN %s AND %s
+)
+"""
+SECONDS_SUM = "SUM({time})/1000000.0"
+
+
+def data_changed(owner_id):
+    """Bumps the data version of the owner and drops their cached reports
+    and run counts."""
+    touch(owner_id)
+    weekly_reports_cache.invalidate(owner_id)
+    run_counts_cache.invalidate(owner_id)
+    run_counts_cache.invalidate(EVERYBODY)
+
+
+def runs_changed(run_ids, versions_before):
+    """Brings the data derived from single runs (snapshots and records)
+    up to date; ``run_ids`` maps owner ids to the changed run ids and
+    ``versions_before`` to their data versions before the write (see
+    ``locked_versions``)."""
+    sync_run_snapshots(run_ids, versions_before)
+    update_run_records(run_ids)
+
+
+def report_changed(owner_id, week_start, distance):
+    """Brings the data derived from weekly reports (biggest week and
+    leaderboards) up to date; ``distance`` is ``None`` if the report was
+    deleted."""
+    update_week_record(owner_id, week_start, distance)
+    update_leaderboards(owner_id, week_start, distance)
+
+
+def week_bounds(day):
+    start_date = day-timedelta(days=day.weekday())
     end_date = start_date+timedelta(days=6)
-    wr, created = WeeklyReport.objects.get_or_create(
-        week_start=start_date,
-        owner=instance.owner
+    return start_date, end_date
+
+
+def store_weekly_report(model, owner_id, start_date):
+    """Recomputes the weekly report of the owner starting on
+    ``start_date`` from the runs (``model``), or removes it if the week
+    has no runs. Returns its total distance (``None`` if removed)."""
+    from jogging.models import WeeklyReport
+    connection = connections[router.db_for_write(WeeklyReport)]
+    if connection.vendor not in UPSERT_VENDORS:
+        return _store_locked_weekly_report(model, owner_id, start_date)
+    qn = connection.ops.quote_name
+    names = {
+        "report": qn(WeeklyReport._meta.db_table),
+        "run": qn(model._meta.db_table),
+        "owner": qn("owner_id"), "week_start": qn("week_start"),
+        "total": qn("total_distance_km"), "speed": qn("average_speed_kmph"),
+        "distance": qn("distance"), "date": qn("date"),
+    }
+    names["seconds"] = SECONDS_SUM.format(time=qn("time"))
+    week = [
+        connection.ops.adapt_datefield_value(day)
+        for day in week_bounds(start_date)
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            UPSERT_WEEKLY_REPORT.format(**names),
+            [week[0], owner_id, *week]
+        )
+        if not cursor.rowcount:
+            cursor.execute(
+                DELETE_EMPTY_WEEKLY_REPORT.format(**names),
+                [owner_id, week[0], owner_id, *week]
+            )
+    return WeeklyReport.objects.filter(
+        owner_id=owner_id, week_start=start_date
+    ).values_list("total_distance_km", flat=True).first()
+
+
+def _store_locked_weekly_report(model, owner_id, start_date):
+    from jogging.models import WeeklyReport
+    reports = WeeklyReport.objects.filter(
+        owner_id=owner_id, week_start=start_date
     )
-    stats = run_stats_for_report(sender, instance.owner, start_date, end_date)
-    wr.total_distance_km = stats["distance__sum"]
-    seconds = stats["time__sum"].seconds
-    wr.average_speed_kmph = stats["distance__sum"]*3600/seconds
-    wr.save()
+    with transaction.atomic():
+        # new reports are not locked, but the writers of the owner are
+        # serialized by ``locked_versions``:
+        exists = reports.select_for_update().exists()
+        stats = model.objects.filter(
+            owner_id=owner_id, date__range=week_bounds(start_date)
+        ).aggregate(distance=Sum("distance"), time=Sum("time"))
+        distance = stats["distance"]
+        if distance is None:
+            reports.delete()
+            return None
+        seconds = stats["time"].total_seconds()
+        values = {
+            "total_distance_km": distance,
+            "average_speed_kmph": distance*3600/seconds if seconds else 0,
+        }
+        if exists:
+            reports.update(**values)
+        else:
+            WeeklyReport.objects.create(
+                owner_id=owner_id, week_start=start_date, **values
+            )
+    return distance
+
+
+def update_weekly_report(model, owner, day):
+    data_changed(owner.pk)
+    start_date = week_bounds(day)[0]
+    distance = store_weekly_report(model, owner.pk, start_date)
+    report_changed(owner.pk, start_date, distance)
+
+
+@timed("report")
+def update_weekly_reports(model, owner, days):
+    """Recomputes once each weekly report touched by ``days``."""
+    for start_date in sorted({week_bounds(day)[0] for day in days}):
+        update_weekly_report(model, owner, start_date)
+
+    
+@timed("report")
+def run_save_handler(sender, instance, created=False, **kwargs):
+    # joins the transaction of Run.save, which already wrote the run: on
+    # SQLite the transaction holds the write lock before reading the derived
+    # data.
+    with transaction.atomic(savepoint=False):
+        versions = locked_versions([instance.owner.pk])
+        update_weekly_report(sender, instance.owner, instance.date)
+        # the run may come from another day (and week):
+        old_date = instance.saved_date
+        if old_date and week_bounds(old_date) != week_bounds(instance.date):
+            update_weekly_report(sender, instance.owner, old_date)
+        update_daily_totals(
+            instance.owner.pk, {instance.date, instance.saved_date} - {None}
+        )
+        if created:
+            add_runs(instance.owner.pk, 1)
+        runs_changed({instance.owner.pk: {instance.pk}}, versions)
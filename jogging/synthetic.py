@@ -0,0 +1,90 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+import math
+import random
+from datetime import date, timedelta
+
+
+LOCATIONS = (
+    "Berlin", "Madrid", "Porto", "Lima", "Toledo", "Frankfurt", "Rome",
+    "Casablanca",
+)
+# big cities have more runners:
+LOCATION_WEIGHTS = (8, 7, 3, 6, 1, 4, 6, 2)
+HOME_RUN_PROBABILITY = 0.9
+
+
+def synthetic_run_data(count, rng=None, end_date=None, days=365):
+    """Yields ``count`` dicts with plausible run data (date, distance, time
+    and location) within the ``days`` before ``end_date``."""
+    rng = rng or random.Random()
+    end_date = end_date or date.today()
+    for _ in range(count):
+        distance = round(rng.uniform(3, 21), 2)
+        pace = rng.uniform(4.5, 7)  # min/km
+        yield {
+            "date": end_date-timedelta(days=rng.randrange(days)),
+            "distance": distance,
+            "time": timedelta(seconds=round(distance*pace*60)),
+            "location": rng.choice(LOCATIONS),
+        }
+
+
+def synthetic_runner(rng):
+    """Draws the habits of a runner: runs per week, typical distance (km),
+    typical pace (min/km) and home town."""
+    return {
+        "runs_per_week": min(max(rng.gauss(3, 1.2), 0.5), 7),
+        "distance": min(rng.lognormvariate(math.log(8), 0.35), 30),
+        "pace": min(max(rng.gauss(5.8, 0.7), 3.5), 9),
+        "home": rng.choices(LOCATIONS, weights=LOCATION_WEIGHTS)[0],
+    }
+
+
+def synthetic_history(runner, rng, weeks, end_date=None):
+    """Yields the runs of ``runner`` during the ``weeks`` weeks before
+    ``end_date``. Long runs happen on weekends, longer runs are slower
+    and most runs take place in the home town."""
+    end_date = end_date or date.today()
+    last_monday = end_date-timedelta(days=end_date.weekday())
+    probability = runner["runs_per_week"]/7
+    for week in range(weeks):
+        monday = last_monday-timedelta(weeks=week)
+        for weekday in range(7):
+            day = monday+timedelta(days=weekday)
+            if day > end_date or rng.random() >= probability:
+                continue
+            distance = runner["distance"]*rng.lognormvariate(0, 0.25)
+            if weekday >= 5:
+                distance *= 1.6
+            pace = runner["pace"]*rng.gauss(1, 0.04)
+            pace *= 1+0.03*(distance/runner["distance"]-1)
+            if rng.random() < HOME_RUN_PROBABILITY:
+                location = runner["home"]
+            else:
+                location = rng.choice(LOCATIONS)
+            yield {
+                "date": day,
+                "distance": round(distance, 2),
+                "time": timedelta(seconds=round(distance*pace*60)),
+                "location": location,
+            }
@@ -0,0 +1,116 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+import random
+from datetime import date, timedelta
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from jogging.analytics import (
+    RunColumns, load_run_columns, rolling_sums, compute_analytics,
+)
+from jogging.management.commands.benchmark_analytics import row_by_row
+from jogging.models import Run
+from jogging.synthetic import synthetic_run_data
+
+
+def columns_of(runs):
+    return RunColumns(
+        np.array([day.toordinal() for day, _, _ in runs], dtype=np.int64),
+        np.array([distance for _, distance, _ in runs], dtype=np.float64),
+        np.array([t.total_seconds() for _, _, t in runs], dtype=np.float64),
+    )
+
+
+class LoadRunColumnsTestCase(TestCase):
+    def test_one_query_once_the_snapshot_exists(self):
+        user = User.objects.create(username="sam")
+        Run.objects.create(
+            owner=user, date=date(2020, 10, 1), distance=10,
+            time=timedelta(minutes=50), location="Berlin"
+        )
+        load_run_columns(user)
+        with self.assertNumQueries(1):
+            columns = load_run_columns(user)
+        self.assertEqual(
+            columns.days.tolist(), [date(2020, 10, 1).toordinal()]
+        )
+        self.assertEqual(columns.distances.tolist(), [10.0])
+        self.assertEqual(columns.seconds.tolist(), [3000.0])
+
+
+class RollingSumsTestCase(TestCase):
+    def test_window(self):
+        sums = rolling_sums(np.array([1., 2., 3., 4., 5.]), 2)
+        self.assertEqual(sums.tolist(), [1., 3., 5., 7., 9.])
+
+
+class ComputeAnalyticsTestCase(TestCase):
+    def test_no_runs(self):
+        data = compute_analytics(columns_of([]), date(2020, 10, 12), 3)
+        self.assertEqual(data["runs"], 0)
+        self.assertEqual(data["acute_chronic_ratio"], None)
+        self.assertEqual(data["pace_s_per_km"]["p50"], None)
+        self.assertEqual(
+            data["trend"]["distance_km"],
+            {"slope_per_week": None, "current": None}
+        )
+        self.assertEqual(len(data["daily"]), 3)
+
+    def test_known_values(self):
+        runs = [
+            (date(2020, 10, 1), 10, timedelta(seconds=3000)),
+            (date(2020, 10, 8), 5, timedelta(seconds=1800)),
+            (date(2020, 10, 20), 8, timedelta(seconds=2400)),
+        ]
+        data = compute_analytics(columns_of(runs), date(2020, 10, 12))
+        self.assertEqual(data["runs"], 2)
+        self.assertEqual(data["distance_km"]["last_7_days"], 5)
+        self.assertEqual(data["distance_km"]["last_28_days"], 15)
+        self.assertEqual(data["acute_chronic_ratio"], round(5/7/(15/28), 3))
+        self.assertEqual(data["pace_s_per_km"]["p50"], 330)
+        self.assertEqual(
+            data["trend"]["distance_km"]["slope_per_week"], -5.0
+        )
+        self.assertEqual(data["trend"]["distance_km"]["current"], 2.143)
+
+    def test_agrees_with_row_by_row(self):
+        as_of = date(2020, 10, 12)
+        runs = [
+            (r["date"], r["distance"], r["time"])
+            for r in synthetic_run_data(300, random.Random(1), as_of, 90)
+        ]
+        data = compute_analytics(columns_of(runs), as_of, 28)
+        series, percentiles, trend = row_by_row(runs, as_of, 28)
+        for day, (when, acute, chronic, ratio) in zip(data["daily"], series):
+            self.assertEqual(day["date"], when)
+            self.assertAlmostEqual(day["last_7_days"], acute, places=2)
+            self.assertAlmostEqual(day["last_28_days"], chronic, places=2)
+            self.assertAlmostEqual(day["acute_chronic_ratio"], ratio, 2)
+        for p, value in zip((10, 25, 50, 75, 90), percentiles):
+            self.assertAlmostEqual(
+                data["pace_s_per_km"][f"p{p}"], value, places=0
+            )
+        self.assertAlmostEqual(
+            data["trend"]["distance_km"]["slope_per_week"], 7*trend.slope, 2
+        )
@@ -24,6 +24,8 @@ from unittest.mock import patch, MagicMock
 from django.test import TestCase
 
 from jogging.apps import JoggingConfig
+from jogging.db import configure_sqlite
+from jogging.metrics import install_query_metrics
 from jogging.signals import run_save_handler
 
 
@@ -43,7 +45,21 @@ class JoggingConfigTestCase(TestCase):
             run_save_handler, sender=conf.get_model.return_value
         )
         conf.get_model.assert_called_once_with("Run")
-        
-
 
+    @patch("jogging.apps.connection_created")
+    def test_ready_method_registers_sqlite_configuration(
+            self, pconnection_created, pAppConfig, ppost_save):
+        JoggingConfig.path = "."
+        conf = JoggingConfig("jogging", "jogging.apps")
+        conf.get_model = MagicMock()
+        conf.ready()
+        pconnection_created.connect.assert_any_call(configure_sqlite)
 
+    @patch("jogging.apps.connection_created")
+    def test_ready_method_registers_query_metrics(
+            self, pconnection_created, pAppConfig, ppost_save):
+        JoggingConfig.path = "."
+        conf = JoggingConfig("jogging", "jogging.apps")
+        conf.get_model = MagicMock()
+        conf.ready()
+        pconnection_created.connect.assert_any_call(install_query_metrics)
@@ -0,0 +1,118 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+import json
+from datetime import date, timedelta
+from unittest.mock import patch, AsyncMock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.test import TestCase, AsyncClient, override_settings
+
+from jogging.async_views import async_view
+from jogging.models import Run
+
+
+@override_settings(WEATHER={"PROVIDER": "fake_weather"})
+class AsyncRunViewsTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="sam")
+        self.client = AsyncClient()
+        self.client.force_login(self.user)
+        with patch("jogging.models.get_weather") as pget_weather:
+            pget_weather.return_value = "Sunny"
+            self.run = Run.objects.create(
+                owner=self.user, date=date(2020, 10, 5), distance=10,
+                time=timedelta(hours=1), location="Porto"
+            )
+
+    async def post_json(self, path, data):
+        # AsyncClient of Django 3.1.2 sends a broken Content-Length header:
+        body = json.dumps(data).encode()
+        headers = [
+            (b"host", b"testserver"),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ]
+        return await self.client.post(
+            path, body, content_type="application/json", headers=headers
+        )
+
+    async def test_list(self):
+        response = await self.client.get("/async/run/")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["count"], 1)
+        self.assertEqual(data["results"][0]["weather"], "Sunny")
+
+    async def test_retrieve(self):
+        response = await self.client.get(f"/async/run/{self.run.pk}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["location"], "Porto")
+
+    @patch("jogging.async_views.aget_weather_many", new_callable=AsyncMock)
+    async def test_create_uses_prefetched_weather(self, paget_weather_many):
+        key = ("Lima", date(2020, 10, 6))
+        paget_weather_many.return_value = {key: "Fog"}
+        response = await self.post_json(
+            "/async/run/",
+            {"date": "2020-10-06", "distance": 5, "time": "00:30:00",
+             "location": " Lima"}
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["weather"], "Fog")
+        paget_weather_many.assert_awaited_once_with([key])
+
+    @patch("jogging.async_views.aget_weather_many", new_callable=AsyncMock)
+    async def test_bulk(self, paget_weather_many):
+        paget_weather_many.return_value = {
+            ("Lima", date(2020, 10, 6)): "Fog",
+            ("Rome", date(2020, 10, 7)): "Rain",
+        }
+        response = await self.post_json(
+            "/async/run/bulk/",
+            [{"date": "2020-10-06", "distance": 5, "time": "00:30:00",
+              "location": "Lima"},
+             {"date": "2020-10-07", "distance": 6, "time": "00:36:00",
+              "location": "Rome"}]
+        )
+        self.assertEqual(response.status_code, 201)
+        weather = await sync_to_async(
+            lambda: sorted(Run.objects.values_list("condition__name", flat=True)),
+            thread_sensitive=True
+        )()
+        self.assertEqual(weather, ["Fog", "Rain", "Sunny"])
+
+    async def test_invalid_run(self):
+        response = await self.post_json("/async/run/", {"date": "never"})
+        self.assertEqual(response.status_code, 400)
+
+    async def test_anonymous_is_forbidden(self):
+        response = await AsyncClient().get("/async/run/")
+        self.assertEqual(response.status_code, 403)
+
+
+class AsyncViewTestCase(TestCase):
+    def test_keeps_csrf_exemption(self):
+        def view(request):
+            pass
+        view.csrf_exempt = True
+        self.assertTrue(async_view(view).csrf_exempt)
@@ -0,0 +1,119 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.contrib.auth.models import User
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory
+
+from jogging.authentication import (
+    TokenAuthentication, TokenCache, token_digest, issue_token, revoke_token,
+    token_cache,
+)
+from jogging.models import AuthToken
+
+
+class TokenDigestTestCase(TestCase):
+    def test_is_deterministic_and_not_the_key(self):
+        digest = token_digest("abc")
+        self.assertEqual(digest, token_digest("abc"))
+        self.assertNotEqual(digest, token_digest("abd"))
+        self.assertNotIn("abc", digest)
+        self.assertEqual(len(digest), 64)
+
+
+class IssueTokenTestCase(TestCase):
+    def test_only_digest_is_stored(self):
+        user = User.objects.create(username="sam")
+        key = issue_token(user)
+        token = AuthToken.objects.get()
+        self.assertEqual(token.owner, user)
+        self.assertEqual(token.digest, token_digest(key))
+
+    def test_revoke_token_removes_it(self):
+        user = User.objects.create(username="sam")
+        key = issue_token(user)
+        token_cache.set(token_digest(key), user)
+        revoke_token(key)
+        self.assertEqual(AuthToken.objects.count(), 0)
+        self.assertIsNone(token_cache.get(token_digest(key)))
+
+
+class TokenCacheTestCase(TestCase):
+    def test_stores_items(self):
+        cache = TokenCache()
+        cache.set("x", "user")
+        self.assertEqual(cache.get("x"), "user")
+        self.assertIsNone(cache.get("y"))
+
+    def test_items_expire(self):
+        cache = TokenCache()
+        with patch("jogging.authentication.time.monotonic") as pmonotonic:
+            pmonotonic.return_value = 100
+            cache.set("x", "user")
+            pmonotonic.return_value = 100+cache.timeout+1
+            self.assertIsNone(cache.get("x"))
+
+    def test_discard(self):
+        cache = TokenCache()
+        cache.set("x", "user")
+        cache.discard("x")
+        self.assertIsNone(cache.get("x"))
+
+
+class TokenAuthenticationTestCase(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.user = User.objects.create(username="sam")
+        self.key = issue_token(self.user)
+        self.factory = APIRequestFactory()
+
+    def authenticate(self, header):
+        request = self.factory.get("/run/", HTTP_AUTHORIZATION=header)
+        return TokenAuthentication().authenticate(request)
+
+    def test_valid_token(self):
+        self.assertEqual(
+            self.authenticate(f"Token {self.key}"), (self.user, self.key)
+        )
+
+    def test_other_schemes_are_ignored(self):
+        self.assertIsNone(self.authenticate("Basic c2FtOnBhc3M="))
+
+    def test_invalid_token(self):
+        for header in ("Token wrong", "Token", "Token a b"):
+            with self.subTest(header=header):
+                with self.assertRaises(AuthenticationFailed):
+                    self.authenticate(header)
+
+    def test_second_authentication_hits_the_cache(self):
+        self.authenticate(f"Token {self.key}")
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate(f"Token {self.key}")
+        self.assertEqual(user, self.user)
+
+    def test_inactive_user(self):
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(f"Token {self.key}")
@@ -0,0 +1,275 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.contrib.auth.models import User
+
+from jogging.bulk import (
+    create_runs, delete_runs, update_runs, rebuild_weekly_reports,
+    import_runs,
+)
+from jogging.models import Run, WeeklyReport, DataVersion, PersonalRecord
+
+
+@patch("jogging.bulk.get_weather_many")
+class CreateRunsTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="sam")
+        self.runs = [
+            Run(
+                date=date(2020, 10, 5),
+                distance=10,
+                time=timedelta(hours=1),
+                location="Porto",
+                owner=self.user,
+            ),
+            Run(
+                date=date(2020, 10, 7),
+                distance=5,
+                time=timedelta(minutes=30),
+                location="Porto",
+                owner=self.user,
+            ),
+            Run(
+                date=date(2020, 10, 12),
+                distance=8,
+                time=timedelta(minutes=40),
+                location="Lima",
+                owner=self.user,
+            ),
+        ]
+
+    def test_stores_all_runs_with_pks(self, pget_weather_many):
+        pget_weather_many.return_value = {
+            ("Porto", date(2020, 10, 5)): "Sunny",
+            ("Porto", date(2020, 10, 7)): "Cloudy",
+            ("Lima", date(2020, 10, 12)): None,
+        }
+        runs = create_runs(self.runs)
+        self.assertEqual(Run.objects.count(), 3)
+        self.assertEqual(
+            [run.pk for run in runs],
+            list(Run.objects.order_by("pk").values_list("pk", flat=True))
+        )
+        self.assertEqual(
+            [Run.objects.get(pk=run.pk).weather for run in runs],
+            ["Sunny", "Cloudy", "?"]
+        )
+
+    def test_weather_resolved_in_one_batch(self, pget_weather_many):
+        pget_weather_many.return_value = {
+            ("Porto", date(2020, 10, 5)): "Sunny",
+            ("Porto", date(2020, 10, 7)): "Cloudy",
+            ("Lima", date(2020, 10, 12)): None,
+        }
+        create_runs(self.runs)
+        pget_weather_many.assert_called_once()
+        keys = list(pget_weather_many.call_args[0][0])
+        self.assertEqual(len(keys), 3)
+
+    def test_computes_weekly_reports(self, pget_weather_many):
+        pget_weather_many.return_value = {
+            ("Porto", date(2020, 10, 5)): None,
+            ("Porto", date(2020, 10, 7)): None,
+            ("Lima", date(2020, 10, 12)): None,
+        }
+        create_runs(self.runs)
+        self.assertEqual(WeeklyReport.objects.count(), 2)
+        first = WeeklyReport.objects.get(week_start=date(2020, 10, 5))
+        self.assertEqual(first.total_distance_km, 15)
+        self.assertAlmostEqual(first.average_speed_kmph, 10)
+        second = WeeklyReport.objects.get(week_start=date(2020, 10, 12))
+        self.assertEqual(second.total_distance_km, 8)
+        self.assertAlmostEqual(second.average_speed_kmph, 12)
+
+    def test_recomputes_each_week_once(self, pget_weather_many):
+        pget_weather_many.return_value = {
+            ("Porto", date(2020, 10, 5)): None,
+            ("Porto", date(2020, 10, 7)): None,
+            ("Lima", date(2020, 10, 12)): None,
+        }
+        with patch("jogging.signals.update_weekly_report") as pupdate:
+            create_runs(self.runs)
+        self.assertEqual(pupdate.call_count, 2)
+
+
+class BulkChangesBaseTestCase(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create(username="sam")
+        self.user2 = User.objects.create(username="dave")
+        with patch("jogging.models.get_weather") as pget_weather:
+            pget_weather.return_value = "Cloudy"
+            for user in (self.user1, self.user2):
+                for day, distance in ((5, 10), (7, 5), (12, 8)):
+                    Run.objects.create(
+                        date=date(2020, 10, day),
+                        distance=distance,
+                        time=timedelta(hours=1),
+                        location="Porto",
+                        owner=user,
+                    )
+
+
+class DeleteRunsTestCase(BulkChangesBaseTestCase):
+    def test_deletes_matching_runs(self):
+        count = delete_runs(Run.objects.filter(distance__gt=6))
+        self.assertEqual(count, 4)
+        self.assertEqual(Run.objects.count(), 2)
+
+    def test_repairs_affected_reports(self):
+        delete_runs(Run.objects.filter(owner=self.user1, distance__gt=6))
+        reports = WeeklyReport.objects.filter(owner=self.user1)
+        self.assertEqual(reports.count(), 1)
+        self.assertEqual(reports[0].week_start, date(2020, 10, 5))
+        self.assertEqual(reports[0].total_distance_km, 5)
+        other = WeeklyReport.objects.get(
+            owner=self.user2, week_start=date(2020, 10, 5))
+        self.assertEqual(other.total_distance_km, 15)
+
+
+class UpdateRunsTestCase(BulkChangesBaseTestCase):
+    def test_updates_matching_runs(self):
+        count = update_runs(Run.objects.filter(distance=10), distance=12)
+        self.assertEqual(count, 2)
+        self.assertEqual(Run.objects.filter(distance=12).count(), 2)
+        report = WeeklyReport.objects.get(
+            owner=self.user1, week_start=date(2020, 10, 5))
+        self.assertEqual(report.total_distance_km, 17)
+
+    def test_moving_runs_repairs_old_and_new_weeks(self):
+        update_runs(
+            Run.objects.filter(owner=self.user1, date=date(2020, 10, 12)),
+            date=date(2020, 10, 6)
+        )
+        reports = WeeklyReport.objects.filter(owner=self.user1)
+        self.assertEqual(reports.count(), 1)
+        self.assertEqual(reports[0].total_distance_km, 23)
+
+    @patch("jogging.bulk.get_weather_many")
+    def test_refreshes_weather_if_location_changes(self, pget_weather_many):
+        pget_weather_many.return_value = {
+            ("Lima", date(2020, 10, 5)): "Sunny",
+        }
+        update_runs(
+            Run.objects.filter(owner=self.user1, date=date(2020, 10, 5)),
+            location="Lima"
+        )
+        run = Run.objects.get(owner=self.user1, date=date(2020, 10, 5))
+        self.assertEqual(run.weather, "Sunny")
+        run = Run.objects.get(owner=self.user2, date=date(2020, 10, 5))
+        self.assertEqual(run.weather, "Cloudy")
+
+    @patch("jogging.bulk.get_weather_many")
+    def test_weather_untouched_if_no_location_or_date(
+            self, pget_weather_many):
+        update_runs(Run.objects.all(), distance=1)
+        pget_weather_many.assert_not_called()
+
+
+class RebuildWeeklyReportsTestCase(BulkChangesBaseTestCase):
+    def test_rebuilds_reports_of_owners(self):
+        WeeklyReport.objects.all().update(total_distance_km=0)
+        Run.objects.bulk_create([
+            Run(
+                date=date(2020, 10, 20), distance=4,
+                time=timedelta(minutes=20), location="Porto",
+                owner=self.user1,
+            ),
+        ])
+        rebuild_weekly_reports([self.user1.pk], chunk_size=1)
+        reports = WeeklyReport.objects.filter(
+            owner=self.user1).order_by("week_start")
+        self.assertEqual(
+            [(r.week_start, r.total_distance_km) for r in reports],
+            [
+                (date(2020, 10, 5), 15),
+                (date(2020, 10, 12), 8),
+                (date(2020, 10, 19), 4),
+            ]
+        )
+        self.assertAlmostEqual(reports[0].average_speed_kmph, 7.5)
+        self.assertAlmostEqual(reports[2].average_speed_kmph, 12)
+        # other owners untouched:
+        self.assertEqual(
+            set(WeeklyReport.objects.filter(
+                owner=self.user2).values_list("total_distance_km", flat=True)),
+            {0}
+        )
+
+    def test_marks_data_as_changed(self):
+        version = DataVersion.objects.get(owner=self.user1).version
+        rebuild_weekly_reports([self.user1.pk])
+        self.assertEqual(
+            DataVersion.objects.get(owner=self.user1).version, version+1)
+
+
+@patch("jogging.bulk.get_weather_many")
+class ImportRunsTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="sam")
+        self.rows = [
+            {"date": date(2020, 10, 5+i), "distance": 5+i,
+             "time": timedelta(minutes=30), "location": "Porto"}
+            for i in range(5)
+        ]
+
+    def test_stores_runs_in_batches(self, pget_weather_many):
+        pget_weather_many.side_effect = lambda keys: dict.fromkeys(keys)
+        count, elapsed = import_runs(self.user, iter(self.rows), batch_size=2)
+        self.assertEqual(count, 5)
+        self.assertGreater(elapsed, 0)
+        self.assertEqual(Run.objects.filter(owner=self.user).count(), 5)
+
+    def test_weather_is_fetched_once_afterwards(self, pget_weather_many):
+        pget_weather_many.side_effect = lambda keys: {
+            key: "Sunny" for key in keys
+        }
+        import_runs(self.user, self.rows, batch_size=2)
+        pget_weather_many.assert_called_once()
+        self.assertEqual(len(set(pget_weather_many.call_args[0][0])), 5)
+        self.assertEqual(
+            set(Run.objects.values_list("condition__name", flat=True)), {"Sunny"}
+        )
+
+    def test_rebuilds_reports_and_records(self, pget_weather_many):
+        pget_weather_many.side_effect = lambda keys: dict.fromkeys(keys)
+        import_runs(self.user, self.rows)
+        self.assertEqual(
+            list(WeeklyReport.objects.order_by("week_start").values_list(
+                "week_start", "total_distance_km"
+            )),
+            [(date(2020, 10, 5), 35.0)]
+        )
+        self.assertEqual(
+            PersonalRecord.objects.get(kind="longest_run").value, 9
+        )
+        self.assertEqual(DataVersion.objects.get(owner=self.user).version, 1)
+
+    def test_nothing_is_stored_if_a_row_fails(self, pget_weather_many):
+        def rows():
+            yield from self.rows
+            raise ValueError("bad row")
+        with self.assertRaises(ValueError):
+            import_runs(self.user, rows(), batch_size=2)
+        self.assertFalse(Run.objects.exists())
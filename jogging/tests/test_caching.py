@@ -0,0 +1,64 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.core.cache import caches
+
+from jogging.caching import PerUserCache
+
+
+class PerUserCacheTestCase(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.cache = PerUserCache("test")
+
+    def test_get_returns_what_was_set(self):
+        self.cache.set(1, "/a/", {"x": 1})
+        self.assertEqual(self.cache.get(1, "/a/"), {"x": 1})
+        self.assertIsNone(self.cache.get(1, "/b/"))
+        self.assertIsNone(self.cache.get(2, "/a/"))
+
+    def test_counts_hits_and_misses(self):
+        self.cache.set(1, "/a/", {"x": 1})
+        self.cache.get(1, "/a/")
+        self.cache.get(1, "/a/")
+        self.cache.get(1, "/b/")
+        self.assertEqual(self.cache.stats(), {"hits": 2, "misses": 1})
+        self.cache.reset_stats()
+        self.assertEqual(self.cache.stats(), {"hits": 0, "misses": 0})
+
+    def test_invalidate_drops_only_entries_of_the_user(self):
+        self.cache.set(1, "/a/", {"x": 1})
+        self.cache.set(1, "/b/", {"x": 2})
+        self.cache.set(2, "/a/", {"x": 3})
+        self.cache.invalidate(1)
+        self.assertIsNone(self.cache.get(1, "/a/"))
+        self.assertIsNone(self.cache.get(1, "/b/"))
+        self.assertEqual(self.cache.get(2, "/a/"), {"x": 3})
+
+    def test_invalidate_again_after_commit(self):
+        with patch("jogging.caching.transaction.on_commit") as pon_commit:
+            self.cache.invalidate(1)
+        self.cache.set(1, "/a/", {"x": 1})
+        pon_commit.call_args[0][0]()
+        self.assertIsNone(self.cache.get(1, "/a/"))
@@ -0,0 +1,181 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from jogging.bulk import create_runs, delete_runs, import_runs, update_runs
+from jogging import columnar
+from jogging.columnar import (
+    pack, unpack, run_snapshot, build_run_snapshot, sync_run_snapshots,
+)
+from jogging.models import Run, RunSnapshot
+from jogging.versions import touch
+
+
+def no_weather(keys):
+    return dict.fromkeys(keys)
+
+
+def snapshot_rows(owner):
+    return sorted(
+        (int(row["id"]), date.fromordinal(int(row["day"])),
+         int(row["place"]), float(row["distance"]), float(row["seconds"]))
+        for row in run_snapshot(owner)
+    )
+
+
+def expected_rows(owner):
+    return sorted(
+        (run.pk, run.date, run.place_id, run.distance,
+         run.time.total_seconds())
+        for run in Run.objects.filter(owner=owner)
+    )
+
+
+class PackTestCase(TestCase):
+    def test_round_trip(self):
+        rows = [
+            (1, 7, date(2020, 10, 5), 4, 10.5, timedelta(hours=1)),
+            (2, 7, date(2020, 10, 6), 2, 5.0, timedelta(minutes=30)),
+            (3, 7, date(2020, 10, 7), 4, 8.0, timedelta(minutes=40)),
+        ]
+        table = unpack(pack(rows).tobytes())
+        self.assertEqual(table["id"].tolist(), [1, 2, 3])
+        self.assertEqual(table["place"].tolist(), [4, 2, 4])
+        self.assertEqual(
+            table["day"].tolist(),
+            [date(2020, 10, d).toordinal() for d in (5, 6, 7)]
+        )
+        self.assertEqual(table["distance"].tolist(), [10.5, 5.0, 8.0])
+        self.assertEqual(table["seconds"].tolist(), [3600, 1800, 2400])
+
+
+@patch("jogging.bulk.get_weather_many", no_weather)
+class RunSnapshotTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="sam")
+        self.other = User.objects.create(username="dave")
+        create_runs([
+            Run(owner=self.user, date=date(2020, 10, 5), distance=10,
+                time=timedelta(hours=1), location="Porto"),
+            Run(owner=self.user, date=date(2020, 10, 7), distance=5,
+                time=timedelta(minutes=30), location="Lima"),
+            Run(owner=self.other, date=date(2020, 10, 7), distance=42,
+                time=timedelta(hours=4), location="Lima"),
+        ])
+
+    def test_built_on_first_read(self):
+        self.assertFalse(RunSnapshot.objects.exists())
+        self.assertEqual(snapshot_rows(self.user), expected_rows(self.user))
+        self.assertEqual(RunSnapshot.objects.get().owner, self.user)
+
+    def test_valid_snapshot_is_read_with_one_query(self):
+        run_snapshot(self.user)
+        with self.assertNumQueries(1):
+            table = run_snapshot(self.user.pk)
+        self.assertEqual(len(table), 2)
+        self.assertFalse(table.flags.writeable)
+
+    def test_stale_snapshot_is_rebuilt(self):
+        run_snapshot(self.user)
+        Run.objects.filter(owner=self.user).update(distance=1)
+        touch(self.user)
+        self.assertEqual(
+            [row[3] for row in snapshot_rows(self.user)], [1.0, 1.0]
+        )
+
+    def test_synced_after_create_runs(self):
+        run_snapshot(self.user)
+        create_runs([
+            Run(owner=self.user, date=date(2020, 10, 9), distance=7,
+                time=timedelta(minutes=35), location="Berlin"),
+        ])
+        with self.assertNumQueries(1):
+            rows = snapshot_rows(self.user)
+        self.assertEqual(rows, expected_rows(self.user))
+
+    def test_synced_after_update_runs(self):
+        run_snapshot(self.user)
+        update_runs(
+            Run.objects.filter(owner=self.user, place__name="Lima"),
+            location="Rome", distance=6
+        )
+        with self.assertNumQueries(1):
+            rows = snapshot_rows(self.user)
+        self.assertEqual(rows, expected_rows(self.user))
+
+    def test_synced_after_delete_runs(self):
+        run_snapshot(self.user)
+        delete_runs(Run.objects.filter(distance__gt=6))
+        with self.assertNumQueries(1):
+            rows = snapshot_rows(self.user)
+        self.assertEqual(rows, expected_rows(self.user))
+        self.assertEqual(len(rows), 1)
+
+    @patch("jogging.models.get_weather")
+    def test_synced_after_save(self, pget_weather):
+        pget_weather.return_value = "Sunny"
+        run_snapshot(self.user)
+        Run.objects.create(
+            owner=self.user, date=date(2020, 10, 10), distance=3,
+            time=timedelta(minutes=20), location="Porto"
+        )
+        with self.assertNumQueries(1):
+            rows = snapshot_rows(self.user)
+        self.assertEqual(rows, expected_rows(self.user))
+
+    @patch("jogging.models.get_weather")
+    def test_stale_snapshot_is_not_patched(self, pget_weather):
+        pget_weather.return_value = "Sunny"
+        run_snapshot(self.user)
+        # the import makes the snapshot stale without syncing it:
+        import_runs(self.user, [
+            {"date": date(2020, 11, day), "distance": day,
+             "time": timedelta(minutes=10), "location": "Porto"}
+            for day in range(1, 11)
+        ])
+        Run.objects.create(
+            owner=self.user, date=date(2020, 11, 20), distance=3,
+            time=timedelta(minutes=20), location="Porto"
+        )
+        rows = snapshot_rows(self.user)
+        self.assertEqual(len(rows), 13)
+        self.assertEqual(rows, expected_rows(self.user))
+
+    def test_concurrently_changed_snapshot_is_dropped(self):
+        build_run_snapshot(self.user.pk)
+        run = Run.objects.filter(owner=self.user).first()
+        versions = columnar._versions
+
+        def concurrent_sync(owner_ids):
+            # another writer syncs between our read and our write:
+            RunSnapshot.objects.update(version=99)
+            return versions(owner_ids)
+
+        with patch("jogging.columnar._versions", concurrent_sync):
+            sync_run_snapshots(
+                {self.user.pk: {run.pk}}, versions({self.user.pk})
+            )
+        self.assertFalse(RunSnapshot.objects.exists())
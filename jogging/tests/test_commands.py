@@ -0,0 +1,118 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from jogging.models import PersonalRecord, Run, WeeklyReport
+
+
+class BenchmarkSqliteTestCase(TestCase):
+    def test_reports_both_setups(self):
+        out = StringIO()
+        call_command("benchmark_sqlite", threads=2, writes=5, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn("default:", lines[0])
+        self.assertIn("tuned:", lines[1])
+        for line in lines:
+            self.assertIn("10 committed", line)
+
+
+class GenerateRunsTestCase(TestCase):
+    def test_creates_users_runs_and_reports(self):
+        out = StringIO()
+        call_command(
+            "generate_runs", users=5, weeks=4, prefix="gen",
+            end_date=date(2020, 10, 14), stdout=out
+        )
+        self.assertEqual(
+            User.objects.filter(username__startswith="gen-").count(), 5)
+        runs = Run.objects.count()
+        self.assertGreater(runs, 0)
+        self.assertIn(f"5 users and {runs} runs", out.getvalue())
+        self.assertTrue(WeeklyReport.objects.exists())
+        self.assertFalse(Run.objects.filter(date__gt=date(2020, 10, 14)))
+
+    def test_builds_the_run_records(self):
+        call_command(
+            "generate_runs", users=3, weeks=4, prefix="gen",
+            end_date=date(2020, 10, 14), stdout=StringIO()
+        )
+        for user in User.objects.filter(username__startswith="gen-"):
+            longest = Run.objects.filter(owner=user).order_by(
+                "-distance"
+            ).first()
+            record = PersonalRecord.objects.get(
+                owner=user, kind="longest_run"
+            )
+            self.assertEqual(record.value, longest.distance)
+
+    def test_is_reproducible(self):
+        def generate(prefix):
+            call_command(
+                "generate_runs", users=3, weeks=2, prefix=prefix,
+                end_date=date(2020, 10, 14), stdout=StringIO()
+            )
+            return sorted(
+                Run.objects.filter(
+                    owner__username__startswith=prefix
+                ).values_list("date", "distance", "place__name")
+            )
+        self.assertEqual(generate("a"), generate("b"))
+
+
+@patch("jogging.bulk.get_weather_many", lambda keys: dict.fromkeys(keys))
+class ImportRunsTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="sam")
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.path = os.path.join(tmpdir.name, "history.csv")
+        with open(self.path, "w") as f:
+            f.write("date,distance,time,location\n")
+            f.write("2020-10-05,10,01:00:00,Porto\n")
+            f.write("2020-10-06,5,00:30:00,Porto\n")
+
+    def test_imports_csv(self):
+        out = StringIO()
+        call_command("import_runs", "sam", self.path, stdout=out)
+        self.assertEqual(Run.objects.filter(owner=self.user).count(), 2)
+        self.assertRegex(
+            out.getvalue(), r"Imported 2 runs in [\d.]+s \(\d+ rows/s\)"
+        )
+
+    def test_unknown_user(self):
+        with self.assertRaises(CommandError):
+            call_command("import_runs", "nobody", self.path)
+
+    def test_gpx_needs_location(self):
+        with self.assertRaises(CommandError):
+            call_command("import_runs", "sam", self.path, format="gpx")
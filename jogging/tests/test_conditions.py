@@ -0,0 +1,116 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from jogging.conditions import (
+    META_WEATHER_STATES, UNKNOWN_WEATHER, get_conditions,
+)
+from jogging.models import Run, WeatherCondition
+from jogging.views import RunViewSet
+
+
+class GetConditionsTestCase(TestCase):
+    def test_table_is_seeded_with_the_provider_states(self):
+        self.assertEqual(WeatherCondition.objects.filter(
+            name__in=META_WEATHER_STATES+(UNKNOWN_WEATHER,)
+        ).count(), len(META_WEATHER_STATES)+1)
+
+    def test_one_query_for_known_conditions(self):
+        with self.assertNumQueries(1):
+            conditions = get_conditions(["Clear", "Light Rain", "Clear"])
+        self.assertEqual(
+            {name: condition.name for name, condition in conditions.items()},
+            {"Clear": "Clear", "Light Rain": "Light Rain"}
+        )
+
+    def test_creates_unknown_conditions(self):
+        condition = get_conditions(["Sandstorm"])["Sandstorm"]
+        self.assertEqual(
+            WeatherCondition.objects.get(name="Sandstorm"), condition
+        )
+
+
+@patch("jogging.models.get_weather")
+class RunWeatherTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="sam")
+
+    def new_run(self, **kwargs):
+        return Run(
+            date=date(2020, 10, 5), distance=5, time=timedelta(minutes=30),
+            location="Porto", owner=self.user, **kwargs
+        )
+
+    def test_weather_is_stored_as_a_condition(self, pget_weather):
+        pget_weather.return_value = "Light Rain"
+        run = self.new_run()
+        run.save()
+        self.assertEqual(run.condition.name, "Light Rain")
+        self.assertEqual(Run.objects.get(pk=run.pk).weather, "Light Rain")
+
+    def test_unknown_weather(self, pget_weather):
+        pget_weather.return_value = None
+        run = self.new_run()
+        self.assertEqual(run.weather, UNKNOWN_WEATHER)
+        run.save()
+        self.assertEqual(run.condition.name, UNKNOWN_WEATHER)
+
+    def test_bulk_create_resolves_the_weather(self, pget_weather):
+        Run.objects.bulk_create(
+            [self.new_run(weather="Clear"), self.new_run()]
+        )
+        self.assertEqual(
+            sorted(Run.objects.values_list("condition__name", flat=True)),
+            [UNKNOWN_WEATHER, "Clear"]
+        )
+
+
+class RunWeatherFilterTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="sam")
+        self.factory = APIRequestFactory()
+        Run.objects.bulk_create(
+            Run(
+                date=date(2020, 10, day), distance=day,
+                time=timedelta(minutes=30), location="Porto",
+                weather=weather, owner=self.user,
+            ) for day, weather in ((5, "Clear"), (6, "Light Rain"))
+        )
+
+    def list(self, url):
+        request = self.factory.get(url)
+        force_authenticate(request, user=self.user)
+        response = RunViewSet.as_view({"get": "list"})(request)
+        return [run["weather"] for run in response.data["results"]]
+
+    def test_filter_by_weather(self):
+        self.assertEqual(self.list("/run/?weather=Clear"), ["Clear"])
+
+    def test_search_by_weather(self):
+        self.assertEqual(
+            self.list("/run/?search=weather ne 'Clear'"), ["Light Rain"]
+        )
@@ -0,0 +1,85 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from django.test import SimpleTestCase, override_settings
+
+from jogging.db import apply_sqlite_pragmas, configure_sqlite
+
+
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 1234,
+}
+
+
+class ApplySqlitePragmasTestCase(unittest.TestCase):
+    def test_sets_pragmas(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            conn = sqlite3.connect(os.path.join(tmpdir, "x.sqlite3"))
+            apply_sqlite_pragmas(conn, PRAGMAS)
+            self.assertEqual(
+                conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+            self.assertEqual(
+                conn.execute("PRAGMA synchronous").fetchone()[0], 1)
+            self.assertEqual(
+                conn.execute("PRAGMA busy_timeout").fetchone()[0], 1234)
+            conn.close()
+
+
+@override_settings(SQLITE_PRAGMAS=PRAGMAS)
+class ConfigureSqliteTestCase(SimpleTestCase):
+    def test_applies_pragmas_to_sqlite_connections(self):
+        connection = MagicMock()
+        connection.vendor = "sqlite"
+        connection.is_in_memory_db.return_value = False
+        configure_sqlite(None, connection)
+        executed = [
+            c[0][0] for c in connection.connection.execute.call_args_list]
+        self.assertEqual(
+            executed,
+            [
+                "PRAGMA journal_mode=WAL",
+                "PRAGMA synchronous=NORMAL",
+                "PRAGMA busy_timeout=1234",
+            ]
+        )
+
+    def test_no_wal_for_in_memory_databases(self):
+        connection = MagicMock()
+        connection.vendor = "sqlite"
+        connection.is_in_memory_db.return_value = True
+        configure_sqlite(None, connection)
+        executed = [
+            c[0][0] for c in connection.connection.execute.call_args_list]
+        self.assertNotIn("PRAGMA journal_mode=WAL", executed)
+
+    def test_ignores_other_databases(self):
+        connection = MagicMock()
+        connection.vendor = "postgresql"
+        configure_sqlite(None, connection)
+        connection.connection.execute.assert_not_called()
@@ -0,0 +1,148 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+import os
+import sqlite3
+import tempfile
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, TransactionTestCase
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connections
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from jogging.dbrouters import (
+    ReadReplicaRouter, allow_replica, reset_replica, mark_write,
+    wrote_recently,
+)
+from jogging.models import Run
+from jogging.views import RunViewSet
+
+
+class ReadReplicaRouterTestCase(SimpleTestCase):
+    def setUp(self):
+        self.router = ReadReplicaRouter()
+
+    @patch("jogging.dbrouters.replica_available")
+    def test_reads_go_to_replica_only_if_allowed(self, preplica_available):
+        preplica_available.return_value = True
+        self.assertEqual(self.router.db_for_read(Run), "default")
+        token = allow_replica()
+        try:
+            self.assertEqual(self.router.db_for_read(Run), "replica")
+        finally:
+            reset_replica(token)
+        self.assertEqual(self.router.db_for_read(Run), "default")
+
+    @patch("jogging.dbrouters.replica_available")
+    def test_no_replica_configured(self, preplica_available):
+        preplica_available.return_value = False
+        token = allow_replica()
+        try:
+            self.assertEqual(self.router.db_for_read(Run), "default")
+        finally:
+            reset_replica(token)
+
+    def test_writes_go_to_default(self):
+        token = allow_replica()
+        try:
+            self.assertEqual(self.router.db_for_write(Run), "default")
+        finally:
+            reset_replica(token)
+
+    def test_no_migrations_on_replica(self):
+        self.assertFalse(self.router.allow_migrate("replica", "jogging"))
+        self.assertIsNone(self.router.allow_migrate("default", "jogging"))
+
+
+class ReadYourWritesTestCase(SimpleTestCase):
+    def setUp(self):
+        caches["default"].clear()
+
+    def test_write_opens_window(self):
+        self.assertFalse(wrote_recently(7))
+        mark_write(7)
+        self.assertTrue(wrote_recently(7))
+        self.assertFalse(wrote_recently(8))
+
+
+class ReplicaIntegrationTestCase(TransactionTestCase):
+    """The replica is a separate SQLite file, synchronized from the
+    primary database only when the test says so."""
+
+    def setUp(self):
+        caches["default"].clear()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        settings_dict = dict(connections.databases["default"])
+        settings_dict["NAME"] = os.path.join(self.tmpdir.name, "r.sqlite3")
+        settings_dict["TEST"] = {}
+        connections.databases["replica"] = settings_dict
+        self.sync_replica()
+        self.factory = APIRequestFactory()
+        self.writer = User.objects.create(username="sam")
+        self.reader = User.objects.create_superuser(username="boss")
+
+    def tearDown(self):
+        connections["replica"].close()
+        del connections["replica"]
+        del connections.databases["replica"]
+        self.tmpdir.cleanup()
+
+    def sync_replica(self):
+        primary = connections["default"]
+        primary.ensure_connection()
+        target = sqlite3.connect(connections.databases["replica"]["NAME"])
+        primary.connection.backup(target)
+        target.close()
+
+    def list_runs(self, user):
+        view = RunViewSet.as_view({'get': 'list'})
+        request = self.factory.get("/run/")
+        force_authenticate(request, user=user)
+        response = view(request)
+        return response.data["count"]
+
+    def create_run(self, user):
+        view = RunViewSet.as_view({'post': 'create'})
+        request = self.factory.post(
+            "/run/",
+            {
+                "date": "2020-10-12", "distance": "2.6",
+                "time": "01:23:30", "location": "Rome"
+            },
+            format="json",
+        )
+        force_authenticate(request, user=user)
+        with patch("jogging.models.get_weather") as pget_weather:
+            pget_weather.return_value = "Cloudy"
+            return view(request)
+
+    def test_reads_from_replica_and_reads_own_writes(self):
+        self.sync_replica()
+        self.assertEqual(self.create_run(self.writer).status_code, 201)
+        # the writer reads from the primary:
+        self.assertEqual(self.list_runs(self.writer), 1)
+        # other users read from the (not yet synchronized) replica:
+        self.assertEqual(self.list_runs(self.reader), 0)
+        self.sync_replica()
+        self.assertEqual(self.list_runs(self.reader), 1)
+        self.assertEqual(Run.objects.count(), 1)
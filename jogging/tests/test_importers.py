@@ -0,0 +1,137 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+import io
+import unittest
+from datetime import date, timedelta
+
+from jogging.importers import (
+    RunImportError, detect_format, haversine_km, iter_csv_runs,
+    iter_gpx_runs, iter_runs,
+)
+
+
+GPX = b"""<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" creator="test" xmlns="http://www.topografix.com/GPX/1/1">
+  <trk><name>Morning run</name><trkseg>
+    <trkpt lat="52.5200" lon="13.4050"><time>2020-10-05T07:00:00Z</time>
+    </trkpt>
+    <trkpt lat="52.5290" lon="13.4050"><time>2020-10-05T07:05:00Z</time>
+    </trkpt>
+    <trkpt lat="52.5380" lon="13.4050"><time>2020-10-05T07:10:30Z</time>
+    </trkpt>
+  </trkseg></trk>
+  <trk><trkseg>
+    <trkpt lat="52.5200" lon="13.4050"><time>2020-10-07T18:00:00Z</time>
+    </trkpt>
+    <trkpt lat="52.5200" lon="13.4197"><time>2020-10-07T18:06:00Z</time>
+    </trkpt>
+  </trkseg></trk>
+</gpx>
+"""
+
+
+class HaversineTestCase(unittest.TestCase):
+    def test_one_degree_of_latitude(self):
+        self.assertAlmostEqual(haversine_km([0, 1], [0, 0]), 111.195, 3)
+
+    def test_sums_the_segments(self):
+        self.assertAlmostEqual(
+            haversine_km([0, 1, 0], [0, 0, 0]), 2*111.195, 2
+        )
+
+    def test_single_point(self):
+        self.assertEqual(haversine_km([52.5], [13.4]), 0.0)
+
+
+class DetectFormatTestCase(unittest.TestCase):
+    def test_by_extension(self):
+        self.assertEqual(detect_format("history.CSV"), "csv")
+        self.assertEqual(detect_format("/tmp/track.gpx"), "gpx")
+
+    def test_unknown(self):
+        with self.assertRaises(RunImportError):
+            detect_format("history.xlsx")
+
+
+class CsvTestCase(unittest.TestCase):
+    def test_parses_rows(self):
+        data = (
+            "\ufeffdate,distance,time,location\r\n"
+            "2020-10-05,10.5,01:02:03,Porto\r\n"
+            "2020-10-07,5,1800,\r\n"
+        ).encode()
+        runs = list(iter_csv_runs(io.BytesIO(data), location="Lima"))
+        self.assertEqual(runs, [
+            {"date": date(2020, 10, 5), "distance": 10.5,
+             "time": timedelta(hours=1, minutes=2, seconds=3),
+             "location": "Porto"},
+            {"date": date(2020, 10, 7), "distance": 5.0,
+             "time": timedelta(seconds=1800), "location": "Lima"},
+        ])
+
+    def test_is_lazy(self):
+        data = b"date,distance,time,location\n2020-10-05,1,60,Porto\nbad\n"
+        runs = iter_csv_runs(io.BytesIO(data))
+        self.assertEqual(next(runs)["distance"], 1.0)
+        with self.assertRaisesRegex(RunImportError, "line 3"):
+            next(runs)
+
+    def test_invalid_distances_and_times(self):
+        for distance, time in (
+                ("nan", "60"), ("inf", "60"), ("-1", "60"), ("1", "-60")):
+            with self.subTest(distance=distance, time=time):
+                data = (
+                    "date,distance,time,location\n"
+                    "2020-10-05,1,60,Porto\n"
+                    f"2020-10-06,{distance},{time},Porto\n"
+                ).encode()
+                with self.assertRaisesRegex(RunImportError, "line 3"):
+                    list(iter_csv_runs(io.BytesIO(data)))
+
+    def test_missing_location(self):
+        data = b"date,distance,time\n2020-10-05,1,60\n"
+        with self.assertRaises(RunImportError):
+            list(iter_csv_runs(io.BytesIO(data)))
+
+    def test_not_utf8(self):
+        data = b"date,distance,time,location\n2020-10-05,1,60,\xff\n"
+        with self.assertRaises(RunImportError):
+            list(iter_csv_runs(io.BytesIO(data)))
+
+
+class GpxTestCase(unittest.TestCase):
+    def test_one_run_per_track(self):
+        first, second = iter_gpx_runs(io.BytesIO(GPX), "Berlin")
+        self.assertEqual(first["date"], date(2020, 10, 5))
+        self.assertAlmostEqual(first["distance"], 2.002, 2)
+        self.assertEqual(first["time"], timedelta(minutes=10, seconds=30))
+        self.assertEqual(first["location"], "Berlin")
+        self.assertEqual(second["date"], date(2020, 10, 7))
+        self.assertAlmostEqual(second["distance"], 1.0, 1)
+
+    def test_invalid(self):
+        with self.assertRaises(RunImportError):
+            list(iter_gpx_runs(io.BytesIO(b"<gpx><trk>"), "Berlin"))
+
+    def test_needs_location(self):
+        with self.assertRaises(RunImportError):
+            iter_runs(io.BytesIO(GPX), "gpx")
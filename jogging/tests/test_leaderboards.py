@@ -0,0 +1,195 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+import random
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from jogging.bulk import (
+    create_runs, delete_runs, import_runs, rebuild_weekly_reports,
+)
+from jogging.leaderboards import (
+    WEEK, MONTH, period_start, next_period_start, move_entry,
+    rebuild_leaderboards,
+)
+from jogging.models import Run, LeaderboardEntry
+
+
+MONDAY = date(2020, 10, 5)
+
+
+def board(period=WEEK, start=MONDAY):
+    return list(
+        LeaderboardEntry.objects.filter(
+            period=period, period_start=start
+        ).order_by("rank").values_list("rank", "owner__username", "distance")
+    )
+
+
+class PeriodTestCase(TestCase):
+    def test_period_start(self):
+        self.assertEqual(period_start(WEEK, date(2020, 10, 8)), MONDAY)
+        self.assertEqual(
+            period_start(MONTH, date(2020, 10, 8)), date(2020, 10, 1)
+        )
+
+    def test_next_period_start(self):
+        self.assertEqual(
+            next_period_start(WEEK, MONDAY), date(2020, 10, 12)
+        )
+        self.assertEqual(
+            next_period_start(MONTH, date(2020, 12, 1)), date(2021, 1, 1)
+        )
+
+
+class MoveEntryTestCase(TestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create(username=name)
+            for name in ("ann", "bob", "cid", "dan")
+        ]
+        for user, distance in zip(self.users, (30, 20, 10, 5)):
+            move_entry(WEEK, MONDAY, user.pk, distance)
+
+    def test_ranks_by_distance(self):
+        self.assertEqual(board(), [
+            (1, "ann", 30), (2, "bob", 20), (3, "cid", 10), (4, "dan", 5),
+        ])
+
+    def test_moving_up_shifts_only_the_range(self):
+        move_entry(WEEK, MONDAY, self.users[2].pk, 25)
+        self.assertEqual(board(), [
+            (1, "ann", 30), (2, "cid", 25), (3, "bob", 20), (4, "dan", 5),
+        ])
+
+    def test_moving_down(self):
+        move_entry(WEEK, MONDAY, self.users[0].pk, 7)
+        self.assertEqual(board(), [
+            (1, "bob", 20), (2, "cid", 10), (3, "ann", 7), (4, "dan", 5),
+        ])
+
+    def test_ties_are_ordered_by_user(self):
+        move_entry(WEEK, MONDAY, self.users[3].pk, 20)
+        self.assertEqual(board(), [
+            (1, "ann", 30), (2, "bob", 20), (3, "dan", 20), (4, "cid", 10),
+        ])
+
+    def test_removal_closes_the_gap(self):
+        move_entry(WEEK, MONDAY, self.users[1].pk, None)
+        self.assertEqual(board(), [
+            (1, "ann", 30), (2, "cid", 10), (3, "dan", 5),
+        ])
+
+    def test_unchanged_rank_is_one_write_and_one_count(self):
+        with self.assertNumQueries(5):
+            # savepoint, update, count, rank, release
+            move_entry(WEEK, MONDAY, self.users[1].pk, 21)
+        self.assertEqual(board()[1], (2, "bob", 21))
+
+    def test_other_boards_are_untouched(self):
+        move_entry(WEEK, date(2020, 10, 12), self.users[3].pk, 50)
+        self.assertEqual(board()[3], (4, "dan", 5))
+        self.assertEqual(
+            board(start=date(2020, 10, 12)), [(1, "dan", 50)]
+        )
+
+    def test_random_moves_match_full_ranking(self):
+        rng = random.Random(0)
+        users = self.users+[
+            User.objects.create(username=f"u{i}") for i in range(8)
+        ]
+        for _ in range(60):
+            user = rng.choice(users)
+            distance = rng.choice([None, rng.randint(1, 40)])
+            move_entry(WEEK, MONDAY, user.pk, distance)
+        entries = LeaderboardEntry.objects.filter(period=WEEK)
+        expected = sorted(
+            entries.values_list("distance", "owner_id"),
+            key=lambda entry: (-entry[0], entry[1])
+        )
+        self.assertEqual(
+            list(entries.order_by("rank").values_list(
+                "distance", "owner_id"
+            )),
+            expected
+        )
+        self.assertEqual(
+            list(entries.order_by("rank").values_list("rank", flat=True)),
+            list(range(1, len(expected)+1))
+        )
+
+
+@patch("jogging.bulk.get_weather_many", lambda keys: dict.fromkeys(keys))
+class LeaderboardMaintenanceTestCase(TestCase):
+    def setUp(self):
+        self.ann = User.objects.create(username="ann")
+        self.bob = User.objects.create(username="bob")
+        create_runs([
+            Run(owner=self.ann, date=date(2020, 10, 6), distance=10,
+                time=timedelta(hours=1), location="Porto"),
+            Run(owner=self.bob, date=date(2020, 10, 7), distance=12,
+                time=timedelta(hours=1), location="Porto"),
+            Run(owner=self.ann, date=date(2020, 10, 13), distance=8,
+                time=timedelta(hours=1), location="Porto"),
+        ])
+
+    def test_follows_the_weekly_reports(self):
+        self.assertEqual(board(), [(1, "bob", 12), (2, "ann", 10)])
+        self.assertEqual(
+            board(MONTH, date(2020, 10, 1)), [(1, "ann", 18), (2, "bob", 12)]
+        )
+        delete_runs(Run.objects.filter(owner=self.bob))
+        self.assertEqual(board(), [(1, "ann", 10)])
+
+    def test_rebuild_matches_incremental(self):
+        incremental = {
+            (period, start): board(period, start)
+            for period, start in LeaderboardEntry.objects.values_list(
+                "period", "period_start"
+            ).distinct()
+        }
+        LeaderboardEntry.objects.all().delete()
+        rebuild_leaderboards()
+        rebuilt = {key: board(*key) for key in incremental}
+        self.assertEqual(rebuilt, incremental)
+        self.assertEqual(LeaderboardEntry.objects.count(), 5)
+
+    def test_rebuild_weekly_reports_rebuilds_leaderboards(self):
+        LeaderboardEntry.objects.all().delete()
+        rebuild_weekly_reports([self.ann.pk, self.bob.pk])
+        self.assertEqual(board(), [(1, "bob", 12), (2, "ann", 10)])
+
+    @patch("jogging.bulk.rebuild_leaderboards")
+    def test_import_moves_only_the_importer(self, prebuild_leaderboards):
+        import_runs(self.bob, [
+            {"date": date(2020, 10, 14), "distance": 9,
+             "time": timedelta(hours=1), "location": "Porto"},
+        ])
+        prebuild_leaderboards.assert_not_called()
+        self.assertEqual(
+            board(WEEK, date(2020, 10, 12)), [(1, "bob", 9), (2, "ann", 8)]
+        )
+        self.assertEqual(
+            board(MONTH, date(2020, 10, 1)), [(1, "bob", 21), (2, "ann", 18)]
+        )
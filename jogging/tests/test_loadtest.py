@@ -0,0 +1,145 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+import random
+import unittest
+from datetime import date, timedelta
+from unittest.mock import MagicMock
+
+from jogging.loadtest import (
+    percentile, api_data, QueryCounter, run_scenario,
+    queries_from_server_timing,
+)
+
+
+class PercentileTestCase(unittest.TestCase):
+    def test_nearest_rank(self):
+        values = list(range(100, 0, -1))
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.95), 95)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertEqual(percentile(values, 0), 1)
+        self.assertEqual(percentile(values, 1), 100)
+
+    def test_empty(self):
+        self.assertIsNone(percentile([], 0.5))
+
+
+class QueriesFromServerTimingTestCase(unittest.TestCase):
+    def test_parses_db_entry(self):
+        header = 'total;dur=3.1, db;dur=1.20;desc="7 queries", render;dur=1'
+        self.assertEqual(queries_from_server_timing(header), 7)
+
+    def test_missing(self):
+        self.assertIsNone(queries_from_server_timing(None))
+        self.assertIsNone(queries_from_server_timing("total;dur=3"))
+
+
+class ApiDataTestCase(unittest.TestCase):
+    def test_values_are_strings(self):
+        run = {
+            "date": date(2020, 10, 14), "distance": 5.5,
+            "time": timedelta(minutes=30), "location": "Lima",
+        }
+        self.assertEqual(
+            api_data(run),
+            {
+                "date": "2020-10-14", "distance": "5.5",
+                "time": "0:30:00", "location": "Lima",
+            }
+        )
+
+
+class QueryCounterTestCase(unittest.TestCase):
+    def test_counts_and_delegates(self):
+        counter = QueryCounter()
+        execute = MagicMock()
+        result = counter(execute, "SELECT 1", None, False, {})
+        self.assertEqual(result, execute.return_value)
+        execute.assert_called_once_with("SELECT 1", None, False, {})
+        self.assertEqual(counter.count, 1)
+
+    def test_counts_writes_in_autocommit_as_commits(self):
+        counter = QueryCounter()
+        connection = MagicMock(in_atomic_block=False)
+        for sql in ("SELECT 1", "INSERT INTO t VALUES (1)", " update t"):
+            counter(MagicMock(), sql, None, False, {"connection": connection})
+        self.assertEqual(counter.count, 3)
+        self.assertEqual(counter.commits, 2)
+
+    def test_counts_transaction_with_writes_once(self):
+        counter = QueryCounter()
+        connection = MagicMock(in_atomic_block=True, run_on_commit=[])
+        connection.on_commit.side_effect = (
+            lambda func: connection.run_on_commit.append((set(), func))
+        )
+        for sql in ("SELECT 1", "INSERT INTO t VALUES (1)", "DELETE FROM t"):
+            counter(MagicMock(), sql, None, False, {"connection": connection})
+        self.assertEqual(counter.commits, 0)
+        for _, func in connection.run_on_commit:
+            func()
+        self.assertEqual(counter.commits, 1)
+
+    def test_install_adds_wrapper(self):
+        counter = QueryCounter()
+        connection = MagicMock()
+        connection.execute_wrappers = []
+        counter.install(None, connection)
+        self.assertEqual(connection.execute_wrappers, [counter])
+
+
+class RunScenarioTestCase(unittest.TestCase):
+    def test_reports_statistics(self):
+        client = MagicMock()
+        client.request.return_value.ok = True
+        client.request.return_value.headers = {}
+        counter = QueryCounter()
+        counter.count = 10
+        result = run_scenario(
+            client, "list", ["t1", "t2"], 20, 2, random.Random(0), counter
+        )
+        self.assertEqual(client.request.call_count, 20)
+        self.assertEqual(result["requests"], 20)
+        self.assertEqual(result["errors"], 0)
+        self.assertEqual(result["queries_per_request"], 0)
+        for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+            self.assertGreater(result[key], 0)
+
+    def test_counts_errors(self):
+        client = MagicMock()
+        client.request.return_value.ok = False
+        client.request.return_value.headers = {}
+        result = run_scenario(
+            client, "search", ["t1"], 5, 1, random.Random(0)
+        )
+        self.assertEqual(result["errors"], 5)
+        self.assertIsNone(result["queries_per_request"])
+
+    def test_queries_from_headers_without_counter(self):
+        client = MagicMock()
+        client.request.return_value.ok = True
+        client.request.return_value.headers = {
+            "Server-Timing": 'db;dur=1;desc="4 queries"'
+        }
+        result = run_scenario(
+            client, "list", ["t1"], 4, 2, random.Random(0)
+        )
+        self.assertEqual(result["queries_per_request"], 4)
@@ -0,0 +1,123 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from jogging.locations import location_key, get_locations
+from jogging.models import Location, Run
+from jogging.views import RunViewSet
+
+
+class LocationKeyTestCase(TestCase):
+    def test_ignores_case_and_spacing(self):
+        self.assertEqual(location_key("  Talavera  de la\tReina "),
+                         "talavera de la reina")
+        self.assertEqual(location_key("PORTO"), location_key("porto"))
+
+
+class GetLocationsTestCase(TestCase):
+    def test_creates_missing_locations_once(self):
+        Location.objects.create(name="Porto", key="porto")
+        with self.assertNumQueries(3):
+            locations = get_locations(["porto", "Porto", " Lima  "])
+        self.assertEqual(Location.objects.count(), 2)
+        self.assertEqual(locations["porto"], locations["Porto"])
+        self.assertEqual(locations["porto"].name, "Porto")
+        self.assertEqual(locations[" Lima  "].name, "Lima")
+
+    def test_one_query_if_all_exist(self):
+        Location.objects.create(name="Porto", key="porto")
+        with self.assertNumQueries(1):
+            get_locations(["Porto"])
+
+
+@patch("jogging.models.get_weather")
+class RunLocationTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="sam")
+
+    def new_run(self, location):
+        return Run(
+            date=date(2020, 10, 5), distance=5, time=timedelta(minutes=30),
+            location=location, owner=self.user,
+        )
+
+    def test_runs_share_their_location(self, pget_weather):
+        pget_weather.return_value = "Cloudy"
+        first = self.new_run("Porto")
+        first.save()
+        second = self.new_run("porto ")
+        second.save()
+        self.assertEqual(first.place_id, second.place_id)
+        self.assertEqual(Run.objects.get(pk=second.pk).location, "Porto")
+
+    def test_setting_the_location_changes_the_place(self, pget_weather):
+        pget_weather.return_value = "Cloudy"
+        run = self.new_run("Porto")
+        run.save()
+        run.location = "Lima"
+        self.assertEqual(run.location, "Lima")
+        run.save()
+        self.assertEqual(Run.objects.get(pk=run.pk).location, "Lima")
+
+    def test_bulk_create_resolves_the_locations(self, pget_weather):
+        Run.objects.bulk_create(
+            self.new_run(name) for name in ("Porto", "Lima", "PORTO")
+        )
+        self.assertEqual(
+            sorted(Run.objects.values_list("place__name", flat=True)),
+            ["Lima", "Porto", "Porto"]
+        )
+
+
+class RunLocationFilterTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="sam")
+        self.factory = APIRequestFactory()
+        Run.objects.bulk_create(
+            Run(
+                date=date(2020, 10, day), distance=day,
+                time=timedelta(minutes=30), location=location,
+                owner=self.user,
+            ) for day, location in ((5, "Porto"), (6, "Lima"))
+        )
+
+    def list(self, url):
+        request = self.factory.get(url)
+        force_authenticate(request, user=self.user)
+        response = RunViewSet.as_view({"get": "list"})(request)
+        return [run["location"] for run in response.data["results"]]
+
+    def test_filter_by_location(self):
+        self.assertEqual(self.list("/run/?location=porto"), ["Porto"])
+
+    def test_search_by_location(self):
+        self.assertEqual(
+            self.list("/run/?search=location eq 'PORTO'"), ["Porto"]
+        )
+        self.assertEqual(
+            self.list("/run/?search=location ne 'porto'"), ["Lima"]
+        )
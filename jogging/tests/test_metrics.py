@@ -0,0 +1,143 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+import unittest
+from unittest.mock import MagicMock, patch
+
+from jogging.metrics import (
+    RequestMetrics, timed, Histogram, Registry, MetricsMiddleware, _current,
+)
+
+
+class RequestMetricsTestCase(unittest.TestCase):
+    def test_adds_timings(self):
+        metrics = RequestMetrics()
+        metrics.add("weather", 0.5)
+        metrics.add("weather", 0.25)
+        self.assertEqual(metrics.timings, {"weather": 0.75})
+
+    def test_db_wrapper_counts_and_times_queries(self):
+        metrics = RequestMetrics()
+        execute = MagicMock()
+        result = metrics.db_wrapper(execute, "SELECT 1", None, False, {})
+        self.assertEqual(result, execute.return_value)
+        self.assertEqual(metrics.queries, 1)
+        self.assertIn("db", metrics.timings)
+
+    def test_server_timing(self):
+        metrics = RequestMetrics()
+        metrics.add("db", 0.002)
+        metrics.add("weather", 0.1)
+        metrics.queries = 3
+        self.assertEqual(
+            metrics.server_timing(0.2),
+            'total;dur=200.00, db;dur=2.00;desc="3 queries", '
+            'weather;dur=100.00'
+        )
+
+    def test_server_timing_without_queries(self):
+        self.assertEqual(
+            RequestMetrics().server_timing(0.001),
+            'total;dur=1.00, db;dur=0.00;desc="0 queries"'
+        )
+
+
+class TimedTestCase(unittest.TestCase):
+    def test_records_in_current_request(self):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            with timed("search"):
+                pass
+
+            @timed("weather")
+            def f():
+                return 3
+            self.assertEqual(f(), 3)
+            f()
+        finally:
+            _current.reset(token)
+        self.assertEqual(set(metrics.timings), {"search", "weather"})
+
+    def test_does_nothing_outside_requests(self):
+        with timed("search"):
+            pass
+
+
+class HistogramTestCase(unittest.TestCase):
+    def test_cumulative_buckets(self):
+        hist = Histogram((1, 5, 10))
+        for value in (0.5, 1, 3, 7, 20):
+            hist.observe(value)
+        self.assertEqual(
+            list(hist.cumulative()),
+            [(1, 2), (5, 3), (10, 4), ("+Inf", 5)]
+        )
+        self.assertEqual(hist.sum, 31.5)
+        self.assertEqual(hist.count, 5)
+
+
+class RegistryTestCase(unittest.TestCase):
+    def test_prometheus_text(self):
+        registry = Registry()
+        metrics = RequestMetrics()
+        metrics.add("db", 0.002)
+        metrics.queries = 4
+        registry.observe("run-list", metrics, 0.02)
+        text = registry.prometheus(counters=(("x_total", 3),))
+        self.assertIn(
+            "# TYPE jogging_request_duration_seconds histogram", text)
+        self.assertIn(
+            'jogging_request_duration_seconds_count{endpoint="run-list",'
+            'phase="total"} 1', text
+        )
+        self.assertIn(
+            'jogging_request_duration_seconds_bucket{endpoint="run-list",'
+            'phase="db",le="0.0025"} 1', text
+        )
+        self.assertIn(
+            'jogging_request_queries_bucket{endpoint="run-list",le="2"} 0',
+            text
+        )
+        self.assertIn(
+            'jogging_request_queries_sum{endpoint="run-list"} 4', text
+        )
+        self.assertIn("# TYPE x_total counter\nx_total 3\n", text)
+
+
+@patch("jogging.metrics.registry")
+class MetricsMiddlewareTestCase(unittest.TestCase):
+    def test_sets_header_and_observes(self, pregistry):
+        response = {}
+
+        def get_response(request):
+            with timed("weather"):
+                pass
+            return response
+        request = MagicMock()
+        request.resolver_match.url_name = "run-list"
+        result = MetricsMiddleware(get_response)(request)
+        self.assertIs(result, response)
+        self.assertIn("weather;dur=", response["Server-Timing"])
+        endpoint, metrics, total = pregistry.observe.call_args[0]
+        self.assertEqual(endpoint, "run-list")
+        self.assertIn("weather", metrics.timings)
+        self.assertIsNone(_current.get())
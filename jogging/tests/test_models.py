@@ -23,7 +23,7 @@
 from datetime import date, timedelta
 from unittest.mock import patch
 
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
 from django.contrib.auth.models import User
 from django.db.utils import IntegrityError
 from django.db import transaction
@@ -65,6 +65,34 @@ class RunTestCase(TestCase):
         self.assertEqual(self.run.weather, "?")
 
 
+@patch("jogging.models.get_weather")
+class RunSaveTransactionTestCase(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="x")
+        self.run = Run(
+            date=date(2020, 10, 6), distance=2.5, time=timedelta(minutes=15),
+            location="Lima", owner=self.user,
+        )
+
+    def test_weather_is_fetched_outside_the_transaction(self, pget_weather):
+        connection = transaction.get_connection()
+        in_transaction = []
+        pget_weather.side_effect = (
+            lambda *args: in_transaction.append(connection.in_atomic_block)
+        )
+        self.run.save()
+        self.assertEqual(in_transaction, [False])
+
+    def test_run_and_report_are_committed_together(self, pget_weather):
+        pget_weather.return_value = "Cloudy"
+        with patch("jogging.signals.report_changed") as preport_changed:
+            preport_changed.side_effect = RuntimeError
+            with self.assertRaises(RuntimeError):
+                self.run.save()
+        self.assertEqual(Run.objects.count(), 0)
+        self.assertEqual(WeeklyReport.objects.count(), 0)
+
+
 class WeeklySummaryTestCase(TestCase):
     def setUp(self):
         self.user1 = User.objects.create(username="sam")
@@ -0,0 +1,100 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+from datetime import timedelta, date
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from jogging.views import RunViewSet
+from jogging.models import Run
+from jogging.bulk import delete_runs
+
+
+class CachedCountPaginationTestCase(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.user = User.objects.create(username="sam")
+        self.other = User.objects.create(username="dave")
+        self.factory = APIRequestFactory()
+        self.view = RunViewSet.as_view({"get": "list"})
+        for owner, days in ((self.user, (5, 6, 13)), (self.other, (7,))):
+            for day in days:
+                self.add_run(owner, day)
+
+    def add_run(self, owner, day):
+        with patch("jogging.models.get_weather") as pget_weather:
+            pget_weather.return_value = "Cloudy"
+            return Run.objects.create(
+                date=date(2020, 10, day), distance=day,
+                time=timedelta(minutes=30), location="Porto", owner=owner,
+            )
+
+    def get(self, url, user=None):
+        request = self.factory.get(url)
+        force_authenticate(request, user=user or self.user)
+        return self.view(request)
+
+    def test_unfiltered_count_is_estimated_from_the_counters(self):
+        response = self.get("/run/?limit=2")
+        self.assertEqual(response.data["count"], 3)
+        self.assertTrue(response.data["count_estimated"])
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertIn("offset=2", response.data["next"])
+
+    def test_admins_see_the_count_of_everybody(self):
+        admin = User.objects.create(username="root", is_superuser=True)
+        self.assertEqual(self.get("/run/", admin).data["count"], 4)
+
+    def test_no_count_query_for_unfiltered_list(self):
+        self.get("/run/")
+        with self.assertNumQueries(3):
+            # data version, run counter and the page
+            self.get("/run/")
+
+    def test_filtered_count_is_exact_and_cached(self):
+        response = self.get("/run/?search=distance gt 5")
+        self.assertEqual(response.data["count"], 2)
+        self.assertFalse(response.data["count_estimated"])
+        with self.assertNumQueries(2):
+            # data version and the page
+            self.get("/run/?search=distance gt 5")
+
+    def test_writes_invalidate_the_cached_counts(self):
+        url = "/run/?search=distance gt 5"
+        self.get(url)
+        self.add_run(self.user, 20)
+        self.assertEqual(self.get(url).data["count"], 3)
+        self.assertEqual(self.get("/run/").data["count"], 4)
+        delete_runs(Run.objects.filter(owner=self.user, distance__gt=5))
+        self.assertEqual(self.get(url).data["count"], 0)
+        self.assertEqual(self.get("/run/").data["count"], 1)
+
+    def test_count_can_be_skipped(self):
+        response = self.get("/run/?count=false&limit=2")
+        self.assertIsNone(response.data["count"])
+        self.assertIn("offset=2", response.data["next"])
+        response = self.get("/run/?count=false&limit=2&offset=2")
+        self.assertIsNone(response.data["next"])
+        self.assertEqual(len(response.data["results"]), 1)
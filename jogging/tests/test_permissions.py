@@ -23,7 +23,9 @@ import unittest
 
 from rest_framework.permissions import BasePermission
 
-from jogging.permissions import IsOwner, IsOwnerOrAdmin, IsAdminOrStaff
+from jogging.permissions import (
+    IsOwner, IsOwnerOrAdmin, IsAdminOrStaff, IsAdmin,
+)
 
 
 class IsOwnerTestCase(unittest.TestCase):
@@ -147,3 +149,23 @@ class IsAdminOrStaffTestCase(unittest.TestCase):
         )
 
 
+class IsAdminTestCase(unittest.TestCase):
+    def test_is_permission(self):
+        self.assertTrue(issubclass(IsAdmin, BasePermission))
+
+    def test_has_access_if_admin(self):
+        class FakeRequest:
+            user = SuperUser()
+
+        perm = IsAdmin()
+        self.assertTrue(perm.has_permission(FakeRequest(), None))
+
+    def test_has_no_access_if_staff_or_normal_user(self):
+        for user in (StaffUser(), NormalUser()):
+            class FakeRequest:
+                ...
+
+            FakeRequest.user = user
+            perm = IsAdmin()
+            with self.subTest(user=user):
+                self.assertFalse(perm.has_permission(FakeRequest(), None))
@@ -0,0 +1,202 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+import asyncio
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from collections import Counter
+from io import StringIO
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.http import HttpResponse
+from django.test import SimpleTestCase, RequestFactory, override_settings
+
+from jogging.profiling import (
+    collapse, Sampler, write_profile, read_profile,
+    SamplingProfilerMiddleware,
+)
+
+
+def busy(seconds):
+    end = time.perf_counter()+seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class CollapseTestCase(unittest.TestCase):
+    def test_root_first(self):
+        def inner():
+            return collapse(sys._getframe())
+        stack = collapse(sys._getframe()).split(";")
+        inner_stack = inner().split(";")
+        self.assertEqual(inner_stack[:-1], stack)
+        self.assertEqual(inner_stack[-2], f"{__name__}:test_root_first")
+        self.assertEqual(inner_stack[-1], f"{__name__}:inner")
+
+
+class SamplerTestCase(unittest.TestCase):
+    def test_counts_stacks_of_registered_thread(self):
+        sampler = Sampler(0.001)
+        sampler.start()
+        busy(0.05)
+        stacks = sampler.stop()
+        self.assertGreater(sum(stacks.values()), 0)
+        self.assertTrue(
+            any(stack.endswith(f"{__name__}:busy") for stack in stacks)
+        )
+
+    def test_stop_of_unregistered_thread(self):
+        self.assertEqual(Sampler(0.001).stop(), Counter())
+
+    def test_only_registered_threads(self):
+        sampler = Sampler(0.001)
+        sampler.start()
+        other = threading.Thread(target=busy, args=(0.05,))
+        other.start()
+        other.join()
+        stacks = sampler.stop()
+        self.assertFalse(any("busy" in stack for stack in stacks))
+
+
+class WriteProfileTestCase(unittest.TestCase):
+    def test_round_trip(self):
+        stacks = Counter({"a:f;b:g": 3, "a:f": 1})
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = write_profile(tmpdir, "RunViewSet.list", stacks, 5)
+            self.assertEqual(filename.parent.name, "RunViewSet.list")
+            self.assertEqual(read_profile(filename), stacks)
+
+    def test_rotation_keeps_newest(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            names = [
+                write_profile(tmpdir, "x", Counter({"a": i+1}), 3).name
+                for i in range(5)
+            ]
+            kept = sorted(p.name for p in (Path(tmpdir)/"x").iterdir())
+        self.assertEqual(kept, names[-3:])
+
+
+def profiler_view(seconds):
+    def view(request):
+        busy(seconds)
+        return HttpResponse()
+    view.cls = type("RunViewSet", (), {})
+    view.actions = {"get": "list"}
+    return view
+
+
+class SamplingProfilerMiddlewareTestCase(SimpleTestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.directory = Path(tmpdir.name)
+        self.factory = RequestFactory()
+
+    def config(self, **kwargs):
+        return {
+            "ENABLED": True, "SAMPLE_RATE": 0, "SLOW_SECONDS": None,
+            "INTERVAL": 0.001, "DIRECTORY": self.directory,
+            "MAX_FILES": 10, "VIEWS": ("RunViewSet",), **kwargs
+        }
+
+    def request(self, view):
+        request = self.factory.get("/run/")
+        middleware = SamplingProfilerMiddleware(
+            lambda req: middleware.process_view(req, view, (), {})
+            or view(req)
+        )
+        return middleware(request)
+
+    def profiles(self):
+        return list(self.directory.glob("*/*.collapsed"))
+
+    def test_disabled_by_default(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            SamplingProfilerMiddleware(MagicMock())
+
+    def test_sampled_request_is_stored(self):
+        with override_settings(PROFILER=self.config(SAMPLE_RATE=1)):
+            self.request(profiler_view(0.02))
+        profiles = self.profiles()
+        self.assertEqual(len(profiles), 1)
+        self.assertEqual(profiles[0].parent.name, "RunViewSet.list")
+
+    def test_slow_request_is_stored(self):
+        with override_settings(PROFILER=self.config(SLOW_SECONDS=0.01)):
+            self.request(profiler_view(0.03))
+        self.assertEqual(len(self.profiles()), 1)
+
+    def test_fast_request_is_discarded(self):
+        with override_settings(PROFILER=self.config(SLOW_SECONDS=10)):
+            self.request(profiler_view(0.02))
+        self.assertEqual(self.profiles(), [])
+
+    def test_other_views_are_ignored(self):
+        view = profiler_view(0.02)
+        view.cls = type("UserViewSet", (), {})
+        with override_settings(PROFILER=self.config(SAMPLE_RATE=1)):
+            self.request(view)
+        self.assertEqual(self.profiles(), [])
+
+    def test_async_requests_are_passed_through(self):
+        async def get_response(request):
+            return HttpResponse("ok")
+        with override_settings(PROFILER=self.config(SAMPLE_RATE=1)):
+            middleware = SamplingProfilerMiddleware(get_response)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        request = self.factory.get("/run/")
+        self.assertIsNone(
+            middleware.process_view(request, profiler_view(0), (), {})
+        )
+        response = asyncio.run(middleware(request))
+        self.assertEqual(response.content, b"ok")
+        self.assertEqual(self.profiles(), [])
+
+
+class MergeProfilesTestCase(unittest.TestCase):
+    def test_merges_endpoints(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            write_profile(tmpdir, "RunViewSet.list", Counter({"a:f": 2}), 5)
+            write_profile(tmpdir, "RunViewSet.list", Counter({"a:f": 1}), 5)
+            write_profile(tmpdir, "NewAccount.post", Counter({"b:g": 4}), 5)
+            output = Path(tmpdir)/"merged.collapsed"
+            out = StringIO()
+            call_command(
+                "merge_profiles", directory=tmpdir, output=str(output),
+                stdout=out
+            )
+            lines = output.read_text().splitlines()
+        self.assertEqual(
+            lines, ["NewAccount.post;b:g 4", "RunViewSet.list;a:f 3"]
+        )
+        self.assertIn("Merged 3 profiles (7 samples)", out.getvalue())
+
+    def test_no_profiles(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with self.assertRaises(CommandError):
+                call_command("merge_profiles", directory=tmpdir)
@@ -0,0 +1,137 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from jogging.bulk import (
+    create_runs, delete_runs, update_runs, rebuild_weekly_reports,
+)
+from jogging.models import Run, PersonalRecord
+from jogging.records import best_run, update_run_records
+
+
+def no_weather(keys):
+    return dict.fromkeys(keys)
+
+
+class BestRunTestCase(TestCase):
+    def test_race_distance_uses_equivalent_time_of_long_enough_runs(self):
+        rows = [
+            (1, 4.9, timedelta(minutes=15)),
+            (2, 5, timedelta(minutes=25)),
+            (3, 10, timedelta(minutes=48)),
+        ]
+        self.assertEqual(best_run("5k", rows), (24*60, 3))
+        self.assertEqual(best_run("10k", rows), (48*60, 3))
+        self.assertIsNone(best_run("marathon", rows))
+
+    def test_longest_run_ties_go_to_oldest(self):
+        rows = [(2, 10, timedelta(hours=1)), (1, 10, timedelta(hours=2))]
+        self.assertEqual(best_run("longest_run", rows), (10, 1))
+
+
+@patch("jogging.bulk.get_weather_many", no_weather)
+class PersonalRecordsTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="sam")
+        self.runs = create_runs([
+            Run(owner=self.user, date=date(2020, 10, 5), distance=10,
+                time=timedelta(minutes=50), location="Porto"),
+            Run(owner=self.user, date=date(2020, 10, 7), distance=5,
+                time=timedelta(minutes=24), location="Porto"),
+            Run(owner=self.user, date=date(2020, 10, 13), distance=12,
+                time=timedelta(minutes=66), location="Porto"),
+        ])
+
+    def records(self):
+        return {
+            record.kind: (round(record.value, 2), record.run_id,
+                          record.week_start)
+            for record in PersonalRecord.objects.filter(owner=self.user)
+        }
+
+    def test_created_with_the_runs(self):
+        ten, five, twelve = (run.pk for run in self.runs)
+        self.assertEqual(self.records(), {
+            "5k": (24*60, five, None),
+            "10k": (50*60, ten, None),
+            "longest_run": (12, twelve, None),
+            "biggest_week": (15, None, date(2020, 10, 5)),
+        })
+
+    def test_run_that_is_no_record_is_cheap(self):
+        Run.objects.bulk_create([
+            Run(owner=self.user, date=date(2020, 10, 14), distance=3,
+                time=timedelta(minutes=20), location="Porto"),
+        ])
+        run = Run.objects.latest("pk")
+        with self.assertNumQueries(2):
+            update_run_records({self.user.pk: {run.pk}})
+
+    def test_better_run_replaces_record(self):
+        faster, = create_runs([
+            Run(owner=self.user, date=date(2020, 10, 14), distance=10,
+                time=timedelta(minutes=45), location="Porto"),
+        ])
+        records = self.records()
+        self.assertEqual(records["10k"], (45*60, faster.pk, None))
+        self.assertEqual(records["5k"], (22.5*60, faster.pk, None))
+
+    def test_deleting_the_holder_recomputes(self):
+        delete_runs(Run.objects.filter(pk=self.runs[2].pk))
+        records = self.records()
+        self.assertEqual(records["longest_run"], (10, self.runs[0].pk, None))
+        self.assertEqual(records["biggest_week"][0], 15)
+
+    def test_slower_holder_recomputes(self):
+        update_runs(
+            Run.objects.filter(pk=self.runs[1].pk),
+            time=timedelta(minutes=40)
+        )
+        self.assertEqual(self.records()["5k"], (25*60, self.runs[0].pk, None))
+
+    def test_deleting_all_runs_deletes_records(self):
+        delete_runs(Run.objects.all())
+        self.assertEqual(self.records(), {})
+
+    def test_biggest_week_follows_reports(self):
+        create_runs([
+            Run(owner=self.user, date=date(2020, 10, 15), distance=4,
+                time=timedelta(minutes=24), location="Porto"),
+        ])
+        self.assertEqual(
+            self.records()["biggest_week"], (16, None, date(2020, 10, 12))
+        )
+        delete_runs(Run.objects.filter(date=date(2020, 10, 13)))
+        self.assertEqual(
+            self.records()["biggest_week"], (15, None, date(2020, 10, 5))
+        )
+
+    def test_rebuild_sets_biggest_week(self):
+        PersonalRecord.objects.all().delete()
+        rebuild_weekly_reports([self.user.pk])
+        self.assertEqual(
+            self.records(), {"biggest_week": (15, None, date(2020, 10, 5))}
+        )
@@ -20,16 +20,28 @@
 ########################################################################
 
 import datetime
-from unittest.mock import MagicMock, patch
+import os
+import sqlite3
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
 
-from django.test import TestCase
+from django.db import connections
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase
 from django.contrib.auth.models import User
 
-from jogging.signals import run_save_handler, run_stats_for_report
-from jogging.models import WeeklyReport, Run
+from jogging.bulk import create_runs
+from jogging.signals import (
+    run_save_handler, store_weekly_report, week_bounds, update_weekly_reports,
+)
+from jogging.models import WeeklyReport, Run, LeaderboardEntry
 
 
 class FakeRun:
+    pk = None
+    saved_date = None
+
     def __init__(self, date, owner):
         self.date = date
         self.owner = owner
@@ -71,66 +83,252 @@ class StatsForReportTestCase(TestCase):
                     owner=another_user,
                 )
             ]
-        
-    def test_stats_for_report_with_one_run_in_a_week(self):
-        stats = run_stats_for_report(
-            Run,
-            self.user,
-            datetime.date(2020, 9, 28),
-            datetime.date(2020, 9, 30)
+
+    def test_stores_report_of_a_week_with_one_run(self):
+        distance = store_weekly_report(
+            Run, self.user.pk, datetime.date(2020, 9, 28)
         )
-        self.assertEqual(stats["distance__sum"], 8.4)
-        self.assertEqual(stats["time__sum"].seconds, 2332)
-        
-    def test_stats_for_report_with_one_run_in_a_week(self):
-        stats = run_stats_for_report(
-            Run,
-            self.user,
-            datetime.date(2020, 10, 5),
-            datetime.date(2020, 10, 7)
+        self.assertEqual(distance, 8.4)
+        report = WeeklyReport.objects.get(
+            owner=self.user, week_start=datetime.date(2020, 9, 28)
         )
-        self.assertEqual(stats["distance__sum"], 7.9)
-        self.assertEqual(stats["time__sum"].seconds, 1469)
-        
-@patch("jogging.signals.run_stats_for_report")
-class RunSaveHandler(TestCase):
-    def test_calls_run_stats_for_report(self, prun_stats_for_report):
-        user = User.objects.create(username="yt")
-        # I don't call "create" to avoid calling the handler implicitly:
-        run = Run(
-            owner=user,
-            date=datetime.date(2020, 8, 11),
-            distance=3,
-            time=datetime.timedelta(minutes=10),
-            location="Besq"
+        self.assertEqual(report.total_distance_km, 8.4)
+        self.assertAlmostEqual(report.average_speed_kmph, 8.4/2332*3600)
+
+    def test_stores_report_of_a_week_with_several_runs(self):
+        WeeklyReport.objects.filter(owner=self.user).delete()
+        distance = store_weekly_report(
+            Run, self.user.pk, datetime.date(2020, 10, 5)
         )
-        delta = MagicMock()
-        delta.seconds = 13171
-        stats = {"distance__sum": 45, "time__sum": delta}
-        prun_stats_for_report.return_value = stats
-        run_save_handler(Run, run)
-        prun_stats_for_report.assert_called_once_with(
-            Run,
-            run.owner,
-            datetime.date(2020, 8, 10),
-            datetime.date(2020, 8, 16),
+        self.assertEqual(distance, 7.9)
+        report = WeeklyReport.objects.get(
+            owner=self.user, week_start=datetime.date(2020, 10, 5)
+        )
+        self.assertAlmostEqual(report.average_speed_kmph, 7.9/1469*3600)
+        self.assertEqual(WeeklyReport.objects.filter(
+            owner=self.user).count(), 1)
+
+    def test_overwrites_stale_report(self):
+        WeeklyReport.objects.filter(owner=self.user).update(
+            total_distance_km=1000
+        )
+        store_weekly_report(Run, self.user.pk, datetime.date(2020, 10, 5))
+        report = WeeklyReport.objects.get(
+            owner=self.user, week_start=datetime.date(2020, 10, 5)
+        )
+        self.assertEqual(report.total_distance_km, 7.9)
+
+    def test_removes_report_of_a_week_without_runs(self):
+        WeeklyReport.objects.create(
+            owner=self.user, week_start=datetime.date(2020, 9, 21)
+        )
+        distance = store_weekly_report(
+            Run, self.user.pk, datetime.date(2020, 9, 21)
+        )
+        self.assertIsNone(distance)
+        self.assertFalse(WeeklyReport.objects.filter(
+            owner=self.user, week_start=datetime.date(2020, 9, 21)
+        ).exists())
+
+    def test_zero_time_gives_zero_speed(self):
+        with patch("jogging.models.get_weather") as pget_weather:
+            pget_weather.return_value = "Sunny"
+            Run.objects.create(
+                date=datetime.date(2020, 9, 14), distance=1,
+                time=datetime.timedelta(0), location="Lima", owner=self.user
+            )
+        report = WeeklyReport.objects.get(
+            owner=self.user, week_start=datetime.date(2020, 9, 14)
         )
-        
-    def test_creates_WeekleReport_with_data_from_aux_func(
-            self, prun_stats_for_report):
-        mRun = MagicMock()
-        user = User.objects.create(username="mariano")
-        run = FakeRun(
+        self.assertEqual(report.average_speed_kmph, 0)
+
+
+class LockedStatsForReportTestCase(StatsForReportTestCase):
+    """The same reports, stored with the ORM (databases other than
+    SQLite)."""
+
+    def setUp(self):
+        patcher = patch("jogging.signals.UPSERT_VENDORS", ())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        super().setUp()
+
+
+class RunSaveHandler(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="mariano")
+
+    def test_creates_WeekleReport_from_the_runs(self):
+        # bulk_create does not call the handler implicitly:
+        run = Run(
+            owner=self.user,
             date=datetime.date(2020, 10, 6),
-            owner=user
+            distance=45,
+            time=datetime.timedelta(seconds=13171),
+            location="Besq",
+            weather="Sunny",
         )
-        delta = MagicMock()
-        delta.seconds = 13171
-        stats = {"distance__sum": 45, "time__sum": delta}
-        prun_stats_for_report.return_value = stats
-        run_save_handler(mRun, run)
+        Run.objects.bulk_create([run])
+        self.assertEqual(WeeklyReport.objects.count(), 0)
+        run_save_handler(Run, run)
         self.assertEqual(WeeklyReport.objects.count(), 1)
         rep = WeeklyReport.objects.first()
         self.assertEqual(rep.week_start, datetime.date(2020, 10, 5))
         self.assertEqual(rep.total_distance_km, 45)
         self.assertAlmostEqual(rep.average_speed_kmph, 45/13171*3600)
+
+    def test_removes_report_if_no_runs_left(self):
+        WeeklyReport.objects.create(
+            week_start=datetime.date(2020, 10, 5), owner=self.user
+        )
+        run = FakeRun(date=datetime.date(2020, 10, 6), owner=self.user)
+        run_save_handler(Run, run)
+        self.assertEqual(WeeklyReport.objects.count(), 0)
+
+    def test_recomputes_the_old_week_of_a_moved_run(self):
+        for distance in (7, 7):
+            Run.objects.create(
+                owner=self.user, date=datetime.date(2020, 10, 12),
+                distance=distance, time=datetime.timedelta(seconds=3600),
+                location="Porto", weather="Sunny",
+            )
+        run = Run.objects.first()
+        run.date = datetime.date(2020, 11, 2)
+        run.save()
+        reports = dict(WeeklyReport.objects.values_list(
+            "week_start", "total_distance_km"
+        ))
+        self.assertEqual(reports, {
+            datetime.date(2020, 10, 12): 7, datetime.date(2020, 11, 2): 7,
+        })
+
+
+class WeekBoundsTestCase(TestCase):
+    def test_returns_monday_and_sunday(self):
+        for day in (datetime.date(2020, 10, 12), datetime.date(2020, 10, 15),
+                    datetime.date(2020, 10, 18)):
+            with self.subTest(day=day):
+                self.assertEqual(
+                    week_bounds(day),
+                    (datetime.date(2020, 10, 12), datetime.date(2020, 10, 18))
+                )
+
+
+@patch("jogging.signals.update_weekly_report")
+class UpdateWeeklyReportsTestCase(TestCase):
+    def test_updates_each_week_once(self, pupdate_weekly_report):
+        user = User.objects.create(username="yt")
+        days = [
+            datetime.date(2020, 10, 14), datetime.date(2020, 10, 6),
+            datetime.date(2020, 10, 12), datetime.date(2020, 10, 5),
+        ]
+        update_weekly_reports(Run, user, days)
+        self.assertEqual(pupdate_weekly_report.call_count, 2)
+        pupdate_weekly_report.assert_any_call(
+            Run, user, datetime.date(2020, 10, 5))
+        pupdate_weekly_report.assert_any_call(
+            Run, user, datetime.date(2020, 10, 12))
+
+
+class ConcurrentRunSavesTestCase(TransactionTestCase):
+    """Runs saved in parallel threads, each one with its own connection to
+    a SQLite file (the in-memory test database is shared by the threads
+    and does not wait for locks)."""
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.settings_dict = dict(connections.databases["default"])
+        self.settings_dict["NAME"] = os.path.join(tmpdir.name, "s.sqlite3")
+        primary = connections["default"]
+        primary.ensure_connection()
+        target = sqlite3.connect(self.settings_dict["NAME"])
+        primary.connection.backup(target)
+        target.close()
+        patcher = patch("jogging.models.get_weather", return_value="Sunny")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def in_file_db(self, function, *args):
+        """Calls ``function`` with the ``default`` connection of this thread
+        pointing to the SQLite file."""
+        previous = connections["default"]
+        connections["default"] = previous.__class__(
+            self.settings_dict, "default"
+        )
+        try:
+            return function(*args)
+        finally:
+            connections["default"].close()
+            connections["default"] = previous
+
+    def test_parallel_saves_keep_reports_exact(self):
+        owner = self.in_file_db(User.objects.create_user, "sam")
+        first_monday = datetime.date(2020, 10, 5)
+
+        def save(i):
+            return Run.objects.create(
+                owner=owner, date=first_monday+datetime.timedelta(days=i % 14),
+                distance=1+i % 5, time=datetime.timedelta(minutes=10+i % 7),
+                location="Rome"
+            )
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda i: self.in_file_db(save, i), range(80)))
+
+        def totals():
+            reports = {
+                report.week_start: report
+                for report in WeeklyReport.objects.filter(owner=owner)
+            }
+            runs = Run.objects.filter(owner=owner)
+            self.assertEqual(dict(LeaderboardEntry.objects.filter(
+                owner=owner, period="week"
+            ).values_list("period_start", "distance")), {
+                week: report.total_distance_km
+                for week, report in reports.items()
+            })
+            return reports, [
+                (week, runs.filter(
+                    date__range=week_bounds(week)
+                ).aggregate(Sum("distance"), Sum("time")))
+                for week in (first_monday, first_monday+datetime.timedelta(7))
+            ]
+        reports, expected = self.in_file_db(totals)
+        self.assertEqual(len(reports), 2)
+        for week, stats in expected:
+            with self.subTest(week=week):
+                report = reports[week]
+                self.assertEqual(
+                    report.total_distance_km, stats["distance__sum"]
+                )
+                self.assertAlmostEqual(
+                    report.average_speed_kmph,
+                    stats["distance__sum"]*3600
+                    / stats["time__sum"].total_seconds()
+                )
+
+    @patch("jogging.bulk.get_weather_many", lambda keys: dict.fromkeys(keys))
+    def test_parallel_bulk_creates_and_saves(self):
+        owner = self.in_file_db(User.objects.create_user, "sam")
+        monday = datetime.date(2020, 10, 5)
+
+        def run(i, location):
+            return Run(
+                owner=owner, date=monday+datetime.timedelta(days=i % 7),
+                distance=1, time=datetime.timedelta(minutes=10),
+                location=location
+            )
+
+        def write(i):
+            if i % 2:
+                run(i, "Rome").save()
+            else:
+                create_runs([run(i, name) for name in ("Rome", f"City {i}")])
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda i: self.in_file_db(write, i), range(120)))
+        report = self.in_file_db(lambda: WeeklyReport.objects.get(
+            owner=owner, week_start=monday
+        ))
+        self.assertEqual(report.total_distance_km, 60+60*2)
@@ -0,0 +1,90 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+import random
+import unittest
+from collections import Counter
+from datetime import date, timedelta
+
+from jogging.synthetic import (
+    synthetic_run_data, synthetic_runner, synthetic_history, LOCATIONS,
+)
+
+
+class SyntheticRunDataTestCase(unittest.TestCase):
+    def test_produces_plausible_runs(self):
+        end = date(2020, 10, 14)
+        runs = list(synthetic_run_data(50, random.Random(1), end_date=end))
+        self.assertEqual(len(runs), 50)
+        for run in runs:
+            self.assertTrue(end-timedelta(days=365) < run["date"] <= end)
+            self.assertTrue(3 <= run["distance"] <= 21)
+            pace = run["time"].total_seconds()/60/run["distance"]
+            self.assertTrue(4.4 < pace < 7.1)
+            self.assertIn(run["location"], LOCATIONS)
+
+    def test_is_reproducible(self):
+        self.assertEqual(
+            list(synthetic_run_data(5, random.Random(3))),
+            list(synthetic_run_data(5, random.Random(3)))
+        )
+
+
+class SyntheticRunnerTestCase(unittest.TestCase):
+    def test_habits_are_bounded(self):
+        rng = random.Random(0)
+        for _ in range(200):
+            runner = synthetic_runner(rng)
+            self.assertTrue(0.5 <= runner["runs_per_week"] <= 7)
+            self.assertTrue(0 < runner["distance"] <= 30)
+            self.assertTrue(3.5 <= runner["pace"] <= 9)
+            self.assertIn(runner["home"], LOCATIONS)
+
+
+class SyntheticHistoryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.runner = {
+            "runs_per_week": 3.5, "distance": 10, "pace": 5,
+            "home": "Porto",
+        }
+        self.end = date(2020, 10, 14)
+        self.runs = list(synthetic_history(
+            self.runner, random.Random(0), 100, self.end
+        ))
+
+    def test_frequency_follows_runner(self):
+        self.assertTrue(250 < len(self.runs) < 450)
+
+    def test_dates_within_range(self):
+        first_monday = date(2020, 10, 12)-timedelta(weeks=99)
+        for run in self.runs:
+            self.assertTrue(first_monday <= run["date"] <= self.end)
+
+    def test_most_runs_at_home(self):
+        locations = Counter(run["location"] for run in self.runs)
+        self.assertGreater(locations["Porto"], 0.8*len(self.runs))
+
+    def test_long_runs_on_weekends(self):
+        def mean(runs):
+            return sum(run["distance"] for run in runs)/len(runs)
+        weekend = [run for run in self.runs if run["date"].weekday() >= 5]
+        weekdays = [run for run in self.runs if run["date"].weekday() < 5]
+        self.assertGreater(mean(weekend), 1.3*mean(weekdays))
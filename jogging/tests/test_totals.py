@@ -0,0 +1,178 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from jogging.bulk import create_runs, delete_runs, update_runs
+from jogging.models import DailyTotal, Run
+from jogging.totals import range_total, rebuild_daily_totals
+from jogging.views import RunViewSet
+
+
+def no_weather(keys):
+    return dict.fromkeys(keys)
+
+
+@patch("jogging.bulk.get_weather_many", no_weather)
+@patch("jogging.models.get_weather", lambda location, day: None)
+class DailyTotalsTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="sam")
+        other = User.objects.create(username="dave")
+        create_runs([
+            self.new_run(day, distance)
+            for day, distance in ((5, 10), (5, 2), (7, 5), (12, 8))
+        ] + [self.new_run(6, 100, other)])
+
+    def new_run(self, day, distance, owner=None):
+        return Run(
+            date=date(2020, 10, day), distance=distance,
+            time=timedelta(minutes=6*distance), location="Porto",
+            owner=owner or self.user,
+        )
+
+    def expected(self, start=None, end=None):
+        runs = Run.objects.filter(owner=self.user)
+        if start:
+            runs = runs.filter(date__gte=start)
+        if end:
+            runs = runs.filter(date__lte=end)
+        return {
+            "distance": sum(run.distance for run in runs),
+            "seconds": sum(run.time.total_seconds() for run in runs),
+            "runs": len(runs),
+        }
+
+    def assert_totals(self):
+        for start, end in (
+                (None, None), (date(2020, 10, 5), date(2020, 10, 5)),
+                (date(2020, 10, 6), date(2020, 10, 11)),
+                (date(2020, 10, 1), date(2020, 10, 7)),
+                (date(2020, 10, 8), None), (None, date(2020, 10, 4))):
+            with self.subTest(start=start, end=end):
+                self.assertEqual(
+                    range_total(self.user.pk, start, end),
+                    self.expected(start, end)
+                )
+
+    def test_one_row_per_day_with_runs(self):
+        self.assertEqual(
+            list(DailyTotal.objects.filter(owner=self.user).values_list(
+                "date", "distance", "runs"
+            ).order_by("date")),
+            [(date(2020, 10, 5), 12, 2), (date(2020, 10, 7), 17, 3),
+             (date(2020, 10, 12), 25, 4)]
+        )
+        self.assert_totals()
+
+    def test_two_queries_per_range(self):
+        with self.assertNumQueries(2):
+            range_total(self.user.pk, date(2020, 10, 6), date(2020, 10, 30))
+
+    def test_maintained_by_saves(self):
+        self.new_run(6, 3).save()
+        run = Run.objects.get(owner=self.user, date=date(2020, 10, 12))
+        run.date = date(2020, 10, 4)
+        run.save()
+        self.assert_totals()
+
+    def test_maintained_by_bulk_changes(self):
+        update_runs(
+            Run.objects.filter(owner=self.user, distance__gt=4),
+            date=date(2020, 10, 9)
+        )
+        self.assert_totals()
+        delete_runs(Run.objects.filter(owner=self.user, distance=5))
+        self.assert_totals()
+
+    def test_totals_from_the_first_day(self):
+        run = self.new_run(1, 4)
+        run.date = date.min
+        run.save()
+        self.assertEqual(
+            range_total(self.user.pk, date.min), self.expected()
+        )
+
+    def test_later_rows_are_shifted_in_place(self):
+        rows = DailyTotal.objects.filter(owner=self.user)
+        ids = dict(rows.values_list("date", "id"))
+        self.new_run(6, 3).save()
+        delete_runs(Run.objects.filter(owner=self.user, distance=5))
+        after = dict(rows.values_list("date", "id"))
+        self.assertEqual(sorted(after), [
+            date(2020, 10, 5), date(2020, 10, 6), date(2020, 10, 12)
+        ])
+        for day in (date(2020, 10, 5), date(2020, 10, 12)):
+            self.assertEqual(after[day], ids[day])
+        self.assert_totals()
+
+    def test_rebuild(self):
+        DailyTotal.objects.all().delete()
+        rebuild_daily_totals([self.user.pk], chunk_size=1)
+        self.assert_totals()
+
+
+@patch("jogging.models.get_weather", lambda location, day: None)
+class RangeTotalViewTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="sam")
+        self.factory = APIRequestFactory()
+        self.view = RunViewSet.as_view({"get": "range_total"})
+        for day in (5, 7, 12):
+            Run.objects.create(
+                date=date(2020, 10, day), distance=day,
+                time=timedelta(minutes=30), location="Porto",
+                owner=self.user,
+            )
+
+    def get(self, url):
+        request = self.factory.get(url)
+        force_authenticate(request, user=self.user)
+        return self.view(request)
+
+    def test_totals_of_the_range(self):
+        response = self.get("/run/range-total/?from=2020-10-06&to=2020-10-12")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {
+            "from": date(2020, 10, 6), "to": date(2020, 10, 12),
+            "distance": 19, "seconds": 3600, "runs": 2,
+        })
+
+    def test_open_range(self):
+        response = self.get("/run/range-total/")
+        self.assertEqual(response.data["runs"], 3)
+        self.assertEqual(response.data["distance"], 24)
+
+    def test_range_from_the_first_day(self):
+        response = self.get("/run/range-total/?from=0001-01-01")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["runs"], 3)
+
+    def test_invalid_ranges(self):
+        for query in ("from=2020-10-12&to=2020-10-06", "to=yesterday"):
+            with self.subTest(query=query):
+                response = self.get(f"/run/range-total/?{query}")
+                self.assertEqual(response.status_code, 400)
@@ -0,0 +1,130 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.contrib.auth.models import User
+
+from jogging.versions import (
+    touch, current_version, add_runs, recount_runs, run_count,
+)
+from jogging.models import DataVersion, Run
+from jogging.bulk import create_runs, delete_runs
+
+
+class TouchTestCase(TestCase):
+    def test_creates_and_increments_version(self):
+        user = User.objects.create(username="sam")
+        touch(user)
+        self.assertEqual(DataVersion.objects.get(owner=user).version, 1)
+        touch(user)
+        self.assertEqual(DataVersion.objects.get(owner=user).version, 2)
+
+    def test_updates_modification_time(self):
+        user = User.objects.create(username="sam")
+        touch(user)
+        first = DataVersion.objects.get(owner=user).modified
+        touch(user)
+        self.assertGreaterEqual(
+            DataVersion.objects.get(owner=user).modified, first
+        )
+
+
+class CurrentVersionTestCase(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create(username="sam")
+        self.user2 = User.objects.create(username="dave")
+
+    def test_unknown_user(self):
+        self.assertEqual(current_version(self.user1), ("0", None))
+
+    def test_changes_only_if_user_data_changes(self):
+        touch(self.user1)
+        tag, modified = current_version(self.user1)
+        touch(self.user2)
+        self.assertEqual(current_version(self.user1), (tag, modified))
+        touch(self.user1)
+        self.assertNotEqual(current_version(self.user1)[0], tag)
+
+    def test_everybody_changes_with_any_user(self):
+        touch(self.user1)
+        tag, _ = current_version(None, everybody=True)
+        touch(self.user2)
+        new_tag, _ = current_version(None, everybody=True)
+        self.assertNotEqual(tag, new_tag)
+
+    def test_queries_no_data_tables(self):
+        with self.assertNumQueries(1):
+            current_version(self.user1)
+
+
+class RunCountTestCase(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create(username="sam")
+        self.user2 = User.objects.create(username="dave")
+
+    def new_run(self, owner, day):
+        return Run(
+            date=date(2020, 10, day), distance=day,
+            time=timedelta(minutes=30), location="Porto", owner=owner,
+        )
+
+    def test_unknown_user(self):
+        self.assertEqual(run_count(self.user1), 0)
+        self.assertEqual(run_count(None, everybody=True), 0)
+
+    def test_add_runs(self):
+        touch(self.user1)
+        add_runs(self.user1.pk, 3)
+        add_runs(self.user1.pk, -1)
+        self.assertEqual(run_count(self.user1), 2)
+
+    def test_counts_follow_saves_and_bulk_changes(self):
+        with patch("jogging.models.get_weather") as pget_weather:
+            pget_weather.return_value = "Cloudy"
+            run = self.new_run(self.user1, 5)
+            run.save()
+            run.save()
+        with patch("jogging.bulk.get_weather_many") as pget_weather_many:
+            pget_weather_many.return_value = {
+                ("Porto", date(2020, 10, day)): "Sunny" for day in (6, 7)
+            }
+            create_runs([self.new_run(self.user1, 6),
+                         self.new_run(self.user2, 7)])
+        self.assertEqual(run_count(self.user1), 2)
+        self.assertEqual(run_count(self.user2), 1)
+        self.assertEqual(run_count(None, everybody=True), 3)
+        delete_runs(Run.objects.filter(distance__gt=5))
+        self.assertEqual(run_count(self.user1), 1)
+        self.assertEqual(run_count(self.user2), 0)
+
+    def test_recount_runs(self):
+        with patch("jogging.models.get_weather") as pget_weather:
+            pget_weather.return_value = "Cloudy"
+            for day in (5, 6):
+                self.new_run(self.user1, day).save()
+        touch(self.user2)
+        DataVersion.objects.update(runs=7)
+        recount_runs([self.user1.pk, self.user2.pk], chunk_size=1)
+        self.assertEqual(run_count(self.user1), 2)
+        self.assertEqual(run_count(self.user2), 0)
@@ -25,14 +25,21 @@ import json
 
 from django.urls import reverse
 from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework.test import APIRequestFactory, force_authenticate
 from rest_framework.renderers import JSONRenderer
 
 from jogging.views import (
-    NewAccount, RunViewSet, WeeklyReportViewSet, UserViewSet,
+    NewAccount, NewToken, RunViewSet, WeeklyReportViewSet, UserViewSet,
 )
-from jogging.models import Run, WeeklyReport
+from jogging.models import Run, WeeklyReport, AuthToken, LeaderboardEntry
+from jogging.authentication import issue_token, token_digest
+from jogging.bulk import create_runs
+from jogging.caching import weekly_reports_cache
 from jogging.serializers import (
     RunSerializer, WeeklyReportSerializer, UserSerializer,
 )
@@ -55,6 +62,44 @@ class NewAccountTestCase(TestCase):
             response.data["password"]
 
 
+class NewTokenTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="mike")
+        self.user.set_password("1259f")
+        self.user.save()
+        self.factory = APIRequestFactory()
+        self.view = NewToken.as_view()
+
+    def test_issues_token_with_valid_credentials(self):
+        request = self.factory.post(
+            "/new-token/", {"username": "mike", "password": "1259f"},
+            format="json",
+        )
+        response = self.view(request)
+        self.assertEqual(response.status_code, 201)
+        key = response.data["token"]
+        self.assertEqual(
+            AuthToken.objects.get().digest, token_digest(key)
+        )
+
+    def test_rejects_wrong_credentials(self):
+        request = self.factory.post(
+            "/new-token/", {"username": "mike", "password": "nope"},
+            format="json",
+        )
+        response = self.view(request)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(AuthToken.objects.count(), 0)
+
+    def test_delete_revokes_token(self):
+        key = issue_token(self.user)
+        request = self.factory.delete(
+            "/new-token/", HTTP_AUTHORIZATION=f"Token {key}")
+        response = self.view(request)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(AuthToken.objects.count(), 0)
+
+
 class RunViewSetTestCase(TestCase):
     def setUp(self):
         self.user1 = User.objects.create(username="sam")
@@ -77,11 +122,11 @@ class RunViewSetTestCase(TestCase):
                 owner=self.user2,
             )
 
-    def test_has_filter_set_fields_attribute(self):
+    def test_has_filter_set_fields(self):
         expected = [
             "date", "distance", "location", "weather", "time", "owner", "id"]
         for item in expected:
-            self.assertIn(item, RunViewSet.filterset_fields)
+            self.assertIn(item, RunViewSet.filterset_class.base_filters)
 
     def test_create_allowed_if_authenticated(self):
         user = User.objects.create(username="paul")
@@ -202,11 +247,185 @@ class RunViewSetGetQuerySetTestCase(TestCase):
         queryset0.filter.assert_called_once_with(
             pmake.return_value
         )
-        pmake.assert_called_once_with("what?")
+        pmake.assert_called_once_with(
+            "what?", self.mviewset.search_lookups
+        )
         del self.mviewset.query_params["search"]
 
 
+@patch("jogging.bulk.get_weather_many")
+class RunViewSetBulkTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="sam")
+        self.factory = APIRequestFactory()
+        self.view = RunViewSet.as_view({'post': 'bulk'})
+        self.data = [
+            {
+                "date": "2020-10-12", "distance": "2.6",
+                "time": "00:13:30", "location": "Rome"
+            },
+            {
+                "date": "2020-10-13", "distance": "5.2",
+                "time": "00:26:30", "location": "Rome"
+            },
+        ]
+
+    def test_creates_all_runs(self, pget_weather_many):
+        pget_weather_many.return_value = {
+            ("Rome", date(2020, 10, 12)): "Sunny",
+            ("Rome", date(2020, 10, 13)): "Rain",
+        }
+        request = self.factory.post("/run/bulk/", self.data, format="json")
+        force_authenticate(request, user=self.user)
+        response = self.view(request)
+        response.render()
+        self.assertEqual(response.status_code, 201)
+        data = json.loads(response.content)
+        self.assertEqual(len(data), 2)
+        self.assertEqual(
+            [item["id"] for item in data],
+            list(Run.objects.order_by("pk").values_list("pk", flat=True))
+        )
+        self.assertEqual([item["user"] for item in data], ["sam", "sam"])
+        self.assertEqual([item["weather"] for item in data], ["Sunny", "Rain"])
+        self.assertEqual(WeeklyReport.objects.count(), 1)
+        self.assertAlmostEqual(
+            WeeklyReport.objects.first().total_distance_km, 7.8)
+
+    def test_returns_per_item_errors(self, pget_weather_many):
+        self.data[1]["distance"] = "far"
+        request = self.factory.post("/run/bulk/", self.data, format="json")
+        force_authenticate(request, user=self.user)
+        response = self.view(request)
+        response.render()
+        self.assertEqual(response.status_code, 400)
+        errors = json.loads(response.content)
+        self.assertEqual(errors[0], {})
+        self.assertIn("distance", errors[1])
+        self.assertEqual(Run.objects.count(), 0)
+        pget_weather_many.assert_not_called()
+
+    def test_forbidden_if_not_logged_in(self, pget_weather_many):
+        request = self.factory.post("/run/bulk/", self.data, format="json")
+        response = self.view(request)
+        self.assertEqual(response.status_code, 403)
+
+
+class RunViewSetBulkChangesTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="sam")
+        self.superuser = User.objects.create_superuser(username="boss")
+        self.factory = APIRequestFactory()
+        with patch("jogging.models.get_weather") as pget_weather:
+            pget_weather.return_value = "Cloudy"
+            for day, distance in ((5, 10), (7, 5), (12, 8)):
+                Run.objects.create(
+                    date=date(2020, 10, day),
+                    distance=distance,
+                    time=timedelta(hours=1),
+                    location="Porto",
+                    owner=self.user,
+                )
+
+    def test_admin_can_delete_by_search(self):
+        view = RunViewSet.as_view({'delete': 'bulk_destroy'})
+        request = self.factory.delete("/run/?search=distance gt 6")
+        force_authenticate(request, user=self.superuser)
+        response = view(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {"count": 2})
+        self.assertEqual(Run.objects.count(), 1)
+        self.assertEqual(WeeklyReport.objects.count(), 1)
+
+    def test_dry_run_only_counts(self):
+        view = RunViewSet.as_view({'delete': 'bulk_destroy'})
+        request = self.factory.delete(
+            "/run/?search=distance gt 6&dry_run=true")
+        force_authenticate(request, user=self.superuser)
+        response = view(request)
+        self.assertEqual(response.data, {"count": 2})
+        self.assertEqual(Run.objects.count(), 3)
+
+    def test_search_is_required(self):
+        view = RunViewSet.as_view({'delete': 'bulk_destroy'})
+        request = self.factory.delete("/run/")
+        force_authenticate(request, user=self.superuser)
+        response = view(request)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Run.objects.count(), 3)
+
+    def test_wrong_search_is_bad_request(self):
+        view = RunViewSet.as_view({'delete': 'bulk_destroy'})
+        for search in ("distance gt", "color eq 'red'"):
+            with self.subTest(search=search):
+                request = self.factory.delete(f"/run/?search={search}")
+                force_authenticate(request, user=self.superuser)
+                response = view(request)
+                self.assertEqual(response.status_code, 400)
+
+    def test_admin_can_update_by_search(self):
+        view = RunViewSet.as_view({'patch': 'bulk_update'})
+        request = self.factory.patch(
+            "/run/bulk-update/?search=distance gt 6", {"distance": 6},
+            format="json"
+        )
+        force_authenticate(request, user=self.superuser)
+        response = view(request)
+        self.assertEqual(response.data, {"count": 2})
+        self.assertEqual(Run.objects.filter(distance=6).count(), 2)
+        report = WeeklyReport.objects.get(week_start=date(2020, 10, 5))
+        self.assertEqual(report.total_distance_km, 11)
+
+    def test_admin_can_update_the_weather_by_search(self):
+        view = RunViewSet.as_view({'patch': 'bulk_update'})
+        request = self.factory.patch(
+            "/run/bulk-update/?search=location eq 'porto'",
+            {"weather": "Clear"}, format="json"
+        )
+        force_authenticate(request, user=self.superuser)
+        response = view(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {"count": 3})
+        self.assertEqual(
+            [run.weather for run in Run.objects.all()], ["Clear"]*3
+        )
+
+    def test_update_without_writable_fields_is_bad_request(self):
+        view = RunViewSet.as_view({'patch': 'bulk_update'})
+        for data in ({}, {"user": "adm"}, {"id": 7}):
+            with self.subTest(data=data):
+                request = self.factory.patch(
+                    "/run/bulk-update/?search=distance gt 6", data,
+                    format="json"
+                )
+                force_authenticate(request, user=self.superuser)
+                response = view(request)
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            set(Run.objects.values_list("owner__username", flat=True)),
+            {self.user.username}
+        )
+
+    def test_regular_user_cannot_use_bulk_changes(self):
+        for method, action, url in (
+                ("delete", "bulk_destroy", "/run/?search=distance gt 6"),
+                ("patch", "bulk_update",
+                 "/run/bulk-update/?search=distance gt 6")):
+            with self.subTest(action=action):
+                view = RunViewSet.as_view({method: action})
+                request = getattr(self.factory, method)(
+                    url, {"distance": 1}, format="json")
+                force_authenticate(request, user=self.user)
+                response = view(request)
+                self.assertEqual(response.status_code, 403)
+        self.assertEqual(Run.objects.count(), 3)
+        self.assertEqual(Run.objects.filter(distance=1).count(), 0)
+
+
 class WeeklyReportViewSetTestCase(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+
     def test_has_filter_set_fields_attribute(self):
         expected = ["average_speed_kmph", "total_distance_km", "week_start"]
         for item in expected:
@@ -296,6 +515,412 @@ class WeeklyReportViewSetTestCase(TestCase):
             response = view(request)
 
 
+class SparseFieldsetTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="sam")
+        self.factory = APIRequestFactory()
+        with patch("jogging.models.get_weather") as pget_weather:
+            pget_weather.return_value = "Cloudy"
+            self.runs = [
+                Run.objects.create(
+                    date=date(2020, 10, day), distance=day,
+                    time=timedelta(minutes=30), location="Porto",
+                    owner=self.user,
+                ) for day in (5, 6, 13)
+            ]
+
+    def get(self, viewset, url, action="list", **kwargs):
+        view = viewset.as_view({"get": action})
+        request = self.factory.get(url)
+        force_authenticate(request, user=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = view(request, **kwargs)
+        return response, [query["sql"] for query in queries]
+
+    def test_list_with_some_fields(self):
+        response, queries = self.get(RunViewSet, "/run/?fields=date,distance")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [dict(run) for run in response.data["results"]],
+            [{"date": "2020-10-05", "distance": 5.0},
+             {"date": "2020-10-06", "distance": 6.0},
+             {"date": "2020-10-13", "distance": 13.0}]
+        )
+        select = [sql for sql in queries if '"jogging_run"."date"' in sql][-1]
+        self.assertNotIn("auth_user", select)
+        self.assertNotIn('"location"', select)
+
+    def test_user_is_joined_once(self):
+        response, queries = self.get(RunViewSet, "/run/?fields=id,user")
+        self.assertEqual(
+            [run["user"] for run in response.data["results"]], ["sam"]*3
+        )
+        self.assertEqual(
+            len([sql for sql in queries if "auth_user" in sql]), 1
+        )
+
+    def test_all_fields_by_default_without_extra_queries(self):
+        response, queries = self.get(RunViewSet, "/run/")
+        self.assertEqual(
+            set(response.data["results"][0]), set(RunSerializer.Meta.fields)
+        )
+        _, more_queries = self.get(RunViewSet, "/run/?limit=1")
+        self.assertEqual(len(queries), len(more_queries))
+
+    def test_retrieve_with_some_fields(self):
+        response, _ = self.get(
+            RunViewSet, "/run/?fields=location", "retrieve",
+            pk=self.runs[0].pk
+        )
+        self.assertEqual(response.data, {"location": "Porto"})
+
+    def test_unknown_fields_are_rejected(self):
+        response, _ = self.get(RunViewSet, "/run/?fields=date,owner,pace")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data["fields"], ["Unknown fields: owner, pace."]
+        )
+
+    def test_weekly_reports_with_some_fields(self):
+        response, queries = self.get(
+            WeeklyReportViewSet, "/weekly-reports/?fields=week"
+        )
+        self.assertEqual(
+            sorted(report["week"] for report in response.data["results"]),
+            ["2020-10-05 to 2020-10-11", "2020-10-12 to 2020-10-18"]
+        )
+        select = [sql for sql in queries if "week_start" in sql][-1]
+        self.assertNotIn("total_distance_km", select)
+
+
+class ConditionalGetTestCase(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.user = User.objects.create(username="sam")
+        self.factory = APIRequestFactory()
+        with patch("jogging.models.get_weather") as pget_weather:
+            pget_weather.return_value = "Cloudy"
+            self.run = Run.objects.create(
+                date=date(2020, 10, 13),
+                distance="5.6",
+                time=timedelta(minutes=53, seconds=22),
+                location="Porto",
+                owner=self.user,
+            )
+
+    def get(self, viewset, url, action="list", **kwargs):
+        view = viewset.as_view({'get': action})
+        request = self.factory.get(url, **kwargs)
+        force_authenticate(request, user=self.user)
+        if action == "retrieve":
+            return view(request, pk=self.run.pk)
+        return view(request)
+
+    def test_responses_have_validators(self):
+        for viewset, url in ((RunViewSet, "/run/"),
+                             (WeeklyReportViewSet, "/weekly-reports/")):
+            with self.subTest(url=url):
+                response = self.get(viewset, url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn("ETag", response)
+                self.assertIn("Last-Modified", response)
+
+    def test_not_modified_if_etag_matches(self):
+        for viewset, url, action in (
+                (RunViewSet, "/run/", "list"),
+                (RunViewSet, "/run/1/", "retrieve"),
+                (WeeklyReportViewSet, "/weekly-reports/", "list")):
+            with self.subTest(url=url):
+                etag = self.get(viewset, url, action)["ETag"]
+                with self.assertNumQueries(1):
+                    response = self.get(
+                        viewset, url, action, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+    def test_not_modified_since_last_modification(self):
+        last_modified = self.get(RunViewSet, "/run/")["Last-Modified"]
+        response = self.get(
+            RunViewSet, "/run/", HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_after_a_write(self):
+        etag = self.get(WeeklyReportViewSet, "/weekly-reports/")["ETag"]
+        with patch("jogging.models.get_weather") as pget_weather:
+            pget_weather.return_value = "Cloudy"
+            self.run.distance = 7
+            self.run.save()
+        response = self.get(
+            WeeklyReportViewSet, "/weekly-reports/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_etag_depends_on_query(self):
+        etag1 = self.get(RunViewSet, "/run/")["ETag"]
+        etag2 = self.get(RunViewSet, "/run/?limit=1")["ETag"]
+        self.assertNotEqual(etag1, etag2)
+
+
+class WeeklyReportViewSetCacheTestCase(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        weekly_reports_cache.reset_stats()
+        self.user = User.objects.create(username="sam")
+        self.factory = APIRequestFactory()
+        self.view = WeeklyReportViewSet.as_view({'get': 'list'})
+        with patch("jogging.models.get_weather") as pget_weather:
+            pget_weather.return_value = "Cloudy"
+            self.run = Run.objects.create(
+                date=date(2020, 10, 13),
+                distance=5,
+                time=timedelta(minutes=30),
+                location="Porto",
+                owner=self.user,
+            )
+
+    def get(self, url="/weekly-reports/"):
+        request = self.factory.get(url)
+        force_authenticate(request, user=self.user)
+        response = self.view(request)
+        response.render()
+        return response
+
+    def test_second_request_is_served_from_cache(self):
+        first = self.get()
+        self.assertEqual(first["X-Cache"], "MISS")
+        with self.assertNumQueries(1):
+            second = self.get()
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(
+            json.loads(first.content), json.loads(second.content))
+        self.assertEqual(
+            weekly_reports_cache.stats(), {"hits": 1, "misses": 1})
+
+    def test_query_params_are_part_of_the_key(self):
+        self.get()
+        response = self.get("/weekly-reports/?limit=1")
+        self.assertEqual(response["X-Cache"], "MISS")
+
+    def test_saving_a_run_invalidates_the_cache(self):
+        self.get()
+        with patch("jogging.models.get_weather") as pget_weather:
+            pget_weather.return_value = "Cloudy"
+            self.run.distance = 10
+            self.run.save()
+        response = self.get()
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(
+            json.loads(response.content)["results"][0]["total_distance_km"],
+            10
+        )
+
+    def test_other_users_are_not_invalidated(self):
+        other = User.objects.create(username="dave")
+        request = self.factory.get("/weekly-reports/")
+        force_authenticate(request, user=other)
+        self.view(request)
+        with patch("jogging.models.get_weather") as pget_weather:
+            pget_weather.return_value = "Cloudy"
+            self.run.save()
+        request = self.factory.get("/weekly-reports/")
+        force_authenticate(request, user=other)
+        self.assertEqual(self.view(request)["X-Cache"], "HIT")
+
+
+class AnalyticsViewTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="sam")
+        other = User.objects.create(username="dave")
+        runs = [
+            (self.user, date(2020, 10, 1), 10, 3000),
+            (self.user, date(2020, 10, 10), 5, 1800),
+            (other, date(2020, 10, 10), 42, 12000),
+        ]
+        Run.objects.bulk_create(
+            Run(owner=owner, date=day, distance=distance,
+                time=timedelta(seconds=seconds), location="Berlin")
+            for owner, day, distance, seconds in runs
+        )
+
+    def test_analytics_of_own_runs(self):
+        self.client.force_login(self.user)
+        response = self.client.get(
+            "/analytics/", {"date": "2020-10-12", "days": 3}
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["as_of"], "2020-10-12")
+        self.assertEqual(data["runs"], 2)
+        self.assertEqual(
+            data["distance_km"], {"last_7_days": 5.0, "last_28_days": 15.0}
+        )
+        self.assertEqual(
+            [day["date"] for day in data["daily"]],
+            ["2020-10-10", "2020-10-11", "2020-10-12"]
+        )
+
+    def test_invalid_query(self):
+        self.client.force_login(self.user)
+        response = self.client.get("/analytics/", {"days": 0})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("days", response.json())
+
+    def test_anonymous_is_forbidden(self):
+        self.assertEqual(self.client.get("/analytics/").status_code, 403)
+
+    def test_one_query_for_the_runs(self):
+        self.client.force_login(self.user)
+        self.client.get("/analytics/")
+        with self.assertNumQueries(3):
+            # session, user and run snapshot
+            self.client.get("/analytics/")
+
+
+@patch("jogging.bulk.get_weather_many", lambda keys: dict.fromkeys(keys))
+class PersonalRecordViewSetTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="sam")
+        other = User.objects.create(username="dave")
+        self.run, _ = create_runs([
+            Run(owner=self.user, date=date(2020, 10, 5), distance=10,
+                time=timedelta(minutes=50), location="Porto"),
+            Run(owner=other, date=date(2020, 10, 5), distance=42.2,
+                time=timedelta(hours=3), location="Porto"),
+        ])
+
+    def test_lists_own_records(self):
+        self.client.force_login(self.user)
+        response = self.client.get("/personal-records/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"], [
+            {"kind": "10k", "value": 3000.0, "date": "2020-10-05",
+             "run": self.run.pk},
+            {"kind": "5k", "value": 1500.0, "date": "2020-10-05",
+             "run": self.run.pk},
+            {"kind": "biggest_week", "value": 10.0, "date": "2020-10-05",
+             "run": None},
+            {"kind": "longest_run", "value": 10.0, "date": "2020-10-05",
+             "run": self.run.pk},
+        ])
+
+    def test_filter_by_kind(self):
+        self.client.force_login(self.user)
+        response = self.client.get("/personal-records/?kind=5k")
+        self.assertEqual(response.json()["count"], 1)
+
+    def test_read_only(self):
+        self.client.force_login(self.user)
+        response = self.client.post("/personal-records/", {"kind": "5k"})
+        self.assertEqual(response.status_code, 405)
+
+
+class LeaderboardViewSetTestCase(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username="boss")
+        for rank in range(1, 4):
+            user = User.objects.create(username=f"runner{rank}")
+            LeaderboardEntry.objects.create(
+                period="week", period_start=date(2020, 10, 5), owner=user,
+                distance=40-rank, rank=rank
+            )
+
+    def test_pages_by_rank_with_cursor(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(
+            "/leaderboards/", {"start": "2020-10-08", "page_size": 2}
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["results"], [
+            {"rank": 1, "user": "runner1", "distance": 39.0},
+            {"rank": 2, "user": "runner2", "distance": 38.0},
+        ])
+        self.assertIn("cursor=", data["next"])
+        data = self.client.get(data["next"]).json()
+        self.assertEqual(
+            data["results"], [{"rank": 3, "user": "runner3", "distance": 37.0}]
+        )
+        self.assertIsNone(data["next"])
+
+    def test_month_board(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(
+            "/leaderboards/", {"period": "month", "start": "2020-10-08"}
+        )
+        self.assertEqual(response.json()["results"], [])
+
+    def test_invalid_period(self):
+        self.client.force_login(self.admin)
+        response = self.client.get("/leaderboards/", {"period": "year"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_regular_user_is_forbidden(self):
+        self.client.force_login(User.objects.get(username="runner1"))
+        self.assertEqual(self.client.get("/leaderboards/").status_code, 403)
+
+
+@patch("jogging.bulk.get_weather_many", lambda keys: dict.fromkeys(keys))
+class RunImportTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="sam")
+        self.client.force_login(self.user)
+
+    def upload(self, content, name="history.csv", **data):
+        upload = SimpleUploadedFile(name, content)
+        return self.client.post("/run/import/", {"file": upload, **data})
+
+    def test_imports_csv(self):
+        response = self.upload(
+            b"date,distance,time,location\n2020-10-05,10,3600,Porto\n"
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["count"], 1)
+        self.assertIn("rows_per_second", response.json())
+        self.assertEqual(Run.objects.get().owner, self.user)
+
+    def test_invalid_file(self):
+        response = self.upload(b"date,distance\n2020-10-05,ten\n")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("line 2", response.json()["detail"])
+        self.assertFalse(Run.objects.exists())
+
+    def test_unknown_format(self):
+        response = self.upload(b"", name="history.xls")
+        self.assertEqual(response.status_code, 400)
+
+    def test_no_file(self):
+        response = self.client.post("/run/import/", {})
+        self.assertEqual(response.status_code, 400)
+
+
+class MetricsViewTestCase(TestCase):
+    def test_admin_gets_prometheus_text(self):
+        user = User.objects.create_superuser(username="boss")
+        self.client.force_login(user)
+        self.client.get("/weekly-reports/")
+        response = self.client.get("/metrics/")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        text = response.content.decode()
+        self.assertIn(
+            'jogging_request_queries_count{endpoint="weekly-reports-list"}',
+            text
+        )
+        self.assertIn("jogging_weekly_reports_cache_misses_total", text)
+
+    def test_regular_user_is_forbidden(self):
+        user = User.objects.create(username="sam")
+        self.client.force_login(user)
+        self.assertEqual(self.client.get("/metrics/").status_code, 403)
+
+    def test_responses_have_server_timing(self):
+        user = User.objects.create(username="sam")
+        self.client.force_login(user)
+        response = self.client.get("/run/?search=distance gt 3")
+        timing = response["Server-Timing"]
+        for phase in ("total;", "db;", "search;", "serialize;", "render;"):
+            self.assertIn(phase, timing)
+
+
 class UserViewSetTestCase(TestCase):
     def setUp(self):
         self.user1 = User.objects.create(username="sam")
@@ -19,15 +19,23 @@
 #
 ########################################################################
 
+import asyncio
+import threading
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import patch, MagicMock
 import json
 from datetime import date
 
 from django.conf import settings
+from django.test import SimpleTestCase, override_settings
 
 from jogging.weather import (
     get_weather, _meta_weather_location_id, meta_weather, fake_weather,
+    get_weather_many, aget_weather, aget_weather_many, prefetched_weather,
+    ProviderLimit,
 )
 
 
@@ -165,3 +173,274 @@ class FakeWeatherTestCase(unittest.TestCase):
             with self.subTest(location=loc, date=d):
                 self.assertEqual(fake_weather(loc, d), "fake")
 
+
+@patch("jogging.weather._get_weather")
+class GetWeatherManyTestCase(unittest.TestCase):
+    def test_each_distinct_key_looked_up_once(self, pget_weather):
+        pget_weather.side_effect = lambda loc, d: f"{loc}@{d}"
+        keys = [
+            ("Berlin", date(2020, 10, 14)),
+            ("Berlin", date(2020, 10, 14)),
+            ("Paris", date(2020, 10, 14)),
+        ]
+        weather = get_weather_many(keys)
+        self.assertEqual(pget_weather.call_count, 2)
+        self.assertEqual(
+            weather,
+            {
+                ("Berlin", date(2020, 10, 14)): "Berlin@2020-10-14",
+                ("Paris", date(2020, 10, 14)): "Paris@2020-10-14",
+            }
+        )
+
+
+class MetaWeatherHandler(BaseHTTPRequestHandler):
+    """Local stand-in of the MetaWeather API."""
+
+    def do_GET(self):
+        if self.path.startswith("/api/location/search/"):
+            body = [{"woeid": 23}]
+        elif self.path == "/api/location/23/2020/10/13/":
+            body = FICTICIOUS_METAWEATHER_DATA
+        else:
+            body = []
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class AsyncWeatherTestCase(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("localhost", 0), MetaWeatherHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://localhost:{cls.server.server_port}/api/"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def meta_weather_settings(self):
+        return override_settings(
+            WEATHER={"PROVIDER": "meta_weather", "BASE_URL": self.base_url}
+        )
+
+    def test_async_meta_weather_against_local_server(self):
+        with self.meta_weather_settings():
+            weather = asyncio.run(aget_weather("Madrid", date(2020, 10, 13)))
+        self.assertEqual(weather, "Clear")
+
+    def test_sync_meta_weather_uses_base_url(self):
+        with self.meta_weather_settings():
+            weather = get_weather("Madrid", date(2020, 10, 13))
+        self.assertEqual(weather, "Clear")
+
+    def test_async_fake_weather(self):
+        with override_settings(WEATHER={"PROVIDER": "fake_weather"}):
+            weather = asyncio.run(aget_weather("Madrid", date(2020, 10, 13)))
+        self.assertEqual(weather, "fake")
+
+    def test_provider_without_async_version_runs_in_thread(self):
+        with override_settings(WEATHER={"PROVIDER": "other_weather"}):
+            with patch(
+                    "jogging.weather.other_weather", create=True
+            ) as pother_weather:
+                pother_weather.return_value = "Windy"
+                weather = asyncio.run(aget_weather("X", date(2020, 10, 13)))
+        self.assertEqual(weather, "Windy")
+
+    def test_errors_give_None(self):
+        with override_settings(WEATHER={
+                "PROVIDER": "meta_weather",
+                "BASE_URL": "http://localhost:1/"}):
+            weather = asyncio.run(aget_weather("Madrid", date(2020, 10, 13)))
+        self.assertIsNone(weather)
+
+    def test_many_fetches_distinct_keys(self):
+        keys = [
+            ("Madrid", date(2020, 10, 13)), ("Madrid", date(2020, 10, 13)),
+            ("Lima", date(2020, 10, 14)),
+        ]
+        with self.meta_weather_settings():
+            weather = asyncio.run(aget_weather_many(keys))
+        self.assertEqual(weather, {
+            ("Madrid", date(2020, 10, 13)): "Clear",
+            ("Lima", date(2020, 10, 14)): None,
+        })
+
+
+class PrefetchedWeatherTestCase(unittest.TestCase):
+    @patch("jogging.weather.fake_weather")
+    def test_prefetched_weather_is_used(self, pfake_weather):
+        token = prefetched_weather.set({("Lima", date(2020, 10, 14)): "Fog"})
+        try:
+            with override_settings(WEATHER={"PROVIDER": "fake_weather"}):
+                weather = get_weather("Lima", date(2020, 10, 14))
+        finally:
+            prefetched_weather.reset(token)
+        self.assertEqual(weather, "Fog")
+        pfake_weather.assert_not_called()
+
+
+class SlowProvider:
+    """Provider answering after ``delay`` seconds that records its calls
+    and the maximum number of them running at once."""
+
+    def __init__(self, delay=0.05, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def _start(self, location, day):
+        with self._lock:
+            self.calls.append((location, day))
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+
+    def _stop(self, location):
+        with self._lock:
+            self.active -= 1
+        if self.fail:
+            raise ValueError("provider down")
+        return f"sunny in {location}"
+
+    def __call__(self, location, day):
+        self._start(location, day)
+        time.sleep(self.delay)
+        return self._stop(location)
+
+    async def coroutine(self, location, day):
+        self._start(location, day)
+        await asyncio.sleep(self.delay)
+        return self._stop(location)
+
+
+@override_settings(WEATHER={"PROVIDER": "slow_weather", "MAX_CONCURRENT": 2})
+class SingleFlightTestCase(SimpleTestCase):
+    def setUp(self):
+        self.provider = SlowProvider()
+        for name, function in (
+                ("slow_weather", self.provider),
+                ("async_slow_weather", self.provider.coroutine)):
+            patcher = patch(f"jogging.weather.{name}", function, create=True)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def get_in_threads(self, keys):
+        # the lookups start together (not after the first one ended):
+        start = threading.Barrier(len(keys))
+
+        def lookup(key):
+            start.wait()
+            return get_weather(*key)
+
+        with ThreadPoolExecutor(max_workers=len(keys)) as pool:
+            return list(pool.map(lookup, keys))
+
+    def test_threads_share_one_call(self):
+        key = ("Berlin", date(2020, 10, 14))
+        weather = self.get_in_threads([key]*20)
+        self.assertEqual(weather, ["sunny in Berlin"]*20)
+        self.assertEqual(self.provider.calls, [key])
+
+    def test_coroutines_share_one_call(self):
+        key = ("Berlin", date(2020, 10, 14))
+
+        async def lookups():
+            return await asyncio.gather(
+                *(aget_weather(*key) for _ in range(20))
+            )
+        weather = asyncio.run(lookups())
+        self.assertEqual(weather, ["sunny in Berlin"]*20)
+        self.assertEqual(self.provider.calls, [key])
+
+    def test_threads_and_coroutines_share_one_call(self):
+        key = ("Berlin", date(2020, 10, 14))
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            futures = [pool.submit(get_weather, *key) for _ in range(5)]
+            weather = asyncio.run(aget_weather(*key))
+            thread_weather = [future.result() for future in futures]
+        self.assertEqual(thread_weather, [weather]*5)
+        self.assertEqual(self.provider.calls, [key])
+
+    def test_later_lookups_call_again(self):
+        key = ("Berlin", date(2020, 10, 14))
+        get_weather(*key)
+        get_weather(*key)
+        self.assertEqual(self.provider.calls, [key, key])
+
+    def test_errors_are_shared_and_not_kept(self):
+        self.provider.fail = True
+        key = ("Berlin", date(2020, 10, 14))
+        self.assertEqual(self.get_in_threads([key]*5), [None]*5)
+        self.assertEqual(len(self.provider.calls), 1)
+        self.provider.fail = False
+        self.assertEqual(get_weather(*key), "sunny in Berlin")
+
+    def test_concurrency_limit_of_threads(self):
+        keys = [("Berlin", date(2020, 10, day)) for day in range(1, 9)]
+        self.get_in_threads(keys)
+        self.assertEqual(len(self.provider.calls), 8)
+        self.assertEqual(self.provider.max_active, 2)
+
+    def test_get_weather_many_is_concurrent_within_the_limit(self):
+        keys = [("Berlin", date(2020, 10, day)) for day in range(1, 9)]
+        weather = get_weather_many(keys+keys)
+        self.assertEqual(len(weather), 8)
+        self.assertEqual(len(self.provider.calls), 8)
+        self.assertEqual(self.provider.max_active, 2)
+
+    def test_get_weather_many_threads_see_the_prefetched_weather(self):
+        keys = [("Berlin", date(2020, 10, day)) for day in range(1, 5)]
+        token = prefetched_weather.set({keys[0]: "Fog"})
+        try:
+            weather = get_weather_many(keys)
+        finally:
+            prefetched_weather.reset(token)
+        self.assertEqual(weather[keys[0]], "Fog")
+        self.assertEqual(sorted(self.provider.calls), keys[1:])
+
+    def test_concurrency_limit_of_coroutines(self):
+        keys = [("Berlin", date(2020, 10, day)) for day in range(1, 9)]
+        weather = asyncio.run(aget_weather_many(keys))
+        self.assertEqual(len(weather), 8)
+        self.assertEqual(self.provider.max_active, 2)
+
+    def test_concurrency_limit_is_shared(self):
+        keys = [("Berlin", date(2020, 10, day)) for day in range(1, 9)]
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            futures = [pool.submit(get_weather, *key) for key in keys[:4]]
+            asyncio.run(aget_weather_many(keys[4:]))
+            for future in futures:
+                future.result()
+        self.assertEqual(len(self.provider.calls), 8)
+        self.assertEqual(self.provider.max_active, 2)
+
+
+@override_settings(WEATHER={"PROVIDER": "fake_weather", "MAX_CONCURRENT": 1})
+class ProviderLimitTestCase(SimpleTestCase):
+    def test_cancelled_waiter_passes_the_slot_on(self):
+        limit = ProviderLimit()
+
+        async def scenario():
+            await limit.__aenter__()
+            waiter = asyncio.ensure_future(limit.__aenter__())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            await limit.__aexit__()
+            await asyncio.wait_for(limit.__aenter__(), 1)
+            await limit.__aexit__()
+        asyncio.run(scenario())
+        self.assertEqual(limit._active, 0)
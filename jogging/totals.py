@@ -0,0 +1,167 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+"""Cumulative daily totals (prefix sums) of the runs of each user.
+
+For every day with runs, ``DailyTotal`` holds the distance, time and
+number of runs of the user up to and including that day, so the totals of
+any range of dates are the difference of two rows. A change on some day
+shifts the rows from that day on by the difference, with one ``UPDATE``.
+"""
+
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+
+ONEDAY = timedelta(days=1)
+NO_RUNS = (0.0, 0.0, 0)
+
+
+def cumulative_total(owner_id, day):
+    """``(distance, seconds, runs)`` of the runs of the owner up to
+    ``day`` (included)."""
+    from jogging.models import DailyTotal
+    row = DailyTotal.objects.filter(
+        owner_id=owner_id, date__lte=day
+    ).order_by("-date").values_list("distance", "seconds", "runs").first()
+    return row or NO_RUNS
+
+
+def range_total(owner_id, start=None, end=None):
+    """Totals of the runs of the owner between ``start`` and ``end``
+    (both included, open if ``None``): two lookups."""
+    if end is None:
+        high = _last_total(owner_id)
+    else:
+        high = cumulative_total(owner_id, end)
+    low = NO_RUNS if start is None else _total_before(owner_id, start)
+    distance, seconds, runs = _difference(high, low)
+    return {"distance": distance, "seconds": seconds, "runs": runs}
+
+
+def _total_before(owner_id, day):
+    if day == date.min:
+        return NO_RUNS
+    return cumulative_total(owner_id, day-ONEDAY)
+
+
+def _last_total(owner_id):
+    from jogging.models import DailyTotal
+    row = DailyTotal.objects.filter(owner_id=owner_id).order_by(
+        "-date"
+    ).values_list("distance", "seconds", "runs").first()
+    return row or NO_RUNS
+
+
+def update_daily_totals(owner_id, days):
+    """Brings the totals of the owner up to date after their runs on
+    ``days`` changed: the difference of each day is added to its row and
+    the later ones, and the rows of the days that gained (lost) their
+    first (last) run are inserted (deleted)."""
+    from jogging.models import DailyTotal, Run
+    days = sorted(set(days))
+    totals = DailyTotal.objects.filter(owner_id=owner_id)
+    # called after the runs were written in the same transaction (which,
+    # on SQLite, already holds the write lock):
+    with transaction.atomic():
+        stored = {
+            day: _difference(total, _total_before(owner_id, day))
+            for day, *total in totals.filter(date__in=days).values_list(
+                "date", "distance", "seconds", "runs"
+            )
+        }
+        current = {
+            day: (distance, time.total_seconds(), runs)
+            for _, day, distance, time, runs in _daily_sums(
+                Run.objects.filter(owner_id=owner_id, date__in=days)
+            )
+        }
+        for day in days:
+            distance, seconds, runs = _difference(
+                current.get(day, NO_RUNS), stored.get(day, NO_RUNS)
+            )
+            if distance or seconds or runs:
+                totals.filter(date__gte=day).update(
+                    distance=F("distance")+distance,
+                    seconds=F("seconds")+seconds, runs=F("runs")+runs
+                )
+        totals.filter(date__in=set(stored)-set(current)).delete()
+        for day in sorted(set(current)-set(stored)):
+            distance, seconds, runs = (
+                before+today for before, today in zip(
+                    _total_before(owner_id, day), current[day]
+                )
+            )
+            DailyTotal.objects.create(
+                owner_id=owner_id, date=day, distance=distance,
+                seconds=seconds, runs=runs
+            )
+
+
+def _difference(total, previous):
+    return tuple(t-p for t, p in zip(total, previous))
+
+
+def rebuild_daily_totals(owner_ids, chunk_size=500):
+    """Rebuilds from scratch the totals of the given owners, with one
+    grouped aggregate per chunk of owners."""
+    from jogging.models import DailyTotal, Run
+    owner_ids = list(owner_ids)
+    for start in range(0, len(owner_ids), chunk_size):
+        chunk = owner_ids[start:start+chunk_size]
+        days_per_owner = defaultdict(list)
+        for row in _daily_sums(Run.objects.filter(owner_id__in=chunk)):
+            days_per_owner[row[0]].append(row)
+        with transaction.atomic():
+            DailyTotal.objects.filter(owner_id__in=chunk).delete()
+            DailyTotal.objects.bulk_create(
+                [
+                    total for owner_id, rows in days_per_owner.items()
+                    for total in _accumulate(owner_id, NO_RUNS, rows)
+                ],
+                batch_size=chunk_size
+            )
+
+
+def _daily_sums(runs):
+    """``(owner id, date, distance, time, runs)`` per owner and day, in
+    order."""
+    return runs.values_list("owner_id", "date").annotate(
+        Sum("distance"), Sum("time"), Count("id")
+    ).order_by("owner_id", "date")
+
+
+def _accumulate(owner_id, previous, rows):
+    from jogging.models import DailyTotal
+    distance, seconds, runs = previous
+    totals = []
+    for _, day, day_distance, day_time, day_runs in rows:
+        distance += day_distance
+        seconds += day_time.total_seconds()
+        runs += day_runs
+        totals.append(DailyTotal(
+            owner_id=owner_id, date=day, distance=distance,
+            seconds=seconds, runs=runs
+        ))
+    return totals
@@ -23,17 +23,43 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from jogging import views
+from jogging import async_views, views
 
 
-router = DefaultRouter()
+class Router(DefaultRouter):
+    """Also maps ``DELETE`` on list urls to a ``bulk_destroy`` method
+    (only for viewsets implementing it)."""
+    routes = [
+        DefaultRouter.routes[0]._replace(
+            mapping={
+                **DefaultRouter.routes[0].mapping, "delete": "bulk_destroy"
+            }
+        ),
+    ] + DefaultRouter.routes[1:]
+
+
+router = Router()
 router.register(r"run", views.RunViewSet, basename="run")
 router.register(
     r"weekly-reports", views.WeeklyReportViewSet, basename="weekly-reports")
+router.register(
+    r"personal-records", views.PersonalRecordViewSet,
+    basename="personal-records")
+router.register(
+    r"leaderboards", views.LeaderboardViewSet, basename="leaderboards")
 router.register(r"user", views.UserViewSet, basename="user")
 
 
 urlpatterns = [
     path("new-account/", views.NewAccount.as_view(), name="new-account"),
+    path("new-token/", views.NewToken.as_view(), name="new-token"),
+    path("analytics/", views.AnalyticsView.as_view(), name="analytics"),
+    path("metrics/", views.MetricsView.as_view(), name="metrics"),
+    path("async/run/", async_views.run_list, name="async-run-list"),
+    path("async/run/bulk/", async_views.run_bulk, name="async-run-bulk"),
+    path(
+        "async/run/<int:pk>/", async_views.run_detail,
+        name="async-run-detail"
+    ),
     path("", include(router.urls)),
 ]
@@ -0,0 +1,110 @@
+########################################################################
+#
+#  Copyright (c) 2020 David Palao
+#
+#  This file is part of JoggingStats.
+#
+#  JoggingStats is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  JoggingStats is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with JoggingStats. If not, see <http://www.gnu.org/licenses/>.
+#
+########################################################################
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def touch(owner):
+    """Marks the data of ``owner`` (a user or its id) as changed."""
+    from jogging.models import DataVersion
+    owner_id = getattr(owner, "pk", owner)
+    now = timezone.now()
+    updated = DataVersion.objects.filter(owner_id=owner_id).update(
+        version=F("version")+1, modified=now
+    )
+    if not updated:
+        try:
+            with transaction.atomic():
+                DataVersion.objects.create(
+                    owner_id=owner_id, version=1, modified=now
+                )
+        except IntegrityError:
+            # somebody else created it in the meantime:
+            touch(owner_id)
+
+
+def locked_versions(owner_ids):
+    """The current data versions of the owners (0 if unknown), locked
+    until the end of the transaction where the database supports it. A
+    write takes them before its first ``touch``."""
+    from jogging.models import DataVersion
+    versions = dict.fromkeys(owner_ids, 0)
+    versions.update(
+        DataVersion.objects.select_for_update().filter(
+            owner_id__in=versions.keys()
+        ).values_list("owner_id", "version")
+    )
+    return versions
+
+
+def add_runs(owner_id, delta):
+    """Adds ``delta`` to the run counter of the owner, whose data version
+    must exist (see ``touch``)."""
+    from jogging.models import DataVersion
+    DataVersion.objects.filter(owner_id=owner_id).update(
+        runs=F("runs")+delta
+    )
+
+
+def recount_runs(owner_ids, chunk_size=500):
+    """Sets the run counters of the owners from the database."""
+    from jogging.models import DataVersion, Run
+    owner_ids = list(owner_ids)
+    runs = Run.objects.filter(owner_id=OuterRef("owner_id")).order_by(
+    ).values("owner_id").annotate(count=Count("id")).values("count")
+    for start in range(0, len(owner_ids), chunk_size):
+        DataVersion.objects.filter(
+            owner_id__in=owner_ids[start:start+chunk_size]
+        ).update(runs=Coalesce(Subquery(runs), 0))
+
+
+def run_count(user, everybody=False):
+    """Number of runs of ``user`` (or of all users if ``everybody``)
+    according to the run counters."""
+    from jogging.models import DataVersion
+    if everybody:
+        return DataVersion.objects.aggregate(Sum("runs"))["runs__sum"] or 0
+    runs = DataVersion.objects.filter(owner=user).values_list(
+        "runs", flat=True
+    ).first()
+    return runs or 0
+
+
+def current_version(user, everybody=False):
+    """Returns a tag identifying the current state of the data of ``user``
+    (or of all users if ``everybody``) and the time of its last change
+    (``None`` if unknown)."""
+    from jogging.models import DataVersion
+    if everybody:
+        stats = DataVersion.objects.aggregate(
+            Count("owner"), Sum("version"), Max("modified")
+        )
+        tag = f"{stats['owner__count']}.{stats['version__sum'] or 0}"
+        return tag, stats["modified__max"]
+    version = DataVersion.objects.filter(owner=user).values_list(
+        "version", "modified"
+    ).first()
+    if version is None:
+        return "0", None
+    return str(version[0]), version[1]
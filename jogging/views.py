@@ -19,18 +19,185 @@
 #
 ########################################################################
 
+import hashlib
+from datetime import date
+
 from rest_framework import generics
+from rest_framework import mixins
 from rest_framework import viewsets
 from rest_framework import permissions
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from django.contrib.auth.models import User
+from django.core.exceptions import FieldError
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 
 from .serializers import (
     RunSerializer, WeeklyReportSerializer, UserSerializer,
+    AuthTokenSerializer, AnalyticsQuerySerializer, PersonalRecordSerializer,
+    LeaderboardEntrySerializer, LeaderboardQuerySerializer,
+    RangeTotalQuerySerializer,
 )
 
-from .models import Run, WeeklyReport
-from .permissions import IsOwnerOrAdmin, IsAdminOrStaff
+from .models import Run, WeeklyReport, PersonalRecord, LeaderboardEntry
+from .permissions import IsOwnerOrAdmin, IsAdminOrStaff, IsAdmin
+from .bulk import delete_runs, update_runs, import_runs
+from .importers import FORMATS, RunImportError, detect_format, iter_runs
+from .authentication import issue_token, revoke_token
+from .versions import current_version, run_count
+from .caching import EVERYBODY, weekly_reports_cache
+from .metrics import registry, timed
+from .analytics import load_run_columns, compute_analytics
+from .leaderboards import period_start
+from .pagination import CachedCountPagination, RankCursorPagination
+from .dbrouters import (
+    allow_replica, reset_replica, mark_write, wrote_recently,
+)
 from .search import make_Qexpr_from_search_string
+from .filters import RunFilter
+from .locations import location_key
+from .totals import range_total
+
+
+def _is_true(value):
+    return str(value).lower() in ("1", "true", "yes")
+
+
+class ConditionalGetMixin:
+    """Adds ``ETag`` and ``Last-Modified`` to list and retrieve responses
+    and answers ``304 Not Modified`` to conditional requests if the data
+    did not change, without querying nor serializing the data itself.
+    """
+    def list(self, request, *args, **kwargs):
+        return self._conditional_get(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional_get(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def versions_of_everybody(self):
+        return False
+
+    def get_validators(self, request):
+        tag, modified = current_version(
+            request.user, everybody=self.versions_of_everybody()
+        )
+        key = ":".join((
+            str(request.user.pk), tag, request.get_full_path(),
+            request.META.get("HTTP_ACCEPT", ""),
+        ))
+        etag = quote_etag(hashlib.md5(key.encode()).hexdigest())
+        last_modified = modified and int(modified.timestamp())
+        return etag, last_modified
+
+    def _conditional_get(self, method, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = method(request, *args, **kwargs)
+        if 200 <= response.status_code < 300 or response.status_code == 304:
+            response["ETag"] = etag
+            if last_modified:
+                response["Last-Modified"] = http_date(last_modified)
+        return response
+
+
+class ReplicaReadMixin:
+    """Lets safe requests read from the replica database unless the user
+    wrote recently; other requests start the user's read-your-writes
+    window and use only the primary database."""
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        user_id = request.user.pk
+        if request.method in SAFE_METHODS:
+            allowed = not wrote_recently(user_id)
+        else:
+            mark_write(user_id)
+            allowed = False
+        self._replica_token = allow_replica(allowed)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, "_replica_token", None)
+        if token is not None:
+            reset_replica(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class SparseFieldsetMixin:
+    """``?fields=date,distance`` restricts the list and retrieve responses
+    to those fields, and the columns loaded from the database to the ones
+    they need (relations are joined only if requested). The columns of a
+    field are taken from its source, or from ``sparse_field_sources`` if it
+    is not a model field; ``sparse_columns`` are always loaded."""
+    sparse_field_sources = {}
+    sparse_columns = ()
+
+    def requested_fields(self):
+        """The requested fields (all of them if not given)."""
+        known = self.get_serializer_class().Meta.fields
+        value = self.request.query_params.get("fields")
+        if not value or self.action not in ("list", "retrieve"):
+            return known
+        fields = [name.strip() for name in value.split(",") if name.strip()]
+        unknown = [name for name in fields if name not in known]
+        if unknown:
+            raise ValidationError(
+                {"fields": [f"Unknown fields: {', '.join(unknown)}."]}
+            )
+        return fields
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action in ("list", "retrieve"):
+            kwargs.setdefault("fields", self.requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action not in ("list", "retrieve"):
+            return queryset
+        serializer_fields = self.get_serializer_class()().fields
+        columns = set(self.sparse_columns)
+        for name in self.requested_fields():
+            source = self.sparse_field_sources.get(
+                name, serializer_fields[name].source
+            )
+            columns.add(source.replace(".", "__"))
+        relations = {
+            column.rsplit("__", 1)[0] for column in columns if "__" in column
+        }
+        if relations:
+            queryset = queryset.select_related(*relations)
+        return queryset.only(*columns)
+
+
+class CachedListMixin:
+    """Serves lists from a per-user cache (``response_cache``), keyed by
+    the full url of the request."""
+    response_cache = None
+
+    def list(self, request, *args, **kwargs):
+        key = request.build_absolute_uri()
+        data = self.response_cache.get(request.user.pk, key)
+        if data is not None:
+            response = Response(data)
+            response["X-Cache"] = "HIT"
+            return response
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            self.response_cache.set(request.user.pk, key, response.data)
+        response["X-Cache"] = "MISS"
+        return response
 
 
 class NewAccount(generics.CreateAPIView):
@@ -38,12 +205,50 @@ class NewAccount(generics.CreateAPIView):
     serializer_class = UserSerializer
 
 
-class RunViewSet(viewsets.ModelViewSet):
+class NewToken(generics.GenericAPIView):
+    """``POST`` with username and password issues a new token (the only
+    time the password is checked); ``DELETE`` authenticated with a token
+    revokes it."""
+    serializer_class = AuthTokenSerializer
+
+    def get_permissions(self):
+        if self.request.method == "DELETE":
+            return [permissions.IsAuthenticated()]
+        return super().get_permissions()
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        key = issue_token(serializer.validated_data["user"])
+        return Response({"token": key}, status=status.HTTP_201_CREATED)
+
+    def delete(self, request):
+        if not isinstance(request.auth, str):
+            return Response(
+                {"detail": "Not authenticated with a token."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        revoke_token(request.auth)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class RunViewSet(
+        ReplicaReadMixin, ConditionalGetMixin, SparseFieldsetMixin,
+        viewsets.ModelViewSet):
     serializer_class = RunSerializer
     permission_classes = (permissions.IsAuthenticated, IsOwnerOrAdmin)
-    filterset_fields = [
-        'date', 'distance', 'time', 'owner', 'location', 'weather', 'id']
-    
+    pagination_class = CachedCountPagination
+    # for the object permissions:
+    sparse_columns = ("owner", )
+    sparse_field_sources = {
+        "location": "place__name", "weather": "condition__name",
+    }
+    filterset_class = RunFilter
+    search_lookups = {
+        "location": ("place__key", location_key),
+        "weather": ("condition__name", str),
+    }
+
     def get_queryset(self):
         if self.request.user.is_superuser:
             queryset0 = Run.objects.all()
@@ -51,18 +256,143 @@ class RunViewSet(viewsets.ModelViewSet):
             queryset0 = Run.objects.filter(owner=self.request.user)
         q = self.request.query_params.get("search", None)
         if q:
-            q = make_Qexpr_from_search_string(q)
+            q = make_Qexpr_from_search_string(q, self.search_lookups)
             queryset = queryset0.filter(q)
         else:
             queryset = queryset0
         return queryset
 
+    def get_permissions(self):
+        if self.action in ("bulk_destroy", "bulk_update"):
+            return [permissions.IsAuthenticated(), IsAdmin()]
+        return super().get_permissions()
+
+    def versions_of_everybody(self):
+        return self.request.user.is_superuser
+
+    def estimated_count(self):
+        """Number of runs of the unfiltered list, from the run counters."""
+        return run_count(
+            self.request.user, everybody=self.request.user.is_superuser
+        )
+
+    def count_cache_owner(self):
+        if self.request.user.is_superuser:
+            return EVERYBODY
+        return self.request.user.pk
+
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
+    def perform_destroy(self, instance):
+        # also repairs the weekly report:
+        delete_runs(Run.objects.filter(pk=instance.pk))
+
+    @action(detail=False, methods=["get"], url_path="range-total")
+    def range_total(self, request):
+        """Totals of the user's runs between ``from`` and ``to`` (both
+        included and optional), from the cumulative daily totals."""
+        return self._conditional_get(self._range_total, request)
+
+    def _range_total(self, request):
+        query = RangeTotalQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        start = query.validated_data.get("from")
+        end = query.validated_data.get("to")
+        total = range_total(request.user.pk, start, end)
+        return Response({
+            "from": start,
+            "to": end,
+            "distance": round(total["distance"], 2),
+            "seconds": round(total["seconds"], 2),
+            "runs": total["runs"],
+        })
+
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        serializer = self.get_serializer(data=request.data, many=True)
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors, status=status.HTTP_400_BAD_REQUEST
+            )
+        self.perform_create(serializer)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-class WeeklyReportViewSet(viewsets.ReadOnlyModelViewSet):
+    @action(
+        detail=False, methods=["post"], url_path="import",
+        parser_classes=(MultiPartParser, )
+    )
+    def import_file(self, request):
+        """Imports the runs of an uploaded CSV or GPX ``file``."""
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response(
+                {"file": ["No file was submitted."]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            format = request.data.get("format") or detect_format(upload.name)
+            if format not in FORMATS:
+                raise RunImportError(f"Unknown format {format!r}")
+            count, elapsed = import_runs(
+                request.user,
+                iter_runs(upload, format, request.data.get("location"))
+            )
+        except RunImportError as e:
+            return Response(
+                {"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(
+            {
+                "count": count,
+                "seconds": round(elapsed, 3),
+                "rows_per_second": round(count/elapsed) if elapsed else 0,
+            },
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(detail=False, methods=["patch"], url_path="bulk-update")
+    def bulk_update(self, request):
+        serializer = self.get_serializer(data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        if not serializer.validated_data:
+            return Response(
+                {"detail": "No field to update was given."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return self._bulk_operation(
+            request, update_runs, **serializer.validated_data
+        )
+
+    def bulk_destroy(self, request):
+        """Mapped by the router to ``DELETE`` on the list url."""
+        return self._bulk_operation(request, delete_runs)
+
+    def _bulk_operation(self, request, operation, **kwargs):
+        if not request.query_params.get("search"):
+            return Response(
+                {"detail": "A 'search' expression is required."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            queryset = self.get_queryset()
+            if _is_true(request.query_params.get("dry_run")):
+                count = queryset.count()
+            else:
+                count = operation(queryset, **kwargs)
+        except (SyntaxError, FieldError) as e:
+            return Response(
+                {"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({"count": count})
+
+
+class WeeklyReportViewSet(
+        ReplicaReadMixin, ConditionalGetMixin, CachedListMixin,
+        SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = WeeklyReportSerializer
+    sparse_field_sources = {"week": "week_start"}
+    response_cache = weekly_reports_cache
     permission_classes = (permissions.IsAuthenticated, )
     filterset_fields = [
         'average_speed_kmph', 'total_distance_km', 'week_start']
@@ -71,6 +401,41 @@ class WeeklyReportViewSet(viewsets.ReadOnlyModelViewSet):
         return WeeklyReport.objects.filter(owner=self.request.user)
 
 
+class PersonalRecordViewSet(
+        ReplicaReadMixin, ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    serializer_class = PersonalRecordSerializer
+    permission_classes = (permissions.IsAuthenticated, )
+    filterset_fields = ["kind"]
+
+    def get_queryset(self):
+        return PersonalRecord.objects.filter(
+            owner=self.request.user
+        ).select_related("run").order_by("kind")
+
+
+class LeaderboardViewSet(
+        ReplicaReadMixin, ConditionalGetMixin, mixins.ListModelMixin,
+        viewsets.GenericViewSet):
+    """Users ranked by distance in one ``period`` (week or month) starting
+    on the day ``start`` belongs to (default: today); admins only."""
+    serializer_class = LeaderboardEntrySerializer
+    permission_classes = (permissions.IsAuthenticated, IsAdmin)
+    pagination_class = RankCursorPagination
+    filter_backends = ()
+
+    def versions_of_everybody(self):
+        return True
+
+    def get_queryset(self):
+        query = LeaderboardQuerySerializer(data=self.request.query_params)
+        query.is_valid(raise_exception=True)
+        period = query.validated_data["period"]
+        start = query.validated_data.get("start") or date.today()
+        return LeaderboardEntry.objects.filter(
+            period=period, period_start=period_start(period, start)
+        ).select_related("owner")
+
+
 class UserViewSet(viewsets.ModelViewSet):
     #queryset = User.objects.all()
     serializer_class = UserSerializer
@@ -83,3 +448,36 @@ class UserViewSet(viewsets.ModelViewSet):
             return User.objects.all()
         else:
             return User.objects.filter(pk=user.pk)
+
+
+class AnalyticsView(ReplicaReadMixin, APIView):
+    """Training analytics of the user's runs up to ``date`` (default:
+    today) with daily series of the last ``days`` days."""
+    permission_classes = (permissions.IsAuthenticated, )
+
+    def get(self, request):
+        query = AnalyticsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        columns = load_run_columns(request.user)
+        with timed("analytics"):
+            data = compute_analytics(
+                columns, as_of=query.validated_data.get("date"),
+                series_days=query.validated_data["days"]
+            )
+        return Response(data)
+
+
+class MetricsView(APIView):
+    """Request metrics in the Prometheus text format (admins only)."""
+    permission_classes = (permissions.IsAuthenticated, IsAdmin)
+
+    def get(self, request):
+        cache_stats = weekly_reports_cache.stats()
+        text = registry.prometheus(counters=(
+            ("jogging_weekly_reports_cache_hits_total", cache_stats["hits"]),
+            ("jogging_weekly_reports_cache_misses_total",
+             cache_stats["misses"]),
+        ))
+        return HttpResponse(
+            text, content_type="text/plain; version=0.0.4; charset=utf-8"
+        )
@@ -19,17 +19,35 @@
 #
 ########################################################################
 
+import asyncio
 import datetime
+import functools
+import ssl
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar, copy_context
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
+import httpx
 import requests
 
+from .metrics import timed
 
+
+# the base url can be changed with settings.WEATHER["BASE_URL"]:
 META_WEATHER_BASE_URL = "https://www.metaweather.com/api/"
-META_WEATHER_LOCATION_SEARCH_URL = META_WEATHER_BASE_URL + "location/search/"
-META_WEATHER_HISTORIC_URL = (
-    META_WEATHER_BASE_URL + "location/{location}/{year}/{month}/{day}/"
-)
+
+# weather already fetched (asynchronously) for the current request:
+prefetched_weather = ContextVar("prefetched_weather", default=None)
+
+# concurrent calls to the provider, unless settings.WEATHER["MAX_CONCURRENT"]:
+DEFAULT_MAX_CONCURRENT = 8
+
+
+def _meta_weather_url(path):
+    return settings.WEATHER.get("BASE_URL", META_WEATHER_BASE_URL)+path
 
 
 def fake_weather(location, date):
@@ -39,11 +57,17 @@ def fake_weather(location, date):
 
 def meta_weather(location, date):
     location_id = _meta_weather_location_id(location)
-    url = META_WEATHER_HISTORIC_URL.format(
-        location=location_id, year=date.year, month=date.month, day=date.day
+    response = requests.get(_meta_weather_historic_url(location_id, date))
+    return _meta_weather_state(response.json(), date)
+
+
+def _meta_weather_historic_url(location_id, date):
+    return _meta_weather_url(
+        f"location/{location_id}/{date.year}/{date.month}/{date.day}/"
     )
-    response = requests.get(url)
-    data = response.json()
+
+
+def _meta_weather_state(data, date):
     for item in data:
         if datetime.date.fromisoformat(item["applicable_date"]) == date:
             return item["weather_state_name"]
@@ -51,23 +75,234 @@ def meta_weather(location, date):
 
 def _meta_weather_location_id(location):
     response = requests.get(
-        META_WEATHER_LOCATION_SEARCH_URL,
+        _meta_weather_url("location/search/"),
         params={"query": location}
     )
-    data = response.json()
+    return _meta_weather_woeid(response.json())
+
+
+def _meta_weather_woeid(data):
     try:
         return data[0]["woeid"]
     except (IndexError, KeyError):
         pass
 
 
+async def async_fake_weather(location, date):
+    return fake_weather(location, date)
+
+
+@functools.lru_cache(maxsize=None)
+def _ssl_context():
+    # building it takes tens of ms, too much to pay in every lookup:
+    return ssl.create_default_context()
+
+
+async def async_meta_weather(location, date):
+    async with httpx.AsyncClient(verify=_ssl_context()) as client:
+        response = await client.get(
+            _meta_weather_url("location/search/"),
+            params={"query": location}
+        )
+        location_id = _meta_weather_woeid(response.json())
+        response = await client.get(
+            _meta_weather_historic_url(location_id, date)
+        )
+    return _meta_weather_state(response.json(), date)
+
+
+class ProviderLimit:
+    """Limits the number of concurrent calls to the weather provider, from
+    threads (``with limit:``) and coroutines (``async with limit:``) alike.
+    A released slot is handed over to the oldest waiter."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters = deque()
+
+    @property
+    def size(self):
+        return settings.WEATHER.get("MAX_CONCURRENT", DEFAULT_MAX_CONCURRENT)
+
+    def _try_acquire(self):
+        if self._active < self.size and not self._waiters:
+            self._active += 1
+            return True
+        return False
+
+    def __enter__(self):
+        with self._lock:
+            if self._try_acquire():
+                return
+            event = threading.Event()
+            self._waiters.append(event.set)
+        event.wait()
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    async def __aenter__(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._try_acquire():
+                return
+            future = loop.create_future()
+            self._waiters.append(
+                lambda: loop.call_soon_threadsafe(self._wake, future)
+            )
+        await future
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+    def _wake(self, future):
+        if future.cancelled():
+            # the waiter is gone, the slot goes to the next one:
+            self.release()
+        else:
+            future.set_result(None)
+
+    def release(self):
+        with self._lock:
+            if not self._waiters:
+                self._active -= 1
+                return
+            wake = self._waiters.popleft()
+        wake()
+
+
+class Flight:
+    """One lookup in progress. Threads wait on ``done`` and coroutines on
+    the futures in ``waiters``."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.waiters = []
+
+
+provider_limit = ProviderLimit()
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def _join_flight(key):
+    """The flight of ``key`` and whether the caller has to make it."""
+    with _flights_lock:
+        flight = _flights.get(key)
+        if flight is None:
+            flight = _flights[key] = Flight()
+            return flight, True
+        return flight, False
+
+
+def _land_flight(key, flight, result):
+    with _flights_lock:
+        del _flights[key]
+        flight.result = result
+        waiters, flight.waiters = flight.waiters, []
+        flight.done.set()
+    for loop, future in waiters:
+        loop.call_soon_threadsafe(_resolve, future, result)
+
+
+def _resolve(future, result):
+    if not future.done():
+        future.set_result(result)
+
+
+async def _await_flight(flight):
+    loop = asyncio.get_running_loop()
+    with _flights_lock:
+        if flight.done.is_set():
+            return flight.result
+        future = loop.create_future()
+        flight.waiters.append((loop, future))
+    return await future
+
+
+def _provider_name():
+    return settings.WEATHER.get("PROVIDER")
+
+
+@timed("weather")
 def get_weather(location, date):
+    """Weather in ``location`` on ``date`` (or ``None``). Concurrent
+    lookups of the same pair, from threads or coroutines, share one call
+    to the provider (single flight)."""
+    return _get_weather(location, date)
+
+
+def _get_weather(location, date):
+    prefetched = prefetched_weather.get()
+    if prefetched is not None and (location, date) in prefetched:
+        return prefetched[(location, date)]
+    provider = globals().get(_provider_name())
+    if provider is None:
+        return None
+    key = (_provider_name(), location, date)
+    flight, leader = _join_flight(key)
+    if not leader:
+        flight.done.wait()
+        return flight.result
+    result = None
     try:
-        provider = globals()[settings.WEATHER["PROVIDER"]]
-    except KeyError:
-        pass
-    try:
-        return provider(location, date)
-    except:
+        with provider_limit:
+            result = provider(location, date)
+    except Exception:
         pass
+    finally:
+        _land_flight(key, flight, result)
+    return result
+
+
+@timed("weather")
+def get_weather_many(keys):
+    """Resolves the weather for several ``(location, date)`` pairs at once.
+    Each distinct pair is looked up only once, concurrently in threads
+    (still within ``provider_limit``). Returns a dict mapping the pairs to
+    the weather (or ``None``)."""
+    keys = list(set(keys))
+    if len(keys) < 2:
+        return {key: _get_weather(*key) for key in keys}
+    # each thread sees the context of the caller (prefetched weather):
+    contexts = [copy_context() for _ in keys]
+    with ThreadPoolExecutor(
+            max_workers=min(len(keys), provider_limit.size)) as pool:
+        weather = pool.map(
+            lambda context, key: context.run(_get_weather, *key),
+            contexts, keys
+        )
+        return dict(zip(keys, weather))
+
+
+async def aget_weather(location, date):
+    """Asynchronous ``get_weather``: the ``async_<name>`` version of the
+    provider is awaited if it exists, otherwise the provider runs in a
+    thread."""
+    provider = globals().get(f"async_{_provider_name()}")
+    if provider is None:
+        return await sync_to_async(get_weather)(location, date)
+    key = (_provider_name(), location, date)
+    with timed("weather"):
+        flight, leader = _join_flight(key)
+        if not leader:
+            return await _await_flight(flight)
+        result = None
+        try:
+            async with provider_limit:
+                result = await provider(location, date)
+        except Exception:
+            pass
+        finally:
+            _land_flight(key, flight, result)
+        return result
+
 
+async def aget_weather_many(keys):
+    """Asynchronous ``get_weather_many``: the distinct pairs are fetched
+    concurrently."""
+    keys = list(set(keys))
+    weather = await asyncio.gather(*(aget_weather(*key) for key in keys))
+    return dict(zip(keys, weather))